@@ -18,6 +18,7 @@
 import collections
 import hashlib
 import json
+import uuid
 import zlib
 
 from rest_framework import serializers
@@ -76,6 +77,40 @@ class FileContentField(serializers.CharField):
         return content_file
 
 
+class FileContentSha1Field(serializers.CharField):
+    """
+    References file contents that were already stored by their sha1 instead
+    of providing the contents.
+    """
+
+    default_error_messages = {"does_not_exist": "No file contents with sha1 {sha1}, the contents must be provided."}
+
+    def to_representation(self, obj):
+        return obj.sha1
+
+    def to_internal_value(self, data):
+        try:
+            return models.FileContent.objects.get(sha1=data)
+        except models.FileContent.DoesNotExist:
+            self.fail("does_not_exist", sha1=data)
+
+
+class ClientUuidRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    References related objects by their id or by the client_uuid they were created with.
+    """
+
+    def to_internal_value(self, data):
+        if not isinstance(data, str) or data.isdigit():
+            return super().to_internal_value(data)
+        try:
+            return self.get_queryset().get(client_uuid=uuid.UUID(data))
+        except ValueError:
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        except self.get_queryset().model.DoesNotExist:
+            self.fail("does_not_exist", pk_value=data)
+
+
 class CreatableSlugRelatedField(serializers.SlugRelatedField):
     """
     A SlugRelatedField that supports get_or_create.
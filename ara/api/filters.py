@@ -197,6 +197,20 @@ class FileFilter(BaseFilter):
     # fmt: on
 
 
+class FileContentFilter(BaseFilter):
+    sha1 = django_filters.CharFilter(field_name="sha1", lookup_expr="exact")
+
+    # fmt: off
+    order = django_filters.OrderingFilter(
+        fields=(
+            ("id", "id"),
+            ("created", "created"),
+            ("updated", "updated")
+        )
+    )
+    # fmt: on
+
+
 class RecordFilter(BaseFilter):
     playbook = django_filters.NumberFilter(field_name="playbook__id", lookup_expr="exact")
     key = django_filters.CharFilter(field_name="key", lookup_expr="exact")
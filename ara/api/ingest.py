@@ -0,0 +1,169 @@
+# Copyright (c) 2020 The ARA Records Ansible authors
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# When ARA_INGEST_QUEUE is enabled, results are validated and queued by the API
+# server which replies with "202 Accepted" right away. Queued results are then
+# created in bulk by a background thread with one transaction per batch instead
+# of one transaction per request.
+#
+# Every other request (i.e, reading results or updating a task) waits for the
+# results queued so far to be committed first so that clients always read
+# their writes.
+
+import atexit
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, transaction
+
+# Requests that are queued, by method and url name
+INGEST_REQUESTS = [("POST", "result-list"), ("POST", "result-bulk")]
+# Requests that don't need the queue to be flushed before being served
+UNBLOCKED_REQUESTS = INGEST_REQUESTS + [("GET", "result-ingest")]
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_queue():
+    """
+    Returns the ingest queue of the current process
+    """
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = IngestQueue(batch_size=settings.INGEST_BATCH_SIZE, interval=settings.INGEST_INTERVAL)
+            atexit.register(_queue.flush)
+    return _queue
+
+
+def flush_before(method, url_name):
+    """
+    Commits the queued objects before serving a request that could depend on them
+    """
+    if settings.INGEST_QUEUE and (method, url_name) not in UNBLOCKED_REQUESTS:
+        get_queue().flush()
+
+
+class IngestMiddleware(object):
+    """
+    Commits the queued objects before serving the requests that could depend on them
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        flush_before(request.method, request.resolver_match.view_name)
+
+
+class IngestQueue(object):
+    """
+    Queues model instances and creates them in batches of up to batch_size, at least every
+    interval seconds. With an interval of 0, batches are only created once they are full.
+    Without an interval, instances are only created when the queue is flushed or when it holds
+    more than ten batches.
+    """
+
+    def __init__(self, batch_size=1000, interval=1.0):
+        self.log = logging.getLogger(__name__)
+        self.batch_size = int(batch_size)
+        self.interval = max(float(interval), 0.0) if interval is not None else None
+        self.objects = []
+        self.committed = 0
+        self.failed = 0
+        self.condition = threading.Condition()
+        # Only one batch is committed at a time so that flush() returns once every object was committed
+        self.flush_lock = threading.Lock()
+        self.worker = None
+        self.pid = None
+
+    def status(self):
+        with self.condition:
+            return dict(depth=len(self.objects), committed=self.committed, failed=self.failed)
+
+    def put(self, objects):
+        """
+        Queues a list of model instances to be created
+        """
+        with self.condition:
+            self.objects.extend(objects)
+            depth = len(self.objects)
+            if depth >= self.batch_size:
+                self.condition.notify()
+        self._start()
+        # The request waits for the queue to catch up rather than letting it grow indefinitely
+        if depth >= self.batch_size * 10:
+            self.flush()
+
+    def _start(self):
+        if self.interval is None or (self.worker is not None and self.pid == os.getpid()):
+            return
+        with self.condition:
+            # Threads don't survive forks, i.e, of processes serving the API with preloaded applications
+            if self.worker is None or self.pid != os.getpid():
+                self.pid = os.getpid()
+                self.worker = threading.Thread(target=self._flush_periodically, name="ara-ingest", daemon=True)
+                self.worker.start()
+
+    def _flush_periodically(self):
+        while True:
+            with self.condition:
+                # Waiting without a timeout rather than with a timeout of 0 which would never block
+                self.condition.wait_for(lambda: len(self.objects) >= self.batch_size, timeout=self.interval or None)
+            try:
+                self.flush()
+            except Exception:
+                self.log.exception("Failed to commit queued objects")
+            finally:
+                # This thread doesn't go through the request cycle where connections would be recycled
+                close_old_connections()
+
+    def flush(self):
+        """
+        Creates the objects that have been queued so far
+        """
+        with self.flush_lock:
+            with self.condition:
+                objects, self.objects = self.objects, []
+            for start in range(0, len(objects), self.batch_size):
+                stop = start + self.batch_size
+                batch = objects[start:stop]
+                committed = self._commit(batch)
+                with self.condition:
+                    self.committed += committed
+                    self.failed += len(batch) - committed
+
+    def _commit(self, batch):
+        start = time.monotonic()
+        try:
+            with transaction.atomic():
+                self._bulk_create(batch)
+            committed = len(batch)
+        except DatabaseError as e:
+            # i.e, objects referencing something that was deleted in the meantime: the others are still created
+            self.log.warning("Failed to commit %s queued objects in bulk, retrying one by one: %s" % (len(batch), e))
+            committed = 0
+            for obj in batch:
+                try:
+                    with transaction.atomic():
+                        self._bulk_create([obj])
+                    committed += 1
+                except DatabaseError as e:
+                    self.log.error("Failed to commit queued %s: %s" % (type(obj).__name__, e))
+        self.log.debug("Committed %s queued objects in %.3fs" % (committed, time.monotonic() - start))
+        return committed
+
+    @staticmethod
+    def _bulk_create(objects):
+        by_model = {}
+        for obj in objects:
+            by_model.setdefault(type(obj), []).append(obj)
+        for model, instances in by_model.items():
+            model.objects.bulk_create(instances)
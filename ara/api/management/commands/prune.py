@@ -18,7 +18,7 @@ class Command(BaseCommand):
             "--client",
             type=str,
             default="offline",
-            help="API client to use for the query: 'offline' or 'http' (default: 'offline')",
+            help="API client to use for the query: 'offline', 'http' or 'direct' (default: 'offline')",
         )
         parser.add_argument(
             "--endpoint",
@@ -75,7 +75,7 @@ class Command(BaseCommand):
         limit_date = (datetime.now() - timedelta(days=days)).isoformat()
 
         logger.info("Querying %s/api/v1/playbooks/?started_before=%s" % (endpoint, limit_date))
-        playbooks = api_client.get("/api/v1/playbooks", started_before=limit_date)
+        playbooks = api_client.get("/api/v1/playbooks", started_before=limit_date, count="exact")
 
         # TODO: Improve client validation and exception handling
         if "count" not in playbooks:
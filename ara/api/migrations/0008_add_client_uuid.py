@@ -0,0 +1,38 @@
+# Generated by Django 2.2.28 on 2026-10-18 04:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_add_expired_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='file',
+            name='client_uuid',
+            field=models.UUIDField(blank=True, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='host',
+            name='client_uuid',
+            field=models.UUIDField(blank=True, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='play',
+            name='client_uuid',
+            field=models.UUIDField(blank=True, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='playbook',
+            name='client_uuid',
+            field=models.UUIDField(blank=True, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='client_uuid',
+            field=models.UUIDField(blank=True, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 2.2.28 on 2026-10-18 05:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_add_client_uuid'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='play',
+            index=models.Index(fields=['status', 'updated'], name='plays_status_updated'),
+        ),
+        migrations.AddIndex(
+            model_name='playbook',
+            index=models.Index(fields=['status', 'updated'], name='playbooks_status_updated'),
+        ),
+        migrations.AddIndex(
+            model_name='playbook',
+            index=models.Index(fields=['started'], name='playbooks_started'),
+        ),
+        migrations.AddIndex(
+            model_name='result',
+            index=models.Index(fields=['playbook', 'started'], name='results_playbook_started'),
+        ),
+        migrations.AddIndex(
+            model_name='result',
+            index=models.Index(fields=['status'], name='results_status'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['status', 'updated'], name='tasks_status_updated'),
+        ),
+    ]
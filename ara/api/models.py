@@ -44,13 +44,28 @@ class Duration(Base):
     ended = models.DateTimeField(blank=True, null=True)
     duration = models.DurationField(blank=True, null=True)
 
-    def save(self, *args, **kwargs):
+    def compute_duration(self):
         # Compute duration based on available timestamps
         if self.ended is not None:
             self.duration = self.ended - self.started
+
+    def save(self, *args, **kwargs):
+        self.compute_duration()
         return super(Duration, self).save(*args, **kwargs)
 
 
+class ClientUuid(models.Model):
+    """
+    Abstract model for objects that API clients can identify with a uuid of their own.
+    Clients can then create objects and reference them without waiting for their id.
+    """
+
+    class Meta:
+        abstract = True
+
+    client_uuid = models.UUIDField(blank=True, null=True, unique=True)
+
+
 class Label(Base):
     """
     A label is a generic container meant to group or correlate different
@@ -72,7 +87,7 @@ class Label(Base):
         return "<Label %s: %s>" % (self.id, self.name)
 
 
-class Playbook(Duration):
+class Playbook(Duration, ClientUuid):
     """
     An entry in the 'playbooks' table represents a single execution of the
     ansible or ansible-playbook commands. All the data for that execution
@@ -81,6 +96,11 @@ class Playbook(Duration):
 
     class Meta:
         db_table = "playbooks"
+        indexes = [
+            # i.e, expiring playbooks that are still running after a while
+            models.Index(fields=["status", "updated"], name="playbooks_status_updated"),
+            models.Index(fields=["started"], name="playbooks_started"),
+        ]
 
     # A playbook in ARA can be running (in progress), completed (succeeded) or failed.
     UNKNOWN = "unknown"
@@ -124,7 +144,7 @@ class FileContent(Base):
         return "<FileContent %s:%s>" % (self.id, self.sha1)
 
 
-class File(Base):
+class File(Base, ClientUuid):
     """
     Data about Ansible files (playbooks, tasks, role files, var files, etc).
     Multiple files can reference the same FileContent record.
@@ -161,7 +181,7 @@ class Record(Base):
         return "<Record %s:%s>" % (self.id, self.key)
 
 
-class Play(Duration):
+class Play(Duration, ClientUuid):
     """
     Data about Ansible plays.
     Hosts, tasks and results are childrens of an Ansible play.
@@ -169,6 +189,7 @@ class Play(Duration):
 
     class Meta:
         db_table = "plays"
+        indexes = [models.Index(fields=["status", "updated"], name="plays_status_updated")]
 
     # A play in ARA can be running (in progress) or completed (regardless of success or failure)
     UNKNOWN = "unknown"
@@ -186,11 +207,12 @@ class Play(Duration):
         return "<Play %s:%s>" % (self.id, self.name)
 
 
-class Task(Duration):
+class Task(Duration, ClientUuid):
     """Data about Ansible tasks."""
 
     class Meta:
         db_table = "tasks"
+        indexes = [models.Index(fields=["status", "updated"], name="tasks_status_updated")]
 
     # A task in ARA can be running (in progress) or completed (regardless of success or failure)
     # Actual task statuses (such as failed, skipped, etc.) are actually in the Results table.
@@ -215,7 +237,7 @@ class Task(Duration):
         return "<Task %s:%s>" % (self.name, self.id)
 
 
-class Host(Base):
+class Host(Base, ClientUuid):
     """
     Data about Ansible hosts.
     """
@@ -247,6 +269,12 @@ class Result(Duration):
 
     class Meta:
         db_table = "results"
+        indexes = [
+            # i.e, the results of a playbook in the order they were run
+            models.Index(fields=["playbook", "started"], name="results_playbook_started"),
+            # The rows of a status are in the order of their id within the index, like the API returns them
+            models.Index(fields=["status"], name="results_status"),
+        ]
 
     # Ansible statuses
     OK = "ok"
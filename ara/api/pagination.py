@@ -0,0 +1,212 @@
+# Copyright (c) 2020 The ARA Records Ansible authors
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+import base64
+import hashlib
+import json
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist, ValidationError as DjangoValidationError
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+COUNT_MODES = ["exact", "estimate", "cached", "none"]
+
+
+class LimitOffsetPaginationWithCounts(LimitOffsetPagination):
+    """
+    Extends LimitOffsetPagination to count the objects in one of the modes requested with "count":
+
+    - exact: counts every object matching the query
+    - estimate: uses the statistics of the query planner of PostgreSQL, other databases use a cached count
+    - cached: reuses an exact count for up to ARA_PAGE_COUNT_CACHE_TIMEOUT seconds
+    - none: doesn't count, "has_more" tells whether there is a next page
+
+    Without an exact count, the object following the page is retrieved along with the page to tell
+    whether there is a next page and an approximate count is corrected on the last page.
+    """
+
+    count_query_param = "count"
+
+    def get_count_mode(self, request):
+        mode = request.query_params.get(self.count_query_param, settings.PAGE_COUNT)
+        if mode not in COUNT_MODES:
+            raise ValidationError({self.count_query_param: "Count must be one of: %s" % ", ".join(COUNT_MODES)})
+        return mode
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count_mode = self.get_count_mode(request)
+        if self.count_mode == "exact":
+            self.page = super().paginate_queryset(queryset, request, view)
+            if self.page is not None:
+                self.has_more = self.offset + self.limit < self.count
+                self.approximate_count = False
+            return self.page
+
+        self.limit = self.get_limit(request)
+        if self.limit is None:
+            return None
+        self.offset = self.get_offset(request)
+        self.request = request
+
+        # The object after the page tells whether there is a next page
+        start, stop = self.offset, self.offset + self.limit + 1
+        page = list(queryset[start:stop])
+        self.has_more = len(page) > self.limit
+        page = page[: self.limit]
+        # Whether the count could be different from the amount of objects matching the query
+        self.approximate_count = False
+        if self.count_mode == "none":
+            self.count = None
+        elif not self.has_more and (page or not self.offset):
+            self.count = self.offset + len(page)
+        else:
+            count = self.estimate_count(queryset) if self.count_mode == "estimate" else self.cached_count(queryset)
+            # There are at least as many objects as the ones up to the next page
+            self.count = max(count, self.offset + len(page) + 1) if self.has_more else count
+            self.approximate_count = True
+
+        if self.count is not None and self.count > self.limit and self.template is not None:
+            self.display_page_controls = True
+        self.page = page
+        return self.page
+
+    def estimate_count(self, queryset):
+        connection = connections[queryset.db]
+        if connection.vendor != "postgresql":
+            return self.cached_count(queryset)
+        sql, params = queryset.order_by().query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN (FORMAT JSON) %s" % sql, params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+
+    def cached_count(self, queryset):
+        sql, params = queryset.order_by().query.sql_with_params()
+        key = "ara:count:%s" % hashlib.sha1(("%s %s" % (sql, params)).encode("utf-8")).hexdigest()
+        count = cache.get(key)
+        if count is None:
+            count = self.get_count(queryset)
+            cache.set(key, count, settings.PAGE_COUNT_CACHE_TIMEOUT)
+        return count
+
+    def get_next_link(self):
+        if not self.has_more:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+        return replace_query_param(url, self.offset_query_param, self.offset + self.limit)
+
+    def get_paginated_response(self, data):
+        if self.count_mode == "exact":
+            return super().get_paginated_response(data)
+        response = OrderedDict()
+        if self.count is not None:
+            response["count"] = self.count
+        response["has_more"] = self.has_more
+        response["next"] = self.get_next_link()
+        response["previous"] = self.get_previous_link()
+        response["results"] = data
+        return Response(response)
+
+
+class LimitOffsetOrCursorPagination(LimitOffsetPaginationWithCounts):
+    """
+    Paginates with limit and offset, counting as requested, unless "pagination=cursor" is requested.
+
+    Pages of the cursor pagination start after the last object of the previous
+    page instead of skipping over an offset: walking an entire table takes
+    linear time instead of quadratic time.
+    Objects are ordered by id, or by the ordering field and then id for objects
+    with the same value. The link to the next page has an opaque cursor and
+    there is no count, nor previous page.
+    """
+
+    pagination_query_param = "pagination"
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_mode = request.query_params.get(self.pagination_query_param) == "cursor"
+        if not self.cursor_mode:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.limit = self.get_limit(request)
+        if self.limit is None:
+            self.limit = self.default_limit
+        self.field, self.descending = self.get_ordering(queryset)
+        direction = "-" if self.descending else ""
+        queryset = queryset.order_by(direction + self.field, direction + "id")
+
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded:
+            queryset = queryset.filter(self.decode_cursor(queryset.model, encoded))
+
+        # The object after the page tells whether there is a next page
+        self.page = list(queryset[: self.limit + 1])
+        self.has_next = len(self.page) > self.limit
+        self.page = self.page[: self.limit]
+        return self.page
+
+    def get_ordering(self, queryset):
+        ordering = queryset.query.order_by or queryset.model._meta.ordering or ["id"]
+        if len(ordering) > 1 or not isinstance(ordering[0], str):
+            raise ValidationError({self.pagination_query_param: "Cursors require ordering by a single field."})
+        field = ordering[0].lstrip("-")
+        field = "id" if field == "pk" else field
+        try:
+            model_field = queryset.model._meta.get_field(field)
+        except FieldDoesNotExist:
+            raise ValidationError({self.pagination_query_param: "Cursors can't be ordered by %s." % field})
+        # Objects without a value would not be after or before any cursor
+        if model_field.null:
+            raise ValidationError({self.pagination_query_param: "Cursors can't be ordered by %s." % field})
+        return field, ordering[0].startswith("-")
+
+    def encode_cursor(self, obj):
+        position = [obj.id]
+        if self.field != "id":
+            field = obj._meta.get_field(self.field)
+            position.insert(0, field.value_to_string(obj))
+        return base64.urlsafe_b64encode(json.dumps(position).encode("utf-8")).decode("ascii")
+
+    def decode_cursor(self, model, encoded):
+        """
+        Returns the condition matching the objects after the position of the cursor
+        """
+        lookup = "lt" if self.descending else "gt"
+        try:
+            position = json.loads(base64.urlsafe_b64decode(encoded.encode("ascii")).decode("utf-8"))
+            if self.field == "id":
+                (last_id,) = position
+                return Q(**{"id__%s" % lookup: int(last_id)})
+            value, last_id = position
+            value = model._meta.get_field(self.field).to_python(value)
+            after = Q(**{"%s__%s" % (self.field, lookup): value})
+            return after | Q(**{self.field: value, "id__%s" % lookup: int(last_id)})
+        except (TypeError, ValueError, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not self.cursor_mode:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.offset_query_param)
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([("next", self.get_next_link()), ("results", data)]))
@@ -0,0 +1,45 @@
+# Copyright (c) 2020 The ARA Records Ansible authors
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+import io
+
+from django.conf import settings
+from rest_framework import exceptions, parsers, status
+
+from ara.clients import encoding
+
+
+class RequestEntityTooLarge(exceptions.APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = "Request body too large."
+    default_code = "request_entity_too_large"
+
+
+class JSONParser(parsers.JSONParser):
+    """
+    Parses JSON request bodies that can be compressed, as specified by the Content-Encoding header.
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        request = parser_context.get("request")
+        content_encoding = request.META.get("HTTP_CONTENT_ENCODING", "") if request is not None else ""
+        content_encoding = content_encoding.strip().lower()
+
+        if content_encoding not in ["", "identity"]:
+            if content_encoding not in encoding.compressions():
+                raise exceptions.UnsupportedMediaType(
+                    media_type, detail="Unsupported Content-Encoding: %s" % content_encoding
+                )
+            max_size = settings.DECOMPRESSED_BODY_MAX_SIZE or None
+            try:
+                stream = io.BytesIO(encoding.decompress(stream.read(), content_encoding, max_size=max_size))
+            except encoding.DecompressedSizeExceeded:
+                raise RequestEntityTooLarge(
+                    "The %s body decompresses to more than %s bytes (ARA_DECOMPRESSED_BODY_MAX_SIZE)"
+                    % (content_encoding, max_size)
+                )
+            except Exception as e:
+                raise exceptions.ParseError("Failed to decompress %s body: %s" % (content_encoding, e))
+
+        return super().parse(stream, media_type=media_type, parser_context=parser_context)
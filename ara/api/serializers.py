@@ -15,6 +15,10 @@
 #  You should have received a copy of the GNU General Public License
 #  along with ARA.  If not, see <http://www.gnu.org/licenses/>.
 
+from django.db import IntegrityError, transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 from rest_framework import serializers
 
 from ara.api import fields as ara_fields, models
@@ -53,11 +57,43 @@ class ItemCountSerializer(serializers.ModelSerializer):
 
     # For counting relationships to other objects
     items = serializers.SerializerMethodField()
+    item_types = ["plays", "tasks", "results", "hosts", "files", "records"]
 
-    @staticmethod
-    def get_items(obj):
-        types = ["plays", "tasks", "results", "hosts", "files", "records"]
-        items = {item: getattr(obj, item).count() for item in types if hasattr(obj, item)}
+    @classmethod
+    def count_items(cls, objects):
+        """
+        Counts the related objects of a list of objects (i.e, a page) with a single query
+        instead of a query per object and type of item.
+        """
+        if not objects:
+            return objects
+        model = type(objects[0])
+        counts = {}
+        for item in cls.item_types:
+            if hasattr(model, item):
+                relation = model._meta.get_field(item)
+                # The related objects are grouped by the object they belong to within the subquery only
+                related = relation.related_model.objects.filter(**{relation.field.name: OuterRef("pk")})
+                related = related.order_by().values(relation.field.name).annotate(count=Count("pk"))
+                counts["%s_count" % item] = Coalesce(Subquery(related.values("count")[:1]), 0)
+        if not counts:
+            return objects
+        queryset = model.objects.filter(pk__in=[obj.pk for obj in objects]).annotate(**counts)
+        rows = {row["pk"]: row for row in queryset.values("pk", *counts)}
+        for obj in objects:
+            for name in counts:
+                setattr(obj, name, rows[obj.pk][name])
+        return objects
+
+    @classmethod
+    def get_items(cls, obj):
+        # Objects that weren't provided to count_items, i.e, nested ones, are counted one type of item at a time
+        items = {}
+        for item in cls.item_types:
+            if hasattr(obj, "%s_count" % item):
+                items[item] = getattr(obj, "%s_count" % item)
+            elif hasattr(obj, item):
+                items[item] = getattr(obj, item).count()
         return items
 
 
@@ -262,6 +298,12 @@ class ListFileSerializer(FileSha1Serializer):
     playbook = serializers.PrimaryKeyRelatedField(read_only=True)
 
 
+class ListFileContentSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = models.FileContent
+        exclude = ("contents",)
+
+
 class ListRecordSerializer(serializers.ModelSerializer):
     class Meta:
         model = models.Record
@@ -270,19 +312,123 @@ class ListRecordSerializer(serializers.ModelSerializer):
     playbook = serializers.PrimaryKeyRelatedField(read_only=True)
 
 
+#######
+# Bulk serializers are used when receiving a list of objects in order to create
+# or update them with a minimal amount of queries.
+#######
+
+
+class BulkCreateListSerializer(serializers.ListSerializer):
+    """
+    Creates a list of objects with a single bulk_create.
+    Note that, depending on the database backend, the primary keys of the
+    objects might not be set after their creation.
+    """
+
+    def create(self, validated_data):
+        model = self.child.Meta.model
+        objects = [model(**item) for item in validated_data]
+        # bulk_create doesn't call save() where the duration would be computed
+        if issubclass(model, models.Duration):
+            for obj in objects:
+                obj.compute_duration()
+        return model.objects.bulk_create(objects)
+
+
+class BulkHostListSerializer(serializers.ListSerializer):
+    """
+    Gets or creates a list of hosts and updates them in bulk.
+    It is not run in a transaction, see HostViewSet.bulk.
+    bulk_create(ignore_conflicts=True) and bulk_update require Django 2.2.
+    """
+
+    def create(self, validated_data):
+        playbooks = set(item["playbook"].id for item in validated_data)
+        names = set(item["name"] for item in validated_data)
+
+        def existing_hosts():
+            queryset = models.Host.objects.filter(playbook__in=playbooks, name__in=names)
+            return {(host.playbook_id, host.name): host for host in queryset}
+
+        hosts = existing_hosts()
+        missing = {}
+        for item in validated_data:
+            key = (item["playbook"].id, item["name"])
+            if key not in hosts and key not in missing:
+                missing[key] = models.Host(**item)
+
+        if missing:
+            # Hosts might have been created concurrently, the existing ones are left untouched.
+            models.Host.objects.bulk_create(missing.values(), ignore_conflicts=True)
+            # Retrieve the hosts again since bulk_create doesn't return primary keys with every backend
+            hosts = existing_hosts()
+
+        return [hosts[(item["playbook"].id, item["name"])] for item in validated_data]
+
+    def update(self, instances, validated_data):
+        fields = set(["updated"])
+        now = timezone.now()
+        for instance, item in zip(instances, validated_data):
+            for attribute, value in item.items():
+                setattr(instance, attribute, value)
+                fields.add(attribute)
+            # bulk_update doesn't refresh auto_now fields
+            instance.updated = now
+
+        models.Host.objects.bulk_update(instances, fields)
+        return instances
+
+
 #######
 # Default serializers represents objects as they are modelized in the database.
 # They are used for creating/updating/destroying objects.
 #######
 
 
+class ClientUuidRelatedSerializer(serializers.ModelSerializer):
+    class Meta:
+        abstract = True
+
+    # Related objects can be referenced by their client_uuid instead of their id
+    serializer_related_field = ara_fields.ClientUuidRelatedField
+
+
+class ClientUuidSerializer(ClientUuidRelatedSerializer):
+    """
+    Creating an object with the client_uuid of an existing object returns the
+    existing object so that clients can safely retry.
+    """
+
+    class Meta:
+        abstract = True
+
+    # Declared explicitly to replace the unique validator by get or create
+    client_uuid = serializers.UUIDField(required=False, allow_null=True)
+
+    def create(self, validated_data):
+        client_uuid = validated_data.get("client_uuid")
+        if client_uuid is None:
+            return super().create(validated_data)
+
+        model = self.Meta.model
+        existing = model.objects.filter(client_uuid=client_uuid).first()
+        if existing is not None:
+            return existing
+        try:
+            with transaction.atomic():
+                return super().create(validated_data)
+        except IntegrityError:
+            # Created concurrently by another request
+            return model.objects.get(client_uuid=client_uuid)
+
+
 class LabelSerializer(serializers.ModelSerializer):
     class Meta:
         model = models.Label
         fields = "__all__"
 
 
-class PlaybookSerializer(serializers.ModelSerializer):
+class PlaybookSerializer(ClientUuidSerializer):
     class Meta:
         model = models.Playbook
         fields = "__all__"
@@ -293,13 +439,13 @@ class PlaybookSerializer(serializers.ModelSerializer):
     )
 
 
-class PlaySerializer(serializers.ModelSerializer):
+class PlaySerializer(ClientUuidSerializer):
     class Meta:
         model = models.Play
         fields = "__all__"
 
 
-class TaskSerializer(serializers.ModelSerializer):
+class TaskSerializer(ClientUuidSerializer):
     class Meta:
         model = models.Task
         fields = "__all__"
@@ -307,10 +453,11 @@ class TaskSerializer(serializers.ModelSerializer):
     tags = ara_fields.CompressedObjectField(default=ara_fields.EMPTY_LIST, help_text="A list containing Ansible tags")
 
 
-class HostSerializer(serializers.ModelSerializer):
+class HostSerializer(ClientUuidSerializer):
     class Meta:
         model = models.Host
         fields = "__all__"
+        list_serializer_class = BulkHostListSerializer
 
     facts = ara_fields.CompressedObjectField(default=ara_fields.EMPTY_DICT)
 
@@ -330,20 +477,28 @@ class HostSerializer(serializers.ModelSerializer):
         return host
 
 
-class ResultSerializer(serializers.ModelSerializer):
+class ResultSerializer(ClientUuidRelatedSerializer):
     class Meta:
         model = models.Result
         fields = "__all__"
+        list_serializer_class = BulkCreateListSerializer
 
     content = ara_fields.CompressedObjectField(default=ara_fields.EMPTY_DICT)
 
 
-class FileSerializer(FileSha1Serializer):
+class FileSerializer(FileSha1Serializer, ClientUuidSerializer):
     class Meta:
         model = models.File
         fields = "__all__"
 
-    content = ara_fields.FileContentField()
+    content = ara_fields.FileContentField(required=False)
+    # Existing contents can be referenced by their sha1 instead of being sent again
+    sha1 = ara_fields.FileContentSha1Field(source="content", required=False)
+
+    def validate(self, data):
+        if not self.partial and "content" not in data:
+            raise serializers.ValidationError({"content": "Either content or sha1 must be provided."})
+        return data
 
     def get_unique_together_validators(self):
         """
@@ -364,7 +519,7 @@ class FileSerializer(FileSha1Serializer):
         return file_
 
 
-class RecordSerializer(serializers.ModelSerializer):
+class RecordSerializer(ClientUuidRelatedSerializer):
     class Meta:
         model = models.Record
         fields = "__all__"
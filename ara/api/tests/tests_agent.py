@@ -0,0 +1,129 @@
+# Copyright (c) 2020 The ARA Records Ansible authors
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+import os
+import shutil
+import tempfile
+import threading
+from unittest import mock
+
+import requests
+from django.test import SimpleTestCase
+
+from ara.clients.agent import AgentResponse, AgentServer, AraAgentClient
+
+
+class RecordingClient(object):
+    """
+    API client recording the requests relayed by the agent
+    """
+
+    def __init__(self):
+        self.requests = []
+        # Amount of the next requests failing to connect to the API server
+        self.failures = 0
+        # Status of bulk results, 202 when the API server queues them
+        self.results_status = 201
+
+    def request(self, method, url, data=None, **kwargs):
+        if self.failures:
+            self.failures -= 1
+            raise requests.exceptions.ConnectionError("API server unavailable")
+        self.requests.append((method, url, data, kwargs))
+        if method == "delete":
+            return AgentResponse(204)
+        if url == "/api/v1/results/bulk":
+            return AgentResponse(self.results_status, dict(count=len(data)))
+        return AgentResponse(201 if method == "post" else 200, dict(id=1, url=url, data=data, **kwargs))
+
+
+class AgentTestCase(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "agent.sock")
+        self.upstream = RecordingClient()
+        # A large timeout so that results are only sent when flushing explicitly
+        self.server = AgentServer(self.path, self.upstream, batch_size=3, batch_timeout=60)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.client = AraAgentClient(path=self.path)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.directory)
+
+    def test_agent_socket_permissions(self):
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o600)
+
+    def test_agent_relays_requests(self):
+        host = self.client.post("/api/v1/hosts", name="agent", playbook=1)
+        self.assertEqual(host["data"], dict(name="agent", playbook=1))
+        self.assertEqual(self.upstream.requests, [("post", "/api/v1/hosts", dict(name="agent", playbook=1), {})])
+
+        playbooks = self.client.get("/api/v1/playbooks", status="failed")
+        self.assertEqual(playbooks["params"], dict(status="failed"))
+
+        response = self.client.delete("/api/v1/playbooks/1")
+        self.assertEqual(response.status_code, 204)
+
+    def test_agent_coalesces_results(self):
+        self.client.post("/api/v1/results", b'{"task": 1}')
+        self.client.post("/api/v1/results/bulk", [dict(task=2)])
+        # Results are acknowledged without being sent
+        self.assertEqual(self.upstream.requests, [])
+        self.server.flush()
+        self.assertEqual(self.upstream.requests, [("post", "/api/v1/results/bulk", [dict(task=1), dict(task=2)], {})])
+
+    def test_agent_flushes_results_before_delete(self):
+        self.client.post("/api/v1/results", task=1)
+        self.client.delete("/api/v1/playbooks/1")
+        self.assertEqual(
+            [request[:2] for request in self.upstream.requests],
+            [("post", "/api/v1/results/bulk"), ("delete", "/api/v1/playbooks/1")],
+        )
+
+    def test_agent_retries_results(self):
+        self.client.post("/api/v1/results", task=1)
+        self.upstream.failures = 1
+        self.assertFalse(self.server.flush())
+        self.assertGreater(self.server.retry_delay, 0)
+        self.client.post("/api/v1/results", task=2)
+
+        self.assertTrue(self.server.flush())
+        self.assertEqual(self.server.retry_delay, 0)
+        self.assertEqual(self.upstream.requests, [("post", "/api/v1/results/bulk", [dict(task=1), dict(task=2)], {})])
+
+    def test_agent_results_queued_by_server(self):
+        self.upstream.results_status = 202
+        self.server.retry_delay = 4
+        self.client.post("/api/v1/results", task=1)
+        with mock.patch.object(self.server.log, "error") as error:
+            self.assertTrue(self.server.flush())
+        error.assert_not_called()
+        self.assertEqual(self.server.retry_delay, 0)
+        self.assertEqual(len(self.upstream.requests), 1)
+
+    def test_agent_saves_pending_results(self):
+        self.client.post("/api/v1/results/bulk", [dict(task=1), dict(task=2)])
+        self.upstream.failures = 1
+        self.server.shutdown()
+        self.server.server_close()
+        self.assertTrue(os.path.exists(self.path + ".pending"))
+
+        # The next agent sends the results that were saved
+        upstream = RecordingClient()
+        server = AgentServer(self.path, upstream, batch_timeout=60)
+        self.addCleanup(server.server_close)
+        self.assertFalse(os.path.exists(self.path + ".pending"))
+        self.assertTrue(server.flush())
+        self.assertEqual(upstream.requests, [("post", "/api/v1/results/bulk", [dict(task=1), dict(task=2)], {})])
+
+    def test_agent_already_running(self):
+        with self.assertRaises(OSError):
+            AgentServer(self.path, self.upstream)
+
+    def test_agent_client_without_agent(self):
+        client = AraAgentClient(path=os.path.join(self.directory, "missing.sock"))
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            client.get("/api/v1/playbooks")
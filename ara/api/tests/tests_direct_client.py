@@ -0,0 +1,157 @@
+# Copyright (c) 2020 The ARA Records Ansible authors
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+import contextlib
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from django.db import connection
+from django.db.migrations.recorder import MigrationRecorder
+from django.test import SimpleTestCase
+from rest_framework.test import APITestCase
+
+from ara.api import models
+from ara.api.tests import factories
+from ara.clients.direct import AraDirectClient
+from ara.clients.offline import DatabaseWriter, configure_sqlite, latest_migration_applied, pending_migrations
+
+
+class DirectClientTestCase(APITestCase):
+    def setUp(self):
+        self.client = AraDirectClient(run_sql_migrations=False)
+
+    def test_direct_client_post(self):
+        playbook = factories.PlaybookFactory()
+        host = self.client.post("/api/v1/hosts", name="direct", playbook=playbook.id)
+        self.assertEqual(host["name"], "direct")
+        self.assertEqual(models.Host.objects.get(id=host["id"]).playbook.id, playbook.id)
+
+    def test_direct_client_post_list(self):
+        playbook = factories.PlaybookFactory()
+        hosts = self.client.post("/api/v1/hosts/bulk", [dict(name="one", playbook=playbook.id)])
+        self.assertEqual(hosts[0]["name"], "one")
+
+    def test_direct_client_get_with_params(self):
+        factories.PlaybookFactory(status="completed")
+        factories.PlaybookFactory(status="failed")
+        playbooks = self.client.get("/api/v1/playbooks", status="failed")
+        self.assertEqual(playbooks["count"], 1)
+        self.assertEqual(playbooks["results"][0]["status"], "failed")
+
+    def test_direct_client_returns_plain_types(self):
+        factories.PlaybookFactory()
+        playbooks = self.client.get("/api/v1/playbooks")
+        # i.e, Ansible copies lookup results with the constructor of their type
+        self.assertIs(type(playbooks), dict)
+        self.assertIs(type(playbooks["results"]), list)
+        self.assertIs(type(playbooks["results"][0]), dict)
+
+    def test_direct_client_patch(self):
+        playbook = factories.PlaybookFactory()
+        updated = self.client.patch("/api/v1/playbooks/%s" % playbook.id, name="patched")
+        self.assertEqual(updated["name"], "patched")
+
+    def test_direct_client_delete(self):
+        playbook = factories.PlaybookFactory()
+        response = self.client.delete("/api/v1/playbooks/%s" % playbook.id)
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(models.Playbook.objects.count(), 0)
+
+    def test_direct_client_not_found(self):
+        response = self.client.get("/api/v1/doesnotexist")
+        self.assertEqual(response, {"detail": "Not found."})
+
+    def test_direct_client_observers(self):
+        observed = []
+        self.client.observers.append(lambda *args: observed.append(args[:3]))
+        self.client.get("/api/v1/playbooks")
+        self.assertEqual(observed, [("get", "/api/v1/playbooks", 200)])
+
+    @mock.patch("django.core.management.execute_from_command_line")
+    def test_direct_client_without_pending_migrations(self, migrate):
+        self.assertEqual(pending_migrations(), [])
+        AraDirectClient(run_sql_migrations=True)
+        migrate.assert_not_called()
+
+    @mock.patch("django.db.migrations.executor.MigrationExecutor")
+    def test_pending_migrations_without_loading_migrations(self, executor):
+        self.assertTrue(latest_migration_applied())
+        self.assertEqual(pending_migrations(), [])
+        executor.assert_not_called()
+
+        # Migrations are only loaded when the latest one of the api wasn't applied
+        MigrationRecorder(connection).migration_qs.filter(app="api", name="0009_add_indexes").delete()
+        self.assertFalse(latest_migration_applied())
+        pending_migrations()
+        executor.assert_called_once_with(connection)
+
+    @mock.patch("django.core.management.execute_from_command_line")
+    @mock.patch("ara.clients.offline.pending_migrations", return_value=[("migration", False)])
+    def test_direct_client_with_pending_migrations(self, pending, migrate):
+        AraDirectClient(run_sql_migrations=True)
+        migrate.assert_called_once_with(["django", "migrate"])
+
+    def test_direct_client_sqlite_pragmas(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        database = sqlite3.connect(os.path.join(directory, "ansible.sqlite"))
+        self.addCleanup(database.close)
+        sqlite_connection = mock.Mock(vendor="sqlite")
+        sqlite_connection.cursor.return_value = contextlib.closing(database.cursor())
+
+        configure_sqlite(None, sqlite_connection)
+        self.assertEqual(database.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+        self.assertEqual(database.execute("PRAGMA synchronous").fetchone()[0], 1)
+        self.assertEqual(database.execute("PRAGMA busy_timeout").fetchone()[0], 30000)
+
+
+class DatabaseWriterTestCase(SimpleTestCase):
+    def setUp(self):
+        self.transactions = []
+        self.writer = DatabaseWriter(atomic=self.atomic)
+
+    @contextlib.contextmanager
+    def atomic(self):
+        self.transactions.append(threading.current_thread().name)
+        yield
+
+    def test_database_writer_returns_results(self):
+        self.assertEqual(self.writer.call(lambda value: value * 2, 21), 42)
+        with self.assertRaises(ZeroDivisionError):
+            self.writer.call(lambda: 1 / 0)
+        # One transaction and one savepoint per call
+        self.assertEqual(len(self.transactions), 4)
+
+    def test_database_writer_groups_requests(self):
+        results = {}
+
+        def submit(name, func):
+            try:
+                results[name] = self.writer.call(func)
+            except Exception as e:
+                results[name] = e
+
+        # Requests are queued while the writer is busy
+        with self.writer.lock:
+            threads = [
+                threading.Thread(target=submit, args=(name, func), name=name)
+                for name, func in [("one", lambda: 1), ("fails", lambda: 1 / 0), ("three", lambda: 3)]
+            ]
+            for thread in threads:
+                thread.start()
+            while self.writer.queue.qsize() < 3:
+                time.sleep(0.01)
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results["one"], 1)
+        self.assertIsInstance(results["fails"], ZeroDivisionError)
+        self.assertEqual(results["three"], 3)
+        # Everything was written by the same thread in a single transaction with a savepoint per request
+        self.assertEqual(len(self.transactions), 4)
+        self.assertEqual(len(set(self.transactions)), 1)
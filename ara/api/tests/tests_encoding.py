@@ -0,0 +1,89 @@
+# Copyright (c) 2020 The ARA Records Ansible authors
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+import json
+
+from django.test import SimpleTestCase
+
+from ara.clients import encoding
+
+
+class EncodingTestCase(SimpleTestCase):
+    def test_sanitize_strips_internal_keys(self):
+        result = {"_ansible_no_log": False, "changed": True, "results": [{"_ansible_item_label": "a", "item": "a"}]}
+        self.assertEqual(encoding.sanitize(result), {"changed": True, "results": [{"item": "a"}]})
+
+    def test_sanitize_copies(self):
+        result = {"facts": {"fact": "value"}, "items": ["a"]}
+        sanitized = encoding.sanitize(result)
+        sanitized["facts"]["fact"] = "changed"
+        sanitized["items"].append("b")
+        self.assertEqual(result, {"facts": {"fact": "value"}, "items": ["a"]})
+
+    def test_sanitize_keys(self):
+        sanitized = encoding.sanitize({1: "int", None: "none", False: "bool", 1.5: "float", "str": ("tuple",)})
+        self.assertEqual(sanitized, {"1": "int", "null": "none", "false": "bool", "1.5": "float", "str": ["tuple"]})
+        # Keys can be sorted once sanitized
+        self.assertEqual(encoding.dumps(sanitized), json.dumps(sanitized, sort_keys=True).encode())
+
+    def test_merge(self):
+        encoded = encoding.dumps({"status": "ok"})
+        self.assertEqual(json.loads(encoding.merge(encoded, host=1)), {"status": "ok", "host": 1})
+        self.assertEqual(json.loads(encoding.merge(b"{}", host=1)), {"host": 1})
+        self.assertEqual(encoding.merge(encoded), encoded)
+
+    def test_dumps_list(self):
+        items = [encoding.dumps({"id": 1}), encoding.dumps({"id": 2})]
+        self.assertEqual(json.loads(encoding.dumps_list(items)), [{"id": 1}, {"id": 2}])
+
+    def test_body(self):
+        self.assertEqual(encoding.body(b'{"id": 1}'), b'{"id": 1}')
+        self.assertEqual(json.loads(encoding.body([1, 2])), [1, 2])
+        self.assertEqual(json.loads(encoding.body(id=1)), {"id": 1})
+
+    def test_compress(self):
+        for algorithm in encoding.compressions():
+            compressed = encoding.compress(encoding.dumps({"id": 1}), algorithm)
+            self.assertEqual(json.loads(encoding.decompress(compressed, algorithm)), {"id": 1})
+
+    def test_decompress_max_size(self):
+        for algorithm in encoding.compressions():
+            compressed = encoding.compress(b"a" * 100000, algorithm)
+            self.assertEqual(len(encoding.decompress(compressed, algorithm, max_size=100000)), 100000)
+            with self.assertRaises(encoding.DecompressedSizeExceeded):
+                encoding.decompress(compressed, algorithm, max_size=99999)
+        with self.assertRaises(ValueError):
+            encoding.decompress(encoding.compress(b"a" * 100000)[:-10])
+
+    def test_compress_unsupported(self):
+        with self.assertRaises(ValueError):
+            encoding.compress(b"{}", "br")
+
+    def test_encode_result(self):
+        payload = {"status": "ok", "content": {"_ansible_no_log": False, "ansible_facts": {"ansible_env": {}}}}
+        encoded, facts = encoding.encode_result(payload, ignored_facts=["ansible_env"], facts=True)
+        expected = {"ansible_env": "Not saved by ARA as configured by 'ignored_facts'"}
+        self.assertEqual(json.loads(encoded), {"status": "ok", "content": {"ansible_facts": expected}})
+        self.assertEqual(json.loads(facts), {"facts": expected})
+
+    def test_encode_result_without_content(self):
+        payload = {"status": "ok", "content": {"stdout": "output", "ansible_facts": {"fact": "value"}}}
+        encoded, facts = encoding.encode_result(payload, facts=True, content=False)
+        self.assertEqual(json.loads(encoded), {"status": "ok", "content": {"msg": encoding.NOT_SAVED}})
+        # Facts are saved regardless
+        self.assertEqual(json.loads(facts), {"facts": {"fact": "value"}})
+
+    def test_encode_result_truncated(self):
+        content = {
+            "stdout": "a" * 10,
+            "stdout_lines": ["a" * 4, "b" * 4, "c" * 4],
+            "stderr": "short",
+            "results": [{"stdout": "b" * 10}],
+        }
+        encoded, facts = encoding.encode_result({"status": "ok", "content": content}, max_size=6)
+        truncated = json.loads(encoded)["content"]
+        self.assertEqual(truncated["stdout"], "a" * 6 + "\n" + encoding.TRUNCATED % 4)
+        self.assertEqual(truncated["stdout_lines"], ["a" * 4, encoding.TRUNCATED % 8])
+        self.assertEqual(truncated["stderr"], "short")
+        self.assertEqual(truncated["results"][0]["stdout"], "b" * 6 + "\n" + encoding.TRUNCATED % 4)
+        self.assertIsNone(facts)
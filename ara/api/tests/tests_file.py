@@ -68,6 +68,32 @@ class FileTestCase(APITestCase):
         self.assertEqual(201, request.status_code)
         self.assertEqual(1, models.File.objects.count())
 
+    def test_create_file_with_sha1(self):
+        file_content = factories.FileContentFactory()
+        playbook = factories.PlaybookFactory()
+        request = self.client.post(
+            "/api/v1/files", {"path": "/path/playbook.yml", "sha1": file_content.sha1, "playbook": playbook.id}
+        )
+        self.assertEqual(201, request.status_code)
+        self.assertEqual(request.data["sha1"], file_content.sha1)
+        self.assertEqual(request.data["content"], factories.FILE_CONTENTS)
+        self.assertEqual(1, models.FileContent.objects.count())
+
+    def test_create_file_with_unknown_sha1(self):
+        playbook = factories.PlaybookFactory()
+        request = self.client.post(
+            "/api/v1/files", {"path": "/path/playbook.yml", "sha1": utils.sha1("unknown"), "playbook": playbook.id}
+        )
+        self.assertEqual(400, request.status_code)
+        self.assertIn("sha1", request.data)
+        self.assertEqual(0, models.File.objects.count())
+
+    def test_create_file_without_content(self):
+        playbook = factories.PlaybookFactory()
+        request = self.client.post("/api/v1/files", {"path": "/path/playbook.yml", "playbook": playbook.id})
+        self.assertEqual(400, request.status_code)
+        self.assertIn("content", request.data)
+
     def test_post_same_file_for_a_playbook(self):
         playbook = factories.PlaybookFactory()
         self.assertEqual(0, models.File.objects.count())
@@ -99,6 +125,21 @@ class FileTestCase(APITestCase):
         self.assertEqual(file.path, request.data["path"])
         self.assertEqual(file.content.sha1, request.data["sha1"])
 
+    def test_get_files_queries(self):
+        for i in range(3):
+            factories.FileFactory()
+        for limit in [1, 3]:
+            with self.assertNumQueries(2):
+                request = self.client.get("/api/v1/files?limit=%s" % limit)
+            self.assertEqual(limit, len(request.data["results"]))
+
+    def test_get_file_queries(self):
+        file = factories.FileFactory()
+        # file with its playbook and content, labels and items of the playbook
+        with self.assertNumQueries(3):
+            request = self.client.get("/api/v1/files/%s" % file.id)
+        self.assertEqual(request.data["content"], factories.FILE_CONTENTS)
+
     def test_update_file(self):
         playbook = factories.PlaybookFactory()
         file = factories.FileFactory(playbook=playbook)
@@ -17,10 +17,30 @@
 
 from rest_framework.test import APITestCase
 
-from ara.api.tests import factories
+from ara.api.tests import factories, utils
 
 
 class FileContentTestCase(APITestCase):
     def test_file_content_factory(self):
         file_content = factories.FileContentFactory(sha1="413a2f16b8689267b7d0c2e10cdd19bf3e54208d")
         self.assertEqual(file_content.sha1, "413a2f16b8689267b7d0c2e10cdd19bf3e54208d")
+
+    def test_get_file_contents(self):
+        file_content = factories.FileContentFactory()
+        request = self.client.get("/api/v1/file_contents")
+        self.assertEqual(1, len(request.data["results"]))
+        self.assertEqual(file_content.sha1, request.data["results"][0]["sha1"])
+        self.assertNotIn("contents", request.data["results"][0])
+
+    def test_get_file_contents_by_sha1(self):
+        file_content = factories.FileContentFactory()
+        request = self.client.get("/api/v1/file_contents?sha1=%s" % file_content.sha1)
+        self.assertEqual(1, request.data["count"])
+        self.assertEqual(file_content.id, request.data["results"][0]["id"])
+
+        request = self.client.get("/api/v1/file_contents?sha1=%s" % utils.sha1("unknown"))
+        self.assertEqual(0, request.data["count"])
+
+    def test_file_contents_are_read_only(self):
+        request = self.client.post("/api/v1/file_contents", {"sha1": utils.sha1("new"), "contents": "new"})
+        self.assertEqual(405, request.status_code)
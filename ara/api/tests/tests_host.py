@@ -87,6 +87,47 @@ class HostTestCase(APITestCase):
         self.assertEqual(201, request.status_code)
         self.assertEqual(1, models.Host.objects.count())
 
+    def test_bulk_get_or_create_hosts(self):
+        playbook = factories.PlaybookFactory()
+        existing = factories.HostFactory(name="existing", playbook=playbook)
+        hosts = [
+            {"name": "existing", "playbook": playbook.id},
+            {"name": "new", "playbook": playbook.id},
+            {"name": "new", "playbook": playbook.id},
+        ]
+        request = self.client.post("/api/v1/hosts/bulk", hosts)
+        self.assertEqual(201, request.status_code)
+        self.assertEqual(2, models.Host.objects.count())
+        self.assertEqual(["existing", "new", "new"], [host["name"] for host in request.data])
+        self.assertEqual(existing.id, request.data[0]["id"])
+        self.assertEqual(request.data[1]["id"], request.data[2]["id"])
+
+    def test_bulk_update_hosts(self):
+        playbook = factories.PlaybookFactory()
+        first = factories.HostFactory(name="first", playbook=playbook)
+        second = factories.HostFactory(name="second", playbook=playbook)
+        updates = [
+            {"id": first.id, "ok": 5, "changed": 2},
+            {"id": second.id, "failed": 1, "facts": {"ansible_fqdn": "second"}},
+        ]
+        request = self.client.patch("/api/v1/hosts/bulk", updates)
+        self.assertEqual(200, request.status_code)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((5, 2, 0), (first.ok, first.changed, first.failed))
+        self.assertEqual((0, 0, 1), (second.ok, second.changed, second.failed))
+        self.assertEqual(second.facts, utils.compressed_obj({"ansible_fqdn": "second"}))
+        self.assertEqual(first.facts, utils.compressed_obj(factories.HOST_FACTS))
+
+    def test_bulk_update_hosts_requires_ids(self):
+        host = factories.HostFactory()
+        request = self.client.patch("/api/v1/hosts/bulk", [{"id": host.id, "ok": 1}, {"ok": 2}])
+        self.assertEqual(400, request.status_code)
+        request = self.client.patch("/api/v1/hosts/bulk", [{"id": 9999, "ok": 1}])
+        self.assertEqual(400, request.status_code)
+        host.refresh_from_db()
+        self.assertEqual(0, host.ok)
+
     def test_partial_update_host(self):
         host = factories.HostFactory()
         self.assertNotEqual("foo", host.name)
@@ -100,6 +141,13 @@ class HostTestCase(APITestCase):
         request = self.client.get("/api/v1/hosts/%s" % host.id)
         self.assertEqual(host.name, request.data["name"])
 
+    def test_get_host_queries(self):
+        host = factories.HostFactory()
+        # host with its playbook, labels and items of the playbook
+        with self.assertNumQueries(3):
+            request = self.client.get("/api/v1/hosts/%s" % host.id)
+        self.assertEqual(request.data["playbook"]["items"]["hosts"], 1)
+
     def test_get_hosts_by_playbook(self):
         playbook = factories.PlaybookFactory()
         host = factories.HostFactory(name="host1", playbook=playbook)
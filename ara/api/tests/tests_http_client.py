@@ -0,0 +1,91 @@
+# Copyright (c) 2020 The ARA Records Ansible authors
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+import time
+
+import requests
+from django.test import SimpleTestCase
+
+from ara.clients.http import AraHttpClient, CircuitBreaker, CircuitOpen, DeadlineExceeded
+
+
+class CircuitBreakerTestCase(SimpleTestCase):
+    def test_circuit_breaker_opens_after_failures(self):
+        breaker = CircuitBreaker(failures=2, reset=30)
+        breaker.record(False, 0.1)
+        self.assertEqual(breaker.state, "closed")
+        self.assertTrue(breaker.allow())
+        breaker.record(False, 0.1)
+        self.assertEqual(breaker.state, "open")
+        self.assertFalse(breaker.allow())
+
+    def test_circuit_breaker_success_resets_failures(self):
+        breaker = CircuitBreaker(failures=2)
+        breaker.record(False, 0.1)
+        breaker.record(True, 0.1)
+        breaker.record(False, 0.1)
+        self.assertEqual(breaker.state, "closed")
+
+    def test_circuit_breaker_slow_requests_are_failures(self):
+        breaker = CircuitBreaker(failures=1, slow=1)
+        breaker.record(True, 0.5)
+        self.assertEqual(breaker.state, "closed")
+        breaker.record(True, 1.5)
+        self.assertEqual(breaker.state, "open")
+
+    def test_circuit_breaker_half_open(self):
+        breaker = CircuitBreaker(failures=1, reset=0)
+        breaker.record(False, 0.1)
+        # A single request is allowed to find out if the API is available again
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        self.assertEqual(breaker.state, "half-open")
+        breaker.record(False, 0.1)
+        self.assertTrue(breaker.allow())
+        breaker.record(True, 0.1)
+        self.assertEqual(breaker.state, "closed")
+        self.assertTrue(breaker.allow())
+
+
+class HttpClientTestCase(SimpleTestCase):
+    def setUp(self):
+        # Nothing listens on this port, requests fail right away
+        self.client = AraHttpClient(endpoint="http://127.0.0.1:9", timeout=1, breaker_failures=2, breaker_reset=30)
+
+    def test_http_client_circuit_open(self):
+        observed = []
+        self.client.observers.append(lambda *args: observed.append(args[:3]))
+        for attempt in range(2):
+            with self.assertRaises(requests.exceptions.ConnectionError):
+                self.client.get("/api/v1/playbooks")
+        with self.assertRaises(CircuitOpen):
+            self.client.get("/api/v1/playbooks")
+        # The request was not sent
+        self.assertEqual(len(observed), 2)
+
+    def test_http_client_deadline(self):
+        with self.client.deadline(0.01):
+            time.sleep(0.02)
+            with self.assertRaises(DeadlineExceeded):
+                self.client.post("/api/v1/playbooks", name="deadline")
+        self.assertIsNone(self.client.local.deadline)
+
+    def test_http_client_nested_deadline(self):
+        with self.client.deadline(10):
+            outer = self.client.local.deadline
+            with self.client.deadline(60):
+                self.assertEqual(self.client.local.deadline, outer)
+            self.assertEqual(self.client.local.deadline, outer)
+
+    def test_http_client_after_fork(self):
+        observed = []
+        self.client.observers.append(lambda *args: observed.append(args[:3]))
+        session = self.client.client.http
+        # As if the request was sent by a forked process
+        self.client.pid = -1
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            self.client.get("/api/v1/playbooks")
+        # The forked process has its own connections and doesn't act on behalf of the observers of its parent
+        self.assertIsNot(self.client.client.http, session)
+        self.assertEqual(observed, [])
+        self.assertIsNone(self.client.breaker)
@@ -0,0 +1,110 @@
+# Copyright (c) 2020 The ARA Records Ansible authors
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+import datetime
+from unittest import mock
+
+from django.db import DatabaseError
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from ara.api import ingest, models
+from ara.api.tests import factories, utils
+
+
+@override_settings(INGEST_QUEUE=True)
+class IngestTestCase(APITestCase):
+    def setUp(self):
+        # Without an interval, there is no background thread: results are committed when flushing
+        self.queue = ingest.IngestQueue(batch_size=2, interval=None)
+        patcher = mock.patch.object(ingest, "get_queue", return_value=self.queue)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.task = factories.TaskFactory()
+        self.host = factories.HostFactory(playbook=self.task.playbook)
+        self.started = timezone.now()
+        self.ended = self.started + datetime.timedelta(seconds=10)
+        self.result = {
+            "content": factories.RESULT_CONTENTS,
+            "status": "ok",
+            "host": self.host.id,
+            "task": self.task.id,
+            "play": self.task.play.id,
+            "playbook": self.task.playbook.id,
+            "started": self.started.isoformat(),
+            "ended": self.ended.isoformat(),
+        }
+
+    def test_ingest_result(self):
+        request = self.client.post("/api/v1/results", self.result)
+        self.assertEqual(202, request.status_code)
+        self.assertEqual(request.data["status"], "ok")
+        self.assertEqual(0, models.Result.objects.count())
+
+        request = self.client.get("/api/v1/results/ingest")
+        self.assertEqual(request.data, dict(enabled=True, depth=1, committed=0, failed=0))
+
+        # Reading results waits for the queued results to be committed
+        request = self.client.get("/api/v1/results?task=%s" % self.task.id)
+        self.assertEqual(1, request.data["count"])
+        result = models.Result.objects.get()
+        self.assertEqual(result.duration, self.ended - self.started)
+        self.assertEqual(result.content, utils.compressed_obj(factories.RESULT_CONTENTS))
+
+        request = self.client.get("/api/v1/results/ingest")
+        self.assertEqual(request.data, dict(enabled=True, depth=0, committed=1, failed=0))
+
+    def test_ingest_bulk_results(self):
+        results = [dict(self.result, status=status) for status in ["ok", "failed", "skipped"]]
+        request = self.client.post("/api/v1/results/bulk", results)
+        self.assertEqual(202, request.status_code)
+        self.assertEqual(3, request.data["count"])
+        self.assertEqual(0, models.Result.objects.count())
+
+        # Any other request waits for the queued results to be committed, in batches
+        with mock.patch.object(self.queue, "_commit", wraps=self.queue._commit) as commit:
+            self.client.patch("/api/v1/tasks/%s" % self.task.id, {"status": "completed"})
+        self.assertEqual([len(call[0][0]) for call in commit.call_args_list], [2, 1])
+        self.assertEqual(1, models.Result.objects.filter(status="failed").count())
+
+    def test_ingest_invalid_results(self):
+        request = self.client.post("/api/v1/results/bulk", [self.result, dict(self.result, host=9999)])
+        self.assertEqual(400, request.status_code)
+        self.assertEqual(0, self.queue.status()["depth"])
+
+    def test_ingest_failed_batch(self):
+        related = dict(host=self.host, task=self.task, play=self.task.play, playbook=self.task.playbook)
+        results = [factories.ResultFactory.build(**related) for i in range(2)]
+        bulk_create = models.Result.objects.bulk_create
+
+        def fail_batches(objects):
+            if len(objects) > 1:
+                raise DatabaseError("batch failed")
+            return bulk_create(objects)
+
+        self.queue.put(results)
+        with mock.patch.object(models.Result.objects, "bulk_create", side_effect=fail_batches):
+            self.queue.flush()
+        # Every result is retried on its own
+        self.assertEqual(2, models.Result.objects.count())
+        self.assertEqual(self.queue.status(), dict(depth=0, committed=2, failed=0))
+
+    def test_ingest_without_interval(self):
+        queue = ingest.IngestQueue(batch_size=2, interval=0)
+        with mock.patch.object(queue.condition, "wait_for") as wait_for, mock.patch.object(
+            queue, "flush", side_effect=SystemExit
+        ), mock.patch.object(ingest, "close_old_connections"):
+            with self.assertRaises(SystemExit):
+                queue._flush_periodically()
+        # The worker waits for a full batch rather than spinning
+        self.assertIsNone(wait_for.call_args[1]["timeout"])
+
+    @override_settings(INGEST_QUEUE=False)
+    def test_ingest_disabled(self):
+        request = self.client.post("/api/v1/results", self.result)
+        self.assertEqual(201, request.status_code)
+        self.assertEqual(1, models.Result.objects.count())
+        request = self.client.get("/api/v1/results/ingest")
+        self.assertEqual(request.data, dict(enabled=False, depth=0, committed=0, failed=0))
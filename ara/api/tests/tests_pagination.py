@@ -0,0 +1,161 @@
+# Copyright (c) 2020 The ARA Records Ansible authors
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+import datetime
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from ara.api import pagination
+from ara.api.tests import factories
+from ara.clients.direct import AraDirectClient
+from ara.clients.utils import walk
+
+
+class CursorPaginationTestCase(APITestCase):
+    def setUp(self):
+        self.playbook = factories.PlaybookFactory()
+        now = timezone.now()
+        # Playbooks share the same started timestamp two by two to exercise the id tie-breaker
+        self.playbooks = [self.playbook] + [
+            factories.PlaybookFactory(started=now - datetime.timedelta(seconds=i // 2)) for i in range(6)
+        ]
+
+    def walk_pages(self, url):
+        ids = []
+        pages = 0
+        while url:
+            request = self.client.get(url)
+            self.assertEqual(200, request.status_code)
+            self.assertEqual(["next", "results"], list(request.data.keys()))
+            ids.extend(obj["id"] for obj in request.data["results"])
+            url = request.data["next"]
+            pages += 1
+        return ids, pages
+
+    def test_limit_offset_pagination_by_default(self):
+        request = self.client.get("/api/v1/playbooks?limit=2&offset=2")
+        self.assertEqual(7, request.data["count"])
+        self.assertEqual(2, len(request.data["results"]))
+
+    def test_cursor_pagination_by_id(self):
+        ids, pages = self.walk_pages("/api/v1/playbooks?pagination=cursor&limit=3")
+        self.assertEqual(ids, sorted([playbook.id for playbook in self.playbooks], reverse=True))
+        self.assertEqual(3, pages)
+
+    def test_cursor_pagination_by_field(self):
+        ids, pages = self.walk_pages("/api/v1/playbooks?pagination=cursor&order=started&limit=2")
+        expected = sorted(self.playbooks, key=lambda playbook: (playbook.started, playbook.id))
+        self.assertEqual(ids, [playbook.id for playbook in expected])
+        self.assertEqual(4, pages)
+
+    def test_cursor_pagination_with_filters(self):
+        factories.ResultFactory.create_batch(5, playbook=self.playbook, status="failed")
+        factories.ResultFactory.create_batch(2, playbook=self.playbook, status="ok")
+        ids, pages = self.walk_pages("/api/v1/results?pagination=cursor&status=failed&limit=2")
+        self.assertEqual(5, len(ids))
+        self.assertEqual(3, pages)
+
+    def test_cursor_pagination_queries(self):
+        # A page is retrieved without counting the objects
+        with self.assertNumQueries(1):
+            self.client.get("/api/v1/hosts?pagination=cursor&limit=2")
+
+    def test_cursor_pagination_with_nullable_ordering(self):
+        request = self.client.get("/api/v1/playbooks?pagination=cursor&order=-duration")
+        self.assertEqual(400, request.status_code)
+
+    def test_cursor_pagination_with_invalid_cursor(self):
+        request = self.client.get("/api/v1/playbooks?pagination=cursor&order=started&cursor=invalid")
+        self.assertEqual(404, request.status_code)
+
+    def test_walk(self):
+        client = AraDirectClient(run_sql_migrations=False)
+        factories.ResultFactory.create_batch(5, playbook=self.playbook, status="failed")
+        factories.ResultFactory(status="failed")
+        results = list(walk(client, "/api/v1/results?playbook=%s" % self.playbook.id, status="failed", limit=2))
+        self.assertEqual(5, len(results))
+        self.assertEqual(5, len(set(result["id"] for result in results)))
+
+
+class CountPaginationTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        factories.PlaybookFactory.create_batch(5)
+
+    def test_exact_count(self):
+        request = self.client.get("/api/v1/playbooks?limit=2&count=exact")
+        self.assertEqual(["count", "next", "previous", "results"], list(request.data.keys()))
+        self.assertEqual(5, request.data["count"])
+
+    def test_no_count(self):
+        with self.assertNumQueries(1):
+            request = self.client.get("/api/v1/hosts?limit=2&count=none")
+        self.assertEqual(["has_more", "next", "previous", "results"], list(request.data.keys()))
+
+        request = self.client.get("/api/v1/playbooks?limit=2&count=none")
+        self.assertTrue(request.data["has_more"])
+        self.assertEqual(2, len(request.data["results"]))
+
+        request = self.client.get(request.data["next"])
+        request = self.client.get(request.data["next"])
+        self.assertFalse(request.data["has_more"])
+        self.assertIsNone(request.data["next"])
+        self.assertEqual(1, len(request.data["results"]))
+
+    def test_cached_count(self):
+        request = self.client.get("/api/v1/playbooks?limit=2&count=cached")
+        self.assertEqual(5, request.data["count"])
+        self.assertTrue(request.data["has_more"])
+
+        # The count isn't updated until the cache expires, except on the last page
+        factories.PlaybookFactory()
+        request = self.client.get("/api/v1/playbooks?limit=2&count=cached")
+        self.assertEqual(5, request.data["count"])
+        request = self.client.get("/api/v1/playbooks?limit=2&offset=4&count=cached")
+        self.assertEqual(6, request.data["count"])
+        self.assertFalse(request.data["has_more"])
+
+    def test_cached_count_with_filters(self):
+        factories.PlaybookFactory.create_batch(3, status="failed")
+        request = self.client.get("/api/v1/playbooks?limit=2&count=cached")
+        self.assertEqual(8, request.data["count"])
+        request = self.client.get("/api/v1/playbooks?limit=2&count=cached&status=failed")
+        self.assertEqual(3, request.data["count"])
+
+    def test_estimated_count(self):
+        # Databases without planner statistics fall back to a cached count
+        with mock.patch.object(
+            pagination.LimitOffsetPaginationWithCounts, "cached_count", return_value=10
+        ) as cached_count:
+            request = self.client.get("/api/v1/playbooks?limit=2&count=estimate")
+        cached_count.assert_called_once()
+        self.assertEqual(10, request.data["count"])
+        self.assertTrue(request.data["has_more"])
+
+    def test_invalid_count(self):
+        request = self.client.get("/api/v1/playbooks?count=invalid")
+        self.assertEqual(400, request.status_code)
+
+    @override_settings(PAGE_COUNT="none")
+    def test_default_count(self):
+        request = self.client.get("/api/v1/playbooks")
+        self.assertNotIn("count", request.data)
+        self.assertFalse(request.data["has_more"])
+
+    def test_ui_count(self):
+        request = self.client.get("/?limit=2&count=none")
+        self.assertContains(request, "<strong>1-2</strong>")
+        self.assertContains(request, "of <strong>many</strong>")
+
+        request = self.client.get("/?limit=2&offset=4&count=none")
+        self.assertContains(request, "<strong>5-5</strong>")
+        self.assertNotContains(request, "of <strong>")
+
+        with mock.patch.object(pagination.LimitOffsetPaginationWithCounts, "cached_count", return_value=9):
+            request = self.client.get("/?limit=2&count=cached")
+        self.assertContains(request, "of <strong>~9</strong>")
@@ -0,0 +1,55 @@
+# Copyright (c) 2020 The ARA Records Ansible authors
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+import gzip
+import json
+
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from ara.api import models
+from ara.api.tests import factories
+from ara.clients import encoding
+
+
+class JSONParserTestCase(APITestCase):
+    def _post_host(self, body, content_encoding):
+        return self.client.generic(
+            "POST", reverse("host-list"), body, content_type="application/json", HTTP_CONTENT_ENCODING=content_encoding
+        )
+
+    def test_parse_gzip_body(self):
+        playbook = factories.PlaybookFactory()
+        body = gzip.compress(json.dumps({"name": "compressed", "playbook": playbook.id}).encode())
+        request = self._post_host(body, "gzip")
+        self.assertEqual(201, request.status_code)
+        self.assertEqual(models.Host.objects.get().name, "compressed")
+
+    def test_parse_identity_body(self):
+        playbook = factories.PlaybookFactory()
+        request = self._post_host(json.dumps({"name": "identity", "playbook": playbook.id}), "identity")
+        self.assertEqual(201, request.status_code)
+
+    def test_parse_invalid_gzip_body(self):
+        request = self._post_host(b"not gzip", "gzip")
+        self.assertEqual(400, request.status_code)
+        self.assertEqual(models.Host.objects.count(), 0)
+
+    def test_parse_unsupported_encoding(self):
+        request = self._post_host(b"compressed", "br")
+        self.assertEqual(415, request.status_code)
+
+    @override_settings(DECOMPRESSED_BODY_MAX_SIZE=1024)
+    def test_parse_oversized_body(self):
+        playbook = factories.PlaybookFactory()
+        body = json.dumps({"name": "a" * 2048, "playbook": playbook.id}).encode()
+        for algorithm in encoding.compressions():
+            request = self._post_host(encoding.compress(body, algorithm), algorithm)
+            self.assertEqual(413, request.status_code)
+        self.assertEqual(models.Host.objects.count(), 0)
+
+        body = json.dumps({"name": "small", "playbook": playbook.id}).encode()
+        for algorithm in encoding.compressions():
+            request = self._post_host(encoding.compress(body, algorithm), algorithm)
+            self.assertEqual(201, request.status_code)
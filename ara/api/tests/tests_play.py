@@ -56,6 +56,26 @@ class PlayTestCase(APITestCase):
         self.assertEqual(1, len(request.data["results"]))
         self.assertEqual(play.name, request.data["results"][0]["name"])
 
+    def test_get_plays_items(self):
+        play = factories.PlayFactory()
+        task = factories.TaskFactory(play=play, playbook=play.playbook)
+        factories.ResultFactory(play=play, task=task, playbook=play.playbook)
+        factories.PlayFactory()
+
+        request = self.client.get("/api/v1/plays")
+        self.assertEqual(request.data["results"][0]["items"], dict(tasks=0, results=0))
+        self.assertEqual(request.data["results"][1]["items"], dict(tasks=1, results=1))
+        request = self.client.get("/api/v1/plays/%s" % play.id)
+        self.assertEqual(request.data["items"], dict(tasks=1, results=1))
+
+    def test_get_plays_queries(self):
+        # count, page and items of the page regardless of the amount of plays
+        for i in range(3):
+            factories.PlayFactory(playbook=factories.PlaybookFactory())
+            with self.assertNumQueries(3):
+                request = self.client.get("/api/v1/plays")
+            self.assertEqual(i + 1, len(request.data["results"]))
+
     def test_delete_play(self):
         play = factories.PlayFactory()
         self.assertEqual(1, models.Play.objects.all().count())
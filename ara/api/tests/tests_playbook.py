@@ -67,6 +67,31 @@ class PlaybookTestCase(APITestCase):
         playbook = request.data["results"][0]
         self.assertEqual(playbook["ansible_version"], expected_playbook.ansible_version)
 
+    def test_get_playbooks_items(self):
+        playbook = factories.PlaybookFactory()
+        play = factories.PlayFactory(playbook=playbook)
+        task = factories.TaskFactory(playbook=playbook, play=play, file=factories.FileFactory(playbook=playbook))
+        host = factories.HostFactory(playbook=playbook)
+        factories.ResultFactory(playbook=playbook, play=play, task=task, host=host)
+        factories.RecordFactory(playbook=playbook)
+        factories.PlaybookFactory()
+
+        expected = dict(plays=1, tasks=1, results=1, hosts=1, files=1, records=1)
+        request = self.client.get("/api/v1/playbooks")
+        self.assertEqual(request.data["results"][0]["items"], {item: 0 for item in expected})
+        self.assertEqual(request.data["results"][1]["items"], expected)
+        request = self.client.get("/api/v1/playbooks/%s" % playbook.id)
+        self.assertEqual(request.data["items"], expected)
+
+    def test_get_playbooks_queries(self):
+        # count, page, labels and items of the page regardless of the amount of playbooks
+        for i in range(3):
+            playbook = factories.PlaybookFactory()
+            playbook.labels.add(factories.LabelFactory(name="label%s" % i))
+            with self.assertNumQueries(4):
+                request = self.client.get("/api/v1/playbooks")
+            self.assertEqual(i + 1, len(request.data["results"]))
+
     def test_delete_playbook(self):
         playbook = factories.PlaybookFactory()
         self.assertEqual(1, models.Playbook.objects.all().count())
@@ -95,6 +120,50 @@ class PlaybookTestCase(APITestCase):
         self.assertEqual(request.data["status"], "running")
         self.assertEqual(sorted([label["name"] for label in request.data["labels"]]), sorted(labels))
 
+    def test_create_playbook_with_client_uuid(self):
+        data = {
+            "ansible_version": "2.4.0",
+            "status": "running",
+            "path": "/path/playbook.yml",
+            "client_uuid": "2d3c0e5e-1d8e-4f6b-9a4c-07d6a0f2f1b1",
+        }
+        request = self.client.post("/api/v1/playbooks", data)
+        self.assertEqual(201, request.status_code)
+        self.assertEqual(request.data["client_uuid"], data["client_uuid"])
+
+        # Creating the same playbook again returns the existing one
+        retry = self.client.post("/api/v1/playbooks", data)
+        self.assertEqual(201, retry.status_code)
+        self.assertEqual(retry.data["id"], request.data["id"])
+        self.assertEqual(1, models.Playbook.objects.count())
+
+    def test_get_playbook_by_client_uuid(self):
+        playbook = factories.PlaybookFactory(client_uuid="2d3c0e5e-1d8e-4f6b-9a4c-07d6a0f2f1b1")
+        request = self.client.get("/api/v1/playbooks/2d3c0e5e-1d8e-4f6b-9a4c-07d6a0f2f1b1")
+        self.assertEqual(200, request.status_code)
+        self.assertEqual(playbook.id, request.data["id"])
+
+        request = self.client.patch("/api/v1/playbooks/2d3c0e5e-1d8e-4f6b-9a4c-07d6a0f2f1b1", {"status": "completed"})
+        self.assertEqual(200, request.status_code)
+        self.assertEqual("completed", models.Playbook.objects.get(id=playbook.id).status)
+
+        request = self.client.get("/api/v1/playbooks/2a1d8f7c-59a4-4c5e-8a7e-4ba7b4c4b7a2")
+        self.assertEqual(404, request.status_code)
+        request = self.client.get("/api/v1/playbooks/notanid")
+        self.assertEqual(404, request.status_code)
+
+    def test_get_playbook_by_invalid_lookup(self):
+        # Playbooks recorded without a client_uuid must not be matched by invalid lookups
+        factories.PlaybookFactory.create_batch(2, client_uuid=None)
+        for method in ["get", "patch", "delete"]:
+            request = getattr(self.client, method)("/api/v1/playbooks/notanid")
+            self.assertEqual(404, request.status_code)
+        self.assertEqual(2, models.Playbook.objects.count())
+
+        models.Playbook.objects.first().delete()
+        request = self.client.get("/api/v1/playbooks/notanid")
+        self.assertEqual(404, request.status_code)
+
     def test_partial_update_playbook(self):
         playbook = factories.PlaybookFactory()
         self.assertNotEqual("completed", playbook.status)
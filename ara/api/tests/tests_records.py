@@ -50,6 +50,13 @@ class RecordTestCase(APITestCase):
         self.assertEqual(1, len(request.data["results"]))
         self.assertEqual(record.key, request.data["results"][0]["key"])
 
+    def test_get_record_queries(self):
+        record = factories.RecordFactory()
+        # record with its playbook, labels and items of the playbook
+        with self.assertNumQueries(3):
+            request = self.client.get("/api/v1/records/%s" % record.id)
+        self.assertEqual(request.data["playbook"]["items"]["records"], 1)
+
     def test_delete_record(self):
         record = factories.RecordFactory()
         self.assertEqual(1, models.Record.objects.all().count())
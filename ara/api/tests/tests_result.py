@@ -115,6 +115,42 @@ class ResultTestCase(APITestCase):
         self.assertEqual(request.data["ignore_errors"], False)
         self.assertEqual(1, models.Result.objects.count())
 
+    def test_bulk_create_results(self):
+        host = factories.HostFactory()
+        task = factories.TaskFactory()
+        started = timezone.now()
+        ended = started + datetime.timedelta(seconds=10)
+        result = {
+            "content": factories.RESULT_CONTENTS,
+            "status": "ok",
+            "host": host.id,
+            "task": task.id,
+            "play": task.play.id,
+            "playbook": task.playbook.id,
+            "started": started.isoformat(),
+            "ended": ended.isoformat(),
+        }
+        request = self.client.post("/api/v1/results/bulk", [result, dict(result, status="failed")])
+        self.assertEqual(201, request.status_code)
+        self.assertEqual(2, request.data["count"])
+        self.assertEqual(2, models.Result.objects.count())
+        self.assertEqual(1, models.Result.objects.filter(status="failed").count())
+        for created in models.Result.objects.all():
+            self.assertEqual(created.duration, ended - started)
+            self.assertEqual(created.content, utils.compressed_obj(factories.RESULT_CONTENTS))
+
+    def test_bulk_create_results_is_atomic(self):
+        host = factories.HostFactory()
+        task = factories.TaskFactory()
+        result = {"status": "ok", "host": host.id, "task": task.id, "play": task.play.id, "playbook": task.playbook.id}
+        request = self.client.post("/api/v1/results/bulk", [result, dict(result, host=9999)])
+        self.assertEqual(400, request.status_code)
+        self.assertEqual(0, models.Result.objects.count())
+
+    def test_bulk_create_results_requires_a_list(self):
+        request = self.client.post("/api/v1/results/bulk", {"status": "ok"})
+        self.assertEqual(400, request.status_code)
+
     def test_partial_update_result(self):
         result = factories.ResultFactory()
         self.assertNotEqual("unreachable", result.status)
@@ -128,6 +164,22 @@ class ResultTestCase(APITestCase):
         request = self.client.get("/api/v1/results/%s" % result.id)
         self.assertEqual(result.status, request.data["status"])
 
+    def test_get_results_queries(self):
+        for i in range(3):
+            factories.ResultFactory()
+        for limit in [1, 3]:
+            with self.assertNumQueries(2):
+                request = self.client.get("/api/v1/results?limit=%s" % limit)
+            self.assertEqual(limit, len(request.data["results"]))
+
+    def test_get_result_queries(self):
+        result = factories.ResultFactory()
+        # result with its playbook, play, task, file and host, labels and items of the playbook, play and task
+        with self.assertNumQueries(5):
+            request = self.client.get("/api/v1/results/%s" % result.id)
+        self.assertEqual(request.data["task"]["path"], result.task.file.path)
+        self.assertEqual(request.data["task"]["items"], dict(results=1))
+
     def test_get_result_by_association(self):
         # Create two results in necessarily two different playbooks with different children:
         # playbook -> play -> task -> result <- host
@@ -0,0 +1,172 @@
+# Copyright (c) 2020 The ARA Records Ansible authors
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+import json
+import shutil
+import tempfile
+import uuid
+from unittest import mock
+
+from ansible.playbook.play import Play
+from ansible.playbook.task import Task
+from rest_framework.test import APITestCase
+
+from ara.api import models
+from ara.api.tests import utils
+from ara.clients.direct import AraDirectClient
+from ara.clients.spool import AraSpoolClient, JournalReplay, ReplayError
+from ara.plugins.action import ara_record
+
+
+class SpoolTestCase(APITestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.spool = AraSpoolClient(directory=self.directory)
+        self.addCleanup(self.spool.close)
+
+    def _record_playbook(self):
+        playbook = self.spool.post(
+            "/api/v1/playbooks", ansible_version="2.9", arguments={}, status="running", path="/playbook.yml"
+        )
+        self.spool.patch("/api/v1/playbooks/%s" % playbook["id"], labels=["journal"])
+        file_ = self.spool.post("/api/v1/files", playbook=playbook["id"], path="/playbook.yml", content="---")
+        play = self.spool.post(
+            "/api/v1/plays", name="play", status="running", uuid=str(uuid.uuid4()), playbook=playbook["id"]
+        )
+        task = self.spool.post(
+            "/api/v1/tasks",
+            name="task",
+            action="setup",
+            status="running",
+            lineno=1,
+            handler=False,
+            play=play["id"],
+            playbook=playbook["id"],
+            file=file_["id"],
+        )
+        hosts = self.spool.post("/api/v1/hosts/bulk", [dict(name="one", playbook=playbook["id"])])
+        host = self.spool.post("/api/v1/hosts", name="two", playbook=playbook["id"])
+        results = [
+            dict(playbook=playbook["id"], play=play["id"], task=task["id"], host=hosts[0]["id"], status="ok"),
+            dict(playbook=playbook["id"], play=play["id"], task=task["id"], host=host["id"], status="failed"),
+        ]
+        self.spool.post("/api/v1/results/bulk", results[:1])
+        self.spool.post("/api/v1/results", **results[1])
+        self.spool.patch("/api/v1/hosts/bulk", [dict(id=hosts[0]["id"], facts={"fact": "value"})])
+        self.spool.patch("/api/v1/tasks/%s" % task["id"], status="completed")
+        self.spool.patch("/api/v1/playbooks/%s" % playbook["id"], status="completed")
+        return playbook
+
+    def test_spool_responses(self):
+        playbook = self._record_playbook()
+        self.assertEqual(playbook["id"], 1)
+        self.assertEqual(playbook["status"], "completed")
+        self.assertEqual(playbook["labels"], [{"name": "journal"}])
+        # Hosts are retrieved if they already exist
+        host = self.spool.post("/api/v1/hosts", name="one", playbook=playbook["id"])
+        self.assertEqual(host["id"], 1)
+        self.assertEqual(self.spool.get("/api/v1/playbooks")["count"], 1)
+        # Objects that aren't kept in memory can't be queried
+        self.assertEqual(self.spool.get("/api/v1/hosts")["count"], 0)
+
+    def test_spool_queries(self):
+        playbook = self._record_playbook()
+        plays = self.spool.get("/api/v1/plays?playbook=%s" % playbook["id"], limit=1)
+        self.assertEqual(plays["count"], 1)
+        self.assertEqual(plays["results"][0]["name"], "play")
+        self.assertEqual(self.spool.get("/api/v1/plays", name="other")["count"], 0)
+        self.assertEqual(self.spool.get("/api/v1/playbooks/%s" % playbook["id"])["status"], "completed")
+        self.assertEqual(self.spool.get("/api/v1/playbooks/42"), dict(detail="Not found."))
+
+    def test_ara_record(self):
+        play = Play()
+        playbook = self.spool.post(
+            "/api/v1/playbooks", ansible_version="2.9", arguments={}, status="running", path="/playbook.yml"
+        )
+        self.spool.post("/api/v1/plays", name="play", status="running", uuid=play._uuid, playbook=playbook["id"])
+
+        # ara_record looks up the playbook from the play of the task
+        task = Task()
+        task._parent = mock.Mock(_play=play)
+        action = ara_record.ActionModule(
+            task, mock.Mock(), mock.Mock(check_mode=False), mock.Mock(), mock.Mock(), mock.Mock()
+        )
+        task.args = dict(key="key", value="value")
+        result = action.run(task_vars={})
+        self.assertNotIn("failed", result)
+        self.assertEqual(result["playbook_id"], playbook["id"])
+        task.args = dict(key="key", value="updated")
+        self.assertTrue(action.run(task_vars={})["changed"])
+
+        JournalReplay(AraDirectClient(run_sql_migrations=False)).replay(self.spool.path)
+        record = models.Record.objects.get()
+        self.assertEqual(record.key, "key")
+        self.assertEqual(record.playbook, models.Playbook.objects.get())
+
+    def test_spool_journal(self):
+        self._record_playbook()
+        with open(self.spool.path) as journal:
+            records = [json.loads(line) for line in journal]
+        self.assertEqual(records[0]["format"], "ara-spool")
+        self.assertEqual(records[1]["method"], "post")
+        self.assertEqual(records[1]["url"], "/api/v1/playbooks")
+        self.assertEqual(records[-1]["method"], "patch")
+        self.assertEqual(records[-1]["id"], 1)
+
+    def test_replay(self):
+        self._record_playbook()
+        replay = JournalReplay(AraDirectClient(run_sql_migrations=False), batch_size=10)
+        replay.replay(self.spool.path)
+
+        playbook = models.Playbook.objects.get()
+        self.assertEqual(playbook.status, "completed")
+        self.assertEqual([label.name for label in playbook.labels.all()], ["journal"])
+        self.assertEqual(models.Task.objects.get().status, "completed")
+        self.assertEqual(models.Host.objects.count(), 2)
+        self.assertEqual(models.Host.objects.get(name="one").facts, utils.compressed_obj({"fact": "value"}))
+        self.assertEqual(models.Result.objects.count(), 2)
+        self.assertEqual(models.Result.objects.get(status="failed").host.name, "two")
+        # Both results are sent in a single request
+        self.assertEqual(replay.requests, 11)
+
+    def test_replay_resumes_after_failure(self):
+        self._record_playbook()
+        client = AraDirectClient(run_sql_migrations=False)
+        post = client.post
+
+        def failing_post(url, data=None, **kwargs):
+            # The second batch of results fails to be sent
+            if url == "/api/v1/results/bulk" and models.Result.objects.exists():
+                return dict(detail="unavailable")
+            return post(url, data, **kwargs)
+
+        with mock.patch.object(client, "post", side_effect=failing_post):
+            with self.assertRaises(ReplayError):
+                JournalReplay(client, batch_size=1).replay(self.spool.path)
+        self.assertEqual(models.Result.objects.count(), 1)
+        self.assertEqual(models.Task.objects.get().status, "running")
+
+        replay = JournalReplay(client, batch_size=1)
+        replay.replay(self.spool.path)
+        self.assertEqual(models.Playbook.objects.count(), 1)
+        self.assertEqual(models.Play.objects.count(), 1)
+        self.assertEqual(models.Task.objects.get().status, "completed")
+        self.assertEqual(models.Host.objects.count(), 2)
+        self.assertEqual(models.Result.objects.count(), 2)
+        self.assertEqual(models.Result.objects.get(status="failed").host.name, "two")
+        # The failed results, then the updates of hosts, the task and the playbook
+        self.assertEqual(replay.requests, 4)
+
+        # Nothing is sent again once a journal has been replayed
+        replay = JournalReplay(client)
+        replay.replay(self.spool.path)
+        self.assertEqual(replay.requests, 0)
+        self.assertEqual(models.Result.objects.count(), 2)
+
+    def test_replay_unsupported_journal(self):
+        path = "%s/invalid.ndjson" % self.directory
+        with open(path, "w") as journal:
+            journal.write(json.dumps(dict(format="something")) + "\n")
+        with self.assertRaises(ReplayError):
+            JournalReplay(AraDirectClient(run_sql_migrations=False)).replay(path)
@@ -0,0 +1,217 @@
+# Copyright (c) 2020 The ARA Records Ansible authors
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+import datetime
+import os
+import shutil
+import sqlite3
+import tempfile
+import uuid
+
+from django.db import connection
+from django.db.migrations.recorder import MigrationRecorder
+from rest_framework.test import APITestCase
+
+from ara.clients.direct import AraDirectClient
+from ara.clients.sqlite import AraSqliteClient, SqliteError
+
+TABLES = [
+    "labels",
+    "playbooks",
+    "playbooks_labels",
+    "file_contents",
+    "files",
+    "records",
+    "plays",
+    "tasks",
+    "hosts",
+    "results",
+]
+
+
+class SqliteClientTestCase(APITestCase):
+    def setUp(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("The sqlite client is compared with a sqlite database")
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, "ansible.sqlite")
+        self.client = AraSqliteClient(database=self.path)
+        self.addCleanup(self.client.close)
+
+    def _rows(self, cursor, table):
+        # Timestamps of creation and modification are different every time
+        cursor.execute('SELECT * FROM "%s" ORDER BY id' % table)
+        columns = [description[0] for description in cursor.description]
+        return [
+            {
+                # Django parses the dates it stores as strings
+                column: str(value) if isinstance(value, datetime.datetime) else value
+                for column, value in zip(columns, row)
+                if column not in ["created", "updated"]
+            }
+            for row in cursor.fetchall()
+        ]
+
+    def _record_playbook(self, client):
+        playbook = client.post(
+            "/api/v1/playbooks",
+            ansible_version="2.9",
+            arguments={"check": False},
+            status="running",
+            path="/playbook.yml",
+            started="2020-01-01T10:00:00Z",
+        )
+        client.patch("/api/v1/playbooks/%s" % playbook["id"], labels=["one", "two"], name="playbook")
+        client.patch("/api/v1/playbooks/%s" % playbook["id"], labels=["two", "three"])
+        file_ = client.post("/api/v1/files", playbook=playbook["id"], path="/playbook.yml", content="---")
+        client.post("/api/v1/files", playbook=playbook["id"], path="/tasks.yml", sha1=file_["sha1"])
+        play = client.post(
+            "/api/v1/plays",
+            name="play",
+            status="running",
+            uuid="c9a4b5d4-8f5a-4ab2-9b7b-8a0a3e1f3c11",
+            playbook=playbook["id"],
+            started="2020-01-01T10:00:01Z",
+        )
+        task = client.post(
+            "/api/v1/tasks",
+            name="task",
+            action="setup",
+            status="running",
+            lineno=1,
+            handler=False,
+            tags=["facts"],
+            play=play["id"],
+            file=file_["id"],
+            playbook=playbook["id"],
+            started="2020-01-01T10:00:02.123456Z",
+            client_uuid="5d9cc7e8-1b0c-4b36-a9f0-3c6b3f1d2a01",
+        )
+        hosts = client.post("/api/v1/hosts/bulk", [dict(name=name, playbook=playbook["id"]) for name in ["a", "b"]])
+        results = [
+            dict(
+                playbook=playbook["id"],
+                play=play["id"],
+                # Objects can be referenced by the client_uuid they were created with
+                task="5d9cc7e8-1b0c-4b36-a9f0-3c6b3f1d2a01",
+                host=host["id"],
+                content={"msg": host["name"]},
+                status="ok",
+                changed=host["name"] == "a",
+                started="2020-01-01T10:00:02.5Z",
+                ended="2020-01-01T10:00:03.75Z",
+            )
+            for host in hosts
+        ]
+        client.post("/api/v1/results", results[0])
+        client.post("/api/v1/results/bulk", results[1:])
+        client.patch("/api/v1/hosts/bulk", [dict(id=hosts[0]["id"], ok=1, changed=1, facts={"os": "linux"})])
+        client.patch("/api/v1/hosts/%s" % hosts[1]["id"], ok=1)
+        client.patch("/api/v1/tasks/%s" % task["id"], status="completed", ended="2020-01-01T10:00:04Z")
+        client.patch("/api/v1/plays/%s" % play["id"], status="completed", ended="2020-01-01T10:00:05Z")
+        client.post("/api/v1/records", playbook=playbook["id"], key="key", value={"a": [1]}, type="dict")
+        client.patch("/api/v1/playbooks/%s" % playbook["id"], status="completed", ended="2020-01-01T10:01:00.000001Z")
+        return playbook
+
+    def test_sqlite_client_schema(self):
+        # The database must be the same as one migrated by Django
+        query = "SELECT type, name, tbl_name, sql FROM sqlite_master"
+        with connection.cursor() as cursor:
+            cursor.execute(query)
+            expected = sorted(cursor.fetchall(), key=str)
+        database = sqlite3.connect(self.path)
+        self.addCleanup(database.close)
+        self.assertEqual(sorted(database.execute(query).fetchall(), key=str), expected)
+
+        applied = database.execute("SELECT app, name FROM django_migrations").fetchall()
+        self.assertEqual(sorted(applied), sorted(MigrationRecorder(connection).applied_migrations()))
+
+    def test_sqlite_client_stores_like_api(self):
+        self._record_playbook(AraDirectClient(run_sql_migrations=False))
+        playbook = self._record_playbook(self.client)
+        labels = self.client.get("/api/v1/playbooks/%s" % playbook["id"])["labels"]
+        self.assertEqual(labels, [dict(id=2, name="two"), dict(id=3, name="three")])
+
+        database = sqlite3.connect(self.path)
+        self.addCleanup(database.close)
+        with connection.cursor() as cursor:
+            for table in TABLES:
+                self.assertEqual(self._rows(database.cursor(), table), self._rows(cursor, table), table)
+
+    def test_sqlite_client_reads(self):
+        playbook = self._record_playbook(self.client)
+        play = self.client.get("/api/v1/plays?uuid=c9a4b5d4-8f5a-4ab2-9b7b-8a0a3e1f3c11")
+        self.assertEqual(play["count"], 1)
+        self.assertEqual(play["results"][0]["playbook"], playbook["id"])
+        self.assertEqual(play["results"][0]["duration"], "00:00:04")
+
+        records = self.client.get("/api/v1/records", playbook=playbook["id"], key="key")
+        record = self.client.get("/api/v1/records/%s" % records["results"][0]["id"])
+        self.assertEqual(record["value"], {"a": [1]})
+        self.assertEqual(self.client.get("/api/v1/records", key="missing")["count"], 0)
+
+    def test_sqlite_client_filters_like_api(self):
+        direct = AraDirectClient(run_sql_migrations=False)
+        self._record_playbook(direct)
+        self._record_playbook(self.client)
+        queries = [
+            "/api/v1/tasks?name=TAS",
+            "/api/v1/tasks?playbook=1&name=other",
+            "/api/v1/tasks?path=playbook&action=SETUP",
+            "/api/v1/playbooks?label=two&status=failed&status=completed",
+            "/api/v1/playbooks?label=one",
+            "/api/v1/results?order=-started&status=ok&changed=true",
+            "/api/v1/results?started_after=2020-01-01T10:00:00Z&ended_before=2020-01-02T00:00:00Z",
+            "/api/v1/hosts?order=name&failed__lt=1&name=a",
+            "/api/v1/hosts?ok__gt=0",
+            "/api/v1/files?path=.YML",
+            "/api/v1/files?path=%25.yml",
+            "/api/v1/hosts?limit=1&offset=1&order=-id",
+        ]
+        for query in queries:
+            expected = [obj["id"] for obj in direct.get(query)["results"]]
+            self.assertEqual([obj["id"] for obj in self.client.get(query)["results"]], expected, query)
+
+        page = self.client.get("/api/v1/hosts", limit=1, order="name")
+        self.assertEqual((page["count"], page["results"][0]["name"], page["previous"]), (2, "a", None))
+        page = self.client.get(page["next"])
+        self.assertEqual((page["results"][0]["name"], page["next"]), ("b", None))
+
+    def test_sqlite_client_unsupported_filters(self):
+        self.assertIn("Unsupported filter", self.client.get("/api/v1/tasks", unknown="value")["detail"])
+        self.assertIn("Unsupported ordering", self.client.get("/api/v1/tasks", order="action")["detail"])
+
+    def test_sqlite_client_existing_database(self):
+        playbook = self.client.post("/api/v1/playbooks", ansible_version="2.9", path="/playbook.yml")
+        client = AraSqliteClient(database=self.path)
+        self.addCleanup(client.close)
+        self.assertEqual(client.get("/api/v1/playbooks/%s" % playbook["id"])["path"], "/playbook.yml")
+
+        # Migrations of other apps depend on the versions of Django and its extensions
+        database = sqlite3.connect(self.path)
+        database.execute("DELETE FROM django_migrations WHERE app = 'auth' AND name = '0011_update_proxy_permissions'")
+        database.execute("INSERT INTO django_migrations (app, name, applied) VALUES ('auth', '0012_unknown', '')")
+        database.commit()
+        database.close()
+        AraSqliteClient(database=self.path).close()
+
+        database = sqlite3.connect(self.path)
+        database.execute("INSERT INTO django_migrations (app, name, applied) VALUES ('api', '9999_unknown', '')")
+        database.commit()
+        database.close()
+        with self.assertRaises(SqliteError):
+            AraSqliteClient(database=self.path)
+
+        database = sqlite3.connect(self.path)
+        database.execute("DELETE FROM django_migrations WHERE name IN ('9999_unknown', '0008_add_client_uuid')")
+        database.commit()
+        database.close()
+        with self.assertRaises(SqliteError):
+            AraSqliteClient(database=self.path)
+
+    def test_sqlite_client_errors(self):
+        response = self.client.post("/api/v1/tasks", name="task", play=uuid.uuid4().hex)
+        self.assertIn("does not exist", response["detail"])
+        response = self.client.post("/api/v1/files", playbook=1, path="/playbook.yml", sha1="0" * 40)
+        self.assertIn("contents must be provided", response["detail"])
@@ -114,6 +114,49 @@ class TaskTestCase(APITestCase):
         self.assertEqual(201, request.status_code)
         self.assertEqual(1, models.Task.objects.count())
 
+    def test_create_task_with_client_uuid_references(self):
+        play = factories.PlayFactory(client_uuid="7a4a3b0e-5d0e-4f7f-8b39-5f5b4f1c8a01")
+        file = factories.FileFactory(client_uuid="7a4a3b0e-5d0e-4f7f-8b39-5f5b4f1c8a02")
+        playbook = play.playbook
+        playbook.client_uuid = "7a4a3b0e-5d0e-4f7f-8b39-5f5b4f1c8a03"
+        playbook.save()
+        request = self.client.post(
+            "/api/v1/tasks",
+            {
+                "name": "create",
+                "action": "test",
+                "lineno": 2,
+                "handler": False,
+                "status": "running",
+                "play": str(play.client_uuid),
+                "file": str(file.client_uuid),
+                "playbook": str(playbook.client_uuid),
+                "client_uuid": "7a4a3b0e-5d0e-4f7f-8b39-5f5b4f1c8a04",
+            },
+        )
+        self.assertEqual(201, request.status_code)
+        task = models.Task.objects.get(client_uuid="7a4a3b0e-5d0e-4f7f-8b39-5f5b4f1c8a04")
+        self.assertEqual(task.play.id, play.id)
+        self.assertEqual(task.file.id, file.id)
+        self.assertEqual(task.playbook.id, playbook.id)
+
+    def test_create_task_with_unknown_client_uuid_reference(self):
+        task = factories.TaskFactory()
+        request = self.client.post(
+            "/api/v1/tasks",
+            {
+                "name": "create",
+                "action": "test",
+                "lineno": 2,
+                "handler": False,
+                "play": "7a4a3b0e-5d0e-4f7f-8b39-5f5b4f1c8a01",
+                "file": task.file.id,
+                "playbook": task.playbook.id,
+            },
+        )
+        self.assertEqual(400, request.status_code)
+        self.assertIn("play", request.data)
+
     def test_partial_update_task(self):
         task = factories.TaskFactory()
         self.assertNotEqual("update", task.name)
@@ -136,6 +179,23 @@ class TaskTestCase(APITestCase):
         request = self.client.get("/api/v1/tasks/%s" % task.id)
         self.assertEqual(task.name, request.data["name"])
 
+    def test_get_tasks_queries(self):
+        # count, page with files and items of the page regardless of the page size
+        for i in range(3):
+            factories.TaskFactory()
+        for limit in [1, 3]:
+            with self.assertNumQueries(3):
+                request = self.client.get("/api/v1/tasks?limit=%s" % limit)
+            self.assertEqual(limit, len(request.data["results"]))
+
+    def test_get_task_queries(self):
+        task = factories.TaskFactory()
+        # task with its playbook, play and file, labels and items of the task, playbook and play
+        with self.assertNumQueries(5):
+            request = self.client.get("/api/v1/tasks/%s" % task.id)
+        self.assertEqual(request.data["file"]["sha1"], task.file.content.sha1)
+        self.assertEqual(request.data["playbook"]["items"]["tasks"], 1)
+
     def test_get_tasks_by_playbook(self):
         playbook = factories.PlaybookFactory()
         task = factories.TaskFactory(name="task1", playbook=playbook)
@@ -27,6 +27,7 @@ router.register("tasks", views.TaskViewSet, basename="task")
 router.register("hosts", views.HostViewSet, basename="host")
 router.register("results", views.ResultViewSet, basename="result")
 router.register("files", views.FileViewSet, basename="file")
+router.register("file_contents", views.FileContentViewSet, basename="filecontent")
 router.register("records", views.RecordViewSet, basename="record")
 
 urlpatterns = router.urls
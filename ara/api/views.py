@@ -15,9 +15,61 @@
 #  You should have received a copy of the GNU General Public License
 #  along with ARA.  If not, see <http://www.gnu.org/licenses/>.
 
-from rest_framework import viewsets
+import uuid
 
-from ara.api import filters, models, serializers
+from django.conf import settings
+from django.db import transaction
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from ara.api import filters, ingest, models, serializers
+
+
+class ClientUuidLookupMixin(object):
+    """
+    Retrieves objects by their id or by the client_uuid they were created with
+    """
+
+    def get_object(self):
+        lookup = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+        if lookup.isdigit():
+            return super().get_object()
+        try:
+            client_uuid = uuid.UUID(lookup)
+        except ValueError:
+            # Objects created without a client_uuid must not be matched by a lookup that is neither an id nor an uuid
+            raise Http404
+        obj = get_object_or_404(self.filter_queryset(self.get_queryset()), client_uuid=client_uuid)
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+
+class ItemCountMixin(object):
+    """
+    Counts the items related to the objects that are returned with a single query
+    """
+
+    # Related objects that are serialized along with their items when retrieving an object
+    item_count_relations = []
+
+    def get_object(self):
+        obj = super().get_object()
+        if self.action == "retrieve":
+            if issubclass(self.get_serializer_class(), serializers.ItemCountSerializer):
+                serializers.ItemCountSerializer.count_items([obj])
+            for relation in self.item_count_relations:
+                serializers.ItemCountSerializer.count_items([getattr(obj, relation)])
+        return obj
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        if page is not None and issubclass(self.get_serializer_class(), serializers.ItemCountSerializer):
+            serializers.ItemCountSerializer.count_items(page)
+        return page
 
 
 class LabelViewSet(viewsets.ModelViewSet):
@@ -34,14 +86,17 @@ class LabelViewSet(viewsets.ModelViewSet):
             return serializers.LabelSerializer
 
 
-class PlaybookViewSet(viewsets.ModelViewSet):
+class PlaybookViewSet(ItemCountMixin, ClientUuidLookupMixin, viewsets.ModelViewSet):
     filterset_class = filters.PlaybookFilter
 
     def get_queryset(self):
+        queryset = models.Playbook.objects.all()
         statuses = self.request.GET.getlist("status")
         if statuses:
-            return models.Playbook.objects.filter(status__in=statuses).order_by("-id")
-        return models.Playbook.objects.all().order_by("-id")
+            queryset = queryset.filter(status__in=statuses)
+        if self.action in ["list", "retrieve"]:
+            queryset = queryset.prefetch_related("labels")
+        return queryset.order_by("-id")
 
     def get_serializer_class(self):
         if self.action == "list":
@@ -53,14 +108,18 @@ class PlaybookViewSet(viewsets.ModelViewSet):
             return serializers.PlaybookSerializer
 
 
-class PlayViewSet(viewsets.ModelViewSet):
+class PlayViewSet(ItemCountMixin, ClientUuidLookupMixin, viewsets.ModelViewSet):
     filterset_class = filters.PlayFilter
+    item_count_relations = ["playbook"]
 
     def get_queryset(self):
+        queryset = models.Play.objects.all()
         statuses = self.request.GET.getlist("status")
         if statuses:
-            return models.Play.objects.filter(status__in=statuses).order_by("-id")
-        return models.Play.objects.all().order_by("-id")
+            queryset = queryset.filter(status__in=statuses)
+        if self.action == "retrieve":
+            queryset = queryset.select_related("playbook").prefetch_related("playbook__labels")
+        return queryset.order_by("-id")
 
     def get_serializer_class(self):
         if self.action == "list":
@@ -72,14 +131,21 @@ class PlayViewSet(viewsets.ModelViewSet):
             return serializers.PlaySerializer
 
 
-class TaskViewSet(viewsets.ModelViewSet):
+class TaskViewSet(ItemCountMixin, ClientUuidLookupMixin, viewsets.ModelViewSet):
     filterset_class = filters.TaskFilter
+    item_count_relations = ["playbook", "play"]
 
     def get_queryset(self):
+        queryset = models.Task.objects.all()
         statuses = self.request.GET.getlist("status")
         if statuses:
-            return models.Task.objects.filter(status__in=statuses).order_by("-id")
-        return models.Task.objects.all().order_by("-id")
+            queryset = queryset.filter(status__in=statuses)
+        if self.action == "list":
+            queryset = queryset.select_related("file")
+        elif self.action == "retrieve":
+            queryset = queryset.select_related("playbook", "play", "file__content").defer("file__content__contents")
+            queryset = queryset.prefetch_related("playbook__labels")
+        return queryset.order_by("-id")
 
     def get_serializer_class(self):
         if self.action == "list":
@@ -91,9 +157,15 @@ class TaskViewSet(viewsets.ModelViewSet):
             return serializers.TaskSerializer
 
 
-class HostViewSet(viewsets.ModelViewSet):
-    queryset = models.Host.objects.all()
+class HostViewSet(ItemCountMixin, ClientUuidLookupMixin, viewsets.ModelViewSet):
     filterset_class = filters.HostFilter
+    item_count_relations = ["playbook"]
+
+    def get_queryset(self):
+        queryset = models.Host.objects.all()
+        if self.action == "retrieve":
+            queryset = queryset.select_related("playbook").prefetch_related("playbook__labels")
+        return queryset
 
     def get_serializer_class(self):
         if self.action == "list":
@@ -104,15 +176,48 @@ class HostViewSet(viewsets.ModelViewSet):
             # create/update/destroy
             return serializers.HostSerializer
 
+    @action(detail=False, methods=["post", "patch"])
+    def bulk(self, request):
+        """
+        Gets or creates (POST) or partially updates (PATCH) a list of hosts.
+        Hosts to update are identified by their id and updated in a single transaction.
+        """
+        if request.method == "POST":
+            serializer = self.get_serializer(data=request.data, many=True)
+            serializer.is_valid(raise_exception=True)
+            # Not in a transaction: a transaction reading the existing hosts before creating the missing ones
+            # would fail with "database is locked" on SQLite when there are concurrent writers.
+            # Getting or creating hosts is idempotent and bulk_create is atomic on its own.
+            hosts = serializer.save()
+            return Response(serializers.ListHostSerializer(hosts, many=True).data, status=status.HTTP_201_CREATED)
+
+        if not isinstance(request.data, list):
+            raise ValidationError({"non_field_errors": ["Expected a list of items."]})
+        ids = [item.get("id") if isinstance(item, dict) else None for item in request.data]
+        hosts = models.Host.objects.in_bulk([host_id for host_id in ids if host_id is not None])
+        if None in ids or len(hosts) != len(set(ids)):
+            raise ValidationError({"id": ["Every item must have the id of an existing host."]})
+        instances = [hosts[host_id] for host_id in ids]
+        serializer = self.get_serializer(instances, data=request.data, many=True, partial=True)
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            hosts = serializer.save()
+        return Response(serializers.ListHostSerializer(hosts, many=True).data, status=status.HTTP_200_OK)
 
-class ResultViewSet(viewsets.ModelViewSet):
+
+class ResultViewSet(ItemCountMixin, viewsets.ModelViewSet):
     filterset_class = filters.ResultFilter
+    item_count_relations = ["playbook", "play", "task"]
 
     def get_queryset(self):
+        queryset = models.Result.objects.all()
         statuses = self.request.GET.getlist("status")
         if statuses:
-            return models.Result.objects.filter(status__in=statuses).order_by("-id")
-        return models.Result.objects.all().order_by("-id")
+            queryset = queryset.filter(status__in=statuses)
+        if self.action == "retrieve":
+            queryset = queryset.select_related("playbook", "play", "task__file", "host")
+            queryset = queryset.prefetch_related("playbook__labels")
+        return queryset.order_by("-id")
 
     def get_serializer_class(self):
         if self.action == "list":
@@ -123,10 +228,63 @@ class ResultViewSet(viewsets.ModelViewSet):
             # create/update/destroy
             return serializers.ResultSerializer
 
+    def _enqueue(self, serializer):
+        # Results are created later, in bulk, and don't have an id yet
+        items = serializer.validated_data
+        if not isinstance(items, list):
+            items = [items]
+        results = [models.Result(**item) for item in items]
+        for result in results:
+            result.compute_duration()
+        ingest.get_queue().put(results)
+        return results
+
+    def create(self, request, *args, **kwargs):
+        if not settings.INGEST_QUEUE:
+            return super().create(request, *args, **kwargs)
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        self._enqueue(serializer)
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=False, methods=["post"])
+    def bulk(self, request):
+        """
+        Creates a list of results in a single transaction, or queues them if ARA_INGEST_QUEUE is enabled.
+        Returns the amount of results that were created or queued.
+        """
+        serializer = self.get_serializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        if settings.INGEST_QUEUE:
+            results = self._enqueue(serializer)
+            return Response({"count": len(results)}, status=status.HTTP_202_ACCEPTED)
+        with transaction.atomic():
+            results = serializer.save()
+        return Response({"count": len(results)}, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=["get"])
+    def ingest(self, request):
+        """
+        Returns the status of the queue of results waiting to be committed when ARA_INGEST_QUEUE is enabled:
+        the amount of results in the queue (depth), committed and that failed to be committed.
+        """
+        if not settings.INGEST_QUEUE:
+            return Response(dict(enabled=False, depth=0, committed=0, failed=0))
+        return Response(dict(enabled=True, **ingest.get_queue().status()))
 
-class FileViewSet(viewsets.ModelViewSet):
-    queryset = models.File.objects.all()
+
+class FileViewSet(ItemCountMixin, ClientUuidLookupMixin, viewsets.ModelViewSet):
     filterset_class = filters.FileFilter
+    item_count_relations = ["playbook"]
+
+    def get_queryset(self):
+        queryset = models.File.objects.all()
+        if self.action == "list":
+            # Only the sha1 of the contents is returned
+            queryset = queryset.select_related("content").defer("content__contents")
+        elif self.action == "retrieve":
+            queryset = queryset.select_related("playbook", "content").prefetch_related("playbook__labels")
+        return queryset
 
     def get_serializer_class(self):
         if self.action == "list":
@@ -138,9 +296,26 @@ class FileViewSet(viewsets.ModelViewSet):
             return serializers.FileSerializer
 
 
-class RecordViewSet(viewsets.ModelViewSet):
-    queryset = models.Record.objects.all()
+class FileContentViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Allows clients to verify if file contents are already stored based on their sha1.
+    The contents themselves are provided by the file endpoint.
+    """
+
+    queryset = models.FileContent.objects.all().order_by("-id")
+    filterset_class = filters.FileContentFilter
+    serializer_class = serializers.ListFileContentSerializer
+
+
+class RecordViewSet(ItemCountMixin, viewsets.ModelViewSet):
     filterset_class = filters.RecordFilter
+    item_count_relations = ["playbook"]
+
+    def get_queryset(self):
+        queryset = models.Record.objects.all()
+        if self.action == "retrieve":
+            queryset = queryset.select_related("playbook").prefetch_related("playbook__labels")
+        return queryset
 
     def get_serializer_class(self):
         if self.action == "list":
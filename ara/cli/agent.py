@@ -0,0 +1,84 @@
+# Copyright (c) 2020 The ARA Records Ansible authors
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+import logging
+import os
+import signal
+import sys
+
+from cliff.command import Command
+
+from ara.cli.base import global_arguments
+from ara.clients.agent import AgentServer
+from ara.clients.utils import get_client
+
+
+class Agent(Command):
+    """ Relays requests from local API clients to an API server """
+
+    log = logging.getLogger(__name__)
+
+    def get_parser(self, prog_name):
+        parser = super(Agent, self).get_parser(prog_name)
+        parser = global_arguments(parser)
+        # fmt: off
+        parser.add_argument(
+            "--socket",
+            metavar="<path>",
+            default=os.environ.get("ARA_AGENT_SOCKET", "~/.ara/agent.sock"),
+            help="Unix domain socket to listen on, defaults to ARA_AGENT_SOCKET or '~/.ara/agent.sock'",
+        )
+        parser.add_argument(
+            "--batch-size",
+            metavar="<batch-size>",
+            type=int,
+            default=1000,
+            help="Maximum amount of results sent in a single request (default: 1000)",
+        )
+        parser.add_argument(
+            "--batch-timeout",
+            metavar="<seconds>",
+            type=float,
+            default=1.0,
+            help="Maximum amount of seconds a result can wait before being sent (default: 1.0)",
+        )
+        parser.add_argument(
+            "--connections",
+            metavar="<connections>",
+            type=int,
+            default=16,
+            help="Maximum amount of persistent connections to the API server (default: 16)",
+        )
+        # fmt: on
+        return parser
+
+    def take_action(self, args):
+        if args.client == "agent":
+            self.log.error("The agent can't relay requests to another agent, use a different --client")
+            sys.exit(1)
+
+        client = get_client(
+            client=args.client,
+            endpoint=args.server,
+            timeout=args.timeout,
+            username=args.username,
+            password=args.password,
+            verify=False if args.insecure else True,
+            pool_maxsize=args.connections,
+        )
+
+        try:
+            server = AgentServer(args.socket, client, batch_size=args.batch_size, batch_timeout=args.batch_timeout)
+        except OSError as e:
+            self.log.error("Failed to start agent: %s" % e)
+            sys.exit(1)
+
+        # Stop gracefully when terminated so that pending results are sent
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        self.log.info("Relaying requests from %s to %s" % (server.path, args.server))
+        try:
+            server.serve_forever()
+        except (KeyboardInterrupt, SystemExit):
+            pass
+        finally:
+            server.server_close()
@@ -19,7 +19,10 @@ def global_arguments(parser):
         "--client",
         metavar="<client>",
         default=os.environ.get("ARA_API_CLIENT", "offline"),
-        help=("API client to use, defaults to ARA_API_CLIENT or 'offline'"),
+        help=(
+            "API client to use ('offline', 'direct', 'http' or 'sqlite'), defaults to ARA_API_CLIENT or 'offline'. "
+            "The 'spool' and 'agent' clients only record playbooks and can't be queried"
+        ),
     )
     parser.add_argument(
         "--server",
@@ -73,6 +73,8 @@ class ExpireObjects(Command):
         query["updated_before"] = (datetime.now() - timedelta(hours=args.hours)).isoformat()
         query["order"] = args.order
         query["limit"] = args.limit
+        # The amount of objects found is logged regardless of how the server counts by default
+        query["count"] = "exact"
 
         endpoints = ["/api/v1/playbooks", "/api/v1/plays", "/api/v1/tasks"]
         for endpoint in endpoints:
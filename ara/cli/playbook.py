@@ -330,6 +330,8 @@ class PlaybookPrune(Command):
         query["started_before"] = (datetime.now() - timedelta(days=args.days)).isoformat()
         query["order"] = args.order
         query["limit"] = args.limit
+        # The amount of playbooks found is logged regardless of how the server counts by default
+        query["count"] = "exact"
 
         playbooks = client.get("/api/v1/playbooks", **query)
 
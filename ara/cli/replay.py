@@ -0,0 +1,68 @@
+# Copyright (c) 2020 The ARA Records Ansible authors
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+import logging
+import os
+import sys
+
+from cliff.command import Command
+
+from ara.cli.base import global_arguments
+from ara.clients.spool import JournalReplay, ReplayError, state_path
+from ara.clients.utils import get_client
+
+
+class Replay(Command):
+    """ Uploads journals written by the spool client to an API server """
+
+    log = logging.getLogger(__name__)
+
+    def get_parser(self, prog_name):
+        parser = super(Replay, self).get_parser(prog_name)
+        parser = global_arguments(parser)
+        # fmt: off
+        parser.add_argument(
+            "journal",
+            metavar="<journal>",
+            nargs="+",
+            help="Journal(s) to upload, in order",
+        )
+        parser.add_argument(
+            "--batch-size",
+            metavar="<batch-size>",
+            type=int,
+            default=1000,
+            help="Maximum amount of results sent in a single request (default: 1000)",
+        )
+        parser.add_argument(
+            "--delete",
+            action="store_true",
+            help="Deletes journals and their progress once they have been uploaded successfully",
+        )
+        # fmt: on
+        return parser
+
+    def take_action(self, args):
+        client = get_client(
+            client=args.client,
+            endpoint=args.server,
+            timeout=args.timeout,
+            username=args.username,
+            password=args.password,
+            verify=False if args.insecure else True,
+            run_sql_migrations=False,
+        )
+
+        for journal in args.journal:
+            replay = JournalReplay(client, batch_size=args.batch_size)
+            try:
+                replay.replay(journal)
+            except (OSError, ReplayError) as e:
+                self.log.error("Failed to replay %s: %s" % (journal, e))
+                sys.exit(1)
+
+            self.log.info("Replayed %s in %s requests" % (journal, replay.requests))
+            if args.delete:
+                os.remove(journal)
+                if os.path.exists(state_path(journal)):
+                    os.remove(state_path(journal))
@@ -11,7 +11,7 @@ from cliff.show import ShowOne
 
 import ara.cli.utils as cli_utils
 from ara.cli.base import global_arguments
-from ara.clients.utils import get_client
+from ara.clients.utils import get_client, walk
 
 
 class ResultList(Lister):
@@ -98,6 +98,12 @@ class ResultList(Lister):
             default=os.environ.get("ARA_CLI_LIMIT", 50),
             help=("Returns the first <limit> determined by the ordering. Defaults to ARA_CLI_LIMIT or 50.")
         )
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            default=False,
+            help=("Returns every result instead of the first <limit>, retrieved <limit> at a time")
+        )
         # fmt: on
         return parser
 
@@ -131,7 +137,11 @@ class ResultList(Lister):
         query["order"] = args.order
         query["limit"] = args.limit
 
-        results = client.get("/api/v1/results", **query)
+        if args.all:
+            # The cursor pagination doesn't slow down as it goes deeper in the results
+            results = dict(results=list(walk(client, "/api/v1/results", **query)))
+        else:
+            results = client.get("/api/v1/results", **query)
 
         if args.resolve:
             for result in results["results"]:
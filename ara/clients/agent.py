@@ -0,0 +1,309 @@
+# Copyright (c) 2020 The ARA Records Ansible authors
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# This is an API client that sends requests to a local agent ("ara agent")
+# through a Unix domain socket instead of sending them to an API server.
+# The agent relays requests to the API server with a pool of persistent
+# connections shared by every process and coalesces results into bulk requests.
+#
+# Requests and responses are exchanged as lines of JSON:
+#   {"method": "post", "url": "/api/v1/hosts", "data": {...}}
+#   {"status": 201, "data": {...}}
+
+import json
+import logging
+import os
+import socket
+import socketserver
+import threading
+import weakref
+
+import requests
+
+from ara.clients import encoding
+from ara.clients.http import AraHttpClient
+from ara.clients.utils import active_client
+
+# Results are acknowledged by the agent right away and sent later, in bulk
+COALESCED_ENDPOINTS = ["/api/v1/results", "/api/v1/results/bulk"]
+
+# Results that failed to be sent are retried after a delay that doubles up to this amount of seconds
+MAX_RETRY_DELAY = 60
+
+# Statuses for which sending results again could succeed, other errors won't go away by retrying
+RETRY_STATUSES = [408, 429, 500, 502, 503, 504]
+
+
+class AgentResponse(object):
+    """
+    Mimics the parts of requests' responses that are used by AraHttpClient
+    """
+
+    def __init__(self, status_code, data=None, body_size=0):
+        self.status_code = status_code
+        self.data = data
+        self.body_size = body_size
+
+    def json(self):
+        return self.data
+
+
+class AgentClient(object):
+    def __init__(self, path="~/.ara/agent.sock", timeout=30):
+        self.log = logging.getLogger(__name__)
+        self.path = os.path.abspath(os.path.expanduser(path))
+        self.timeout = int(timeout)
+        # Each thread has its own connection to the agent and, if shorter than self.timeout,
+        # its own timeout (see AraHttpClient.deadline)
+        self.local = threading.local()
+
+    def reset(self):
+        """
+        Starts over without the connections to the agent that were opened so far
+        """
+        self.local = threading.local()
+
+    def _connect(self):
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.connect(self.path)
+            except OSError as e:
+                sock.close()
+                raise requests.exceptions.ConnectionError("Unable to connect to agent at %s: %s" % (self.path, e))
+            connection = self.local.connection = (sock, sock.makefile("rb"))
+        return connection
+
+    def _close(self):
+        sock, reader = self.local.connection
+        self.local.connection = None
+        reader.close()
+        sock.close()
+
+    def _request(self, method, url, data=None, params=None):
+        message = json.dumps(dict(method=method, url=url, params=params)).encode("utf-8")
+        if data is not None:
+            # Data that is already encoded is sent as-is
+            data = data if isinstance(data, bytes) else data.encode("utf-8")
+            message = b'%s, "data": %s}' % (message[:-1], data)
+
+        sock, reader = self._connect()
+        timeout = self.timeout
+        if getattr(self.local, "timeout", None) is not None:
+            timeout = min(timeout, self.local.timeout)
+        sock.settimeout(timeout)
+        try:
+            sock.sendall(message + b"\n")
+            line = reader.readline()
+        except socket.timeout as e:
+            # The connection can't be re-used since the response would be read by the next request
+            self._close()
+            raise requests.exceptions.Timeout("Timed out waiting for agent at %s: %s" % (self.path, e))
+        except OSError as e:
+            self._close()
+            raise requests.exceptions.ConnectionError("Lost connection to agent at %s: %s" % (self.path, e))
+        if not line:
+            self._close()
+            raise requests.exceptions.ConnectionError("Agent at %s closed the connection" % self.path)
+
+        response = json.loads(line)
+        return AgentResponse(response["status"], response.get("data"), len(data or b""))
+
+    def get(self, url, params=None):
+        return self._request("get", url, params=params)
+
+    def patch(self, url, data=None, **payload):
+        return self._request("patch", url, encoding.body(data, **payload))
+
+    def post(self, url, data=None, **payload):
+        return self._request("post", url, encoding.body(data, **payload))
+
+    def put(self, url, data=None, **payload):
+        return self._request("put", url, encoding.body(data, **payload))
+
+    def delete(self, url):
+        return self._request("delete", url)
+
+
+class AraAgentClient(AraHttpClient):
+    def __init__(self, path="~/.ara/agent.sock", timeout=30):
+        self.log = logging.getLogger(__name__)
+        self.endpoint = None
+        self.timeout = int(timeout)
+        self.client = AgentClient(path=path, timeout=timeout)
+        self.observers = []
+        self.breaker = None
+        self.local = threading.local()
+        self.pid = os.getpid()
+        active_client._instance = weakref.ref(self)
+
+
+class AgentRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                status, data = self.server.relay(
+                    request["method"], request["url"], request.get("data"), request.get("params")
+                )
+            except Exception as e:
+                self.server.log.exception("Failed to relay request")
+                status, data = 502, dict(detail="Failed to relay request: %s" % str(e))
+            self.wfile.write(json.dumps(dict(status=status, data=data)).encode("utf-8") + b"\n")
+            self.wfile.flush()
+
+
+class AgentServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Relays requests received on a Unix domain socket to an API client.
+    Results are acknowledged right away and sent through the bulk endpoint
+    in batches of up to batch_size, at least every batch_timeout seconds.
+    Results that could not be sent are kept and retried with an exponential
+    backoff. Those still not sent when the agent stops are saved next to the
+    socket, in "<socket>.pending", and sent by the next agent.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, path, client, batch_size=1000, batch_timeout=1.0):
+        self.log = logging.getLogger(__name__)
+        self.path = os.path.abspath(os.path.expanduser(path))
+        self.client = client
+        self.batch_size = batch_size
+        self.batch_timeout = batch_timeout
+        self.results = []
+        self.condition = threading.Condition()
+        # Only one batch is sent at a time so that flush() returns once every result was sent
+        self.flush_lock = threading.Lock()
+        self.stopped = threading.Event()
+        # Seconds to wait before sending results again after a failure
+        self.retry_delay = 0
+        self.pending_path = "%s.pending" % self.path
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._remove_stale_socket()
+        # The socket is only accessible by the user running the agent
+        umask = os.umask(0o177)
+        try:
+            super().__init__(self.path, AgentRequestHandler)
+        finally:
+            os.umask(umask)
+
+        self._load_pending()
+        self.flusher = threading.Thread(target=self._flush_periodically, name="ara-agent-flusher", daemon=True)
+        self.flusher.start()
+
+    def _remove_stale_socket(self):
+        if not os.path.exists(self.path):
+            return
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.path)
+        except OSError:
+            # Nothing is listening, the socket was left behind by an agent that didn't stop cleanly
+            os.remove(self.path)
+            return
+        finally:
+            sock.close()
+        raise OSError("An agent is already listening on %s" % self.path)
+
+    def _load_pending(self):
+        if not os.path.exists(self.pending_path):
+            return
+        with open(self.pending_path, "r", encoding="utf-8") as pending:
+            self.results = json.load(pending)
+        os.remove(self.pending_path)
+        self.log.info("Loaded %s results left by a previous agent" % len(self.results))
+
+    def _save_pending(self):
+        # Results are only lost if they can't be written either
+        with open(self.pending_path, "w", encoding="utf-8") as pending:
+            json.dump(self.results, pending)
+        self.log.warning("Saved %s results that could not be sent to %s" % (len(self.results), self.pending_path))
+
+    def relay(self, method, url, data=None, params=None):
+        """Sends a request to the API client and returns the status and data of the response"""
+        if method == "post" and url in COALESCED_ENDPOINTS:
+            results = data if isinstance(data, list) else [data]
+            with self.condition:
+                self.results.extend(results)
+                if len(self.results) >= self.batch_size:
+                    self.condition.notify()
+            return 202, dict(count=len(results))
+
+        if method == "delete":
+            # Results waiting to be sent could belong to what is deleted
+            self.flush()
+
+        if method == "get":
+            response = self.client.request(method, url, params=params)
+        elif method == "delete":
+            response = self.client.request(method, url)
+        else:
+            response = self.client.request(method, url, data)
+
+        if response.status_code == 204:
+            return response.status_code, None
+        try:
+            return response.status_code, response.json()
+        except ValueError:
+            # i.e, an error page from a proxy in front of the API server
+            return response.status_code, dict(detail=response.text)
+
+    def _flush_periodically(self):
+        while not self.stopped.is_set():
+            if self.retry_delay:
+                # Full batches don't shorten the backoff after a failure
+                self.stopped.wait(self.retry_delay)
+            else:
+                with self.condition:
+                    self.condition.wait_for(lambda: len(self.results) >= self.batch_size, timeout=self.batch_timeout)
+            self.flush()
+
+    def flush(self):
+        """
+        Sends the results that have been received so far.
+        Returns False if some of them could not be sent and will be retried.
+        """
+        with self.flush_lock:
+            return self._flush()
+
+    def _flush(self):
+        with self.condition:
+            results, self.results = self.results, []
+        size = self.batch_size
+        while results:
+            batch, results = results[:size], results[size:]
+            try:
+                response = self.client.request("post", "/api/v1/results/bulk", batch)
+                # Results are accepted (202) rather than created when the API server queues them
+                error = None if response.status_code in [201, 202] else response.status_code
+            except requests.exceptions.RequestException as e:
+                response, error = None, str(e)
+
+            if error is None:
+                self.retry_delay = 0
+            elif response is not None and response.status_code not in RETRY_STATUSES:
+                self.log.error("Failed to send %s results, dropping them: %s" % (len(batch), error))
+            else:
+                # Keep the results in order, ahead of the ones received in the meantime
+                with self.condition:
+                    self.results[:0] = batch + results
+                self.retry_delay = min(max(self.retry_delay * 2, self.batch_timeout, 1), MAX_RETRY_DELAY)
+                self.log.error(
+                    "Failed to send %s results, retrying in %s seconds: %s"
+                    % (len(batch) + len(results), self.retry_delay, error)
+                )
+                return False
+        return True
+
+    def server_close(self):
+        self.stopped.set()
+        super().server_close()
+        # The flusher could otherwise take the results while they are saved
+        with self.flush_lock:
+            if not self._flush():
+                self._save_pending()
+        if os.path.exists(self.path):
+            os.remove(self.path)
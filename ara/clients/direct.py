@@ -0,0 +1,136 @@
+# Copyright (c) 2020 The ARA Records Ansible authors
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# This is a "direct" API client that calls the API views within the same
+# process instead of sending requests to an API server over HTTP.
+# Unlike the offline client, there is no server thread, socket or WSGI
+# round-trip involved.
+
+import base64
+import logging
+import os
+import threading
+import weakref
+
+from ara.clients import encoding
+from ara.clients.http import AraHttpClient
+from ara.clients.offline import DatabaseWriter, setup_django
+from ara.clients.utils import active_client
+
+
+def _plain(data):
+    # Serializers return subclasses of dict and list that can't be copied like them (i.e, by Ansible)
+    if isinstance(data, dict):
+        return {key: _plain(value) for key, value in data.items()}
+    if isinstance(data, list):
+        return [_plain(value) for value in data]
+    return data
+
+
+class DirectClient(object):
+    """
+    Equivalent of HttpClient that resolves URLs and runs the matching view directly.
+    """
+
+    def __init__(self, auth=None):
+        self.log = logging.getLogger(__name__)
+
+        from django.test import RequestFactory
+
+        # The hostname must be part of ALLOWED_HOSTS for the links built by pagination
+        self.factory = RequestFactory(SERVER_NAME="localhost")
+        self.headers = {"HTTP_ACCEPT": "application/json"}
+        if auth is not None:
+            credentials = "%s:%s" % (auth.username, auth.password)
+            self.headers["HTTP_AUTHORIZATION"] = "Basic %s" % base64.b64encode(credentials.encode()).decode()
+
+    def _request(self, method, url, data=None, params=None):
+        from django.db import transaction
+        from django.urls import Resolver404, resolve
+        from rest_framework import status
+        from rest_framework.response import Response
+
+        from ara.api import ingest
+
+        if method == "get":
+            request = self.factory.get(url, data=params, **self.headers)
+        else:
+            request = self.factory.generic(
+                method.upper(), url, data=data or "", content_type="application/json", **self.headers
+            )
+
+        try:
+            match = resolve(request.path_info)
+            # There is no middleware between the client and the views
+            ingest.flush_before(request.method, match.view_name)
+            if method == "get":
+                response = match.func(request, *match.args, **match.kwargs)
+            else:
+                # What was written is rolled back if the view fails, writes can be part of a larger transaction
+                with transaction.atomic():
+                    response = match.func(request, *match.args, **match.kwargs)
+        except Resolver404:
+            response = Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            # Exceptions would otherwise become an internal server error when going through a server
+            self.log.exception("Failed to %s on %s" % (method, url))
+            response = Response({"detail": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        # Provide the same interface as requests' responses without rendering the data to JSON
+        response.json = lambda: _plain(response.data)
+        response.body_size = len(data or b"")
+        return response
+
+    def get(self, url, params=None):
+        return self._request("get", url, params=params)
+
+    # The body is built from the keyword arguments unless data (i.e, a list for bulk endpoints) is provided.
+    # data can also be bytes of JSON that was already encoded.
+    def patch(self, url, data=None, **payload):
+        return self._request("patch", url, data=encoding.body(data, **payload))
+
+    def post(self, url, data=None, **payload):
+        return self._request("post", url, data=encoding.body(data, **payload))
+
+    def put(self, url, data=None, **payload):
+        return self._request("put", url, data=encoding.body(data, **payload))
+
+    def delete(self, url):
+        return self._request("delete", url)
+
+    def reset(self):
+        # Nothing is shared with other processes
+        pass
+
+
+class AraDirectClient(AraHttpClient):
+    def __init__(self, auth=None, run_sql_migrations=True):
+        self.log = logging.getLogger(__name__)
+
+        setup_django(run_sql_migrations=run_sql_migrations)
+        from django.db import transaction
+
+        self.endpoint = None
+        self.auth = auth
+        self.client = DirectClient(auth=auth)
+        self.observers = []
+        self.breaker = None
+        self.local = threading.local()
+        self.writer = DatabaseWriter(atomic=transaction.atomic)
+        self.pid = os.getpid()
+        active_client._instance = weakref.ref(self)
+
+    def _after_fork(self):
+        from django.db import connections
+
+        super()._after_fork()
+        # The connections of the parent process can't be used in this one
+        connections.close_all()
+
+    def request(self, method, url, data=None, **kwargs):
+        if self.pid != os.getpid():
+            self._after_fork()
+        # Reading doesn't wait for writing, see ara.clients.offline.SQLITE_PRAGMAS
+        if method == "get":
+            return super().request(method, url, data, **kwargs)
+        return self.writer.call(super().request, method, url, data, **kwargs)
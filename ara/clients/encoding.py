@@ -0,0 +1,203 @@
+# Copyright (c) 2020 The ARA Records Ansible authors
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# Helpers to prepare data for the API and encode it to the JSON bodies sent by clients.
+# Clients send bytes as-is so data encoded with dumps() is only serialized once.
+# Bodies can also be compressed, the API server decompresses them according to Content-Encoding.
+
+import gzip
+import io
+import json
+import zlib
+from collections.abc import Mapping
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Keys starting with this prefix are internal to Ansible and are not saved
+INTERNAL_PREFIX = "_ansible_"
+
+# Replaces the content of results that is not saved
+NOT_SAVED = "Content not saved by ARA as configured by 'ignored_result_content'"
+TRUNCATED = "[%s characters truncated by ARA as configured by 'result_stdout_max_size']"
+
+
+def _key(key):
+    # Keys are converted the same way json.dumps would so that they can always be sorted
+    if isinstance(key, str):
+        return key
+    if key is True:
+        return "true"
+    if key is False:
+        return "false"
+    if key is None:
+        return "null"
+    if isinstance(key, float):
+        return float.__repr__(key)
+    if isinstance(key, int):
+        return int.__repr__(key)
+    return str(key)
+
+
+def sanitize(obj):
+    """
+    Returns a copy of obj without the keys that are internal to Ansible.
+    Mappings become dictionaries with string keys, tuples and lists become lists.
+    Other objects are left untouched.
+    """
+    if isinstance(obj, Mapping):
+        sanitized = {}
+        for key, value in obj.items():
+            key = _key(key)
+            if not key.startswith(INTERNAL_PREFIX):
+                sanitized[key] = sanitize(value)
+        return sanitized
+    if isinstance(obj, (list, tuple)):
+        return [sanitize(value) for value in obj]
+    return obj
+
+
+def truncate(content, max_size):
+    """
+    Truncates the stdout and stderr of a result, including the results of loop items,
+    to max_size characters. Lines are truncated as a whole.
+    """
+    items = [content] + [item for item in content.get("results", []) if isinstance(item, dict)]
+    for item in items:
+        for key in ["stdout", "stderr"]:
+            if isinstance(item.get(key), str) and len(item[key]) > max_size:
+                size = len(item[key])
+                item[key] = item[key][:max_size] + "\n" + TRUNCATED % (size - max_size)
+
+            lines = item.get("%s_lines" % key)
+            if isinstance(lines, list):
+                size = 0
+                for index, line in enumerate(lines):
+                    size += len(str(line))
+                    if size > max_size:
+                        remaining = sum(len(str(line)) for line in lines[index:])
+                        item["%s_lines" % key] = lines[:index] + [TRUNCATED % remaining]
+                        break
+    return content
+
+
+def encode_result(payload, ignored_facts=None, cls=None, facts=False, content=True, max_size=0):
+    """
+    Sanitizes the content of a result payload, replaces the facts that should
+    not be saved and encodes the payload with dumps().
+    When facts is True, the facts found in the content are also encoded as {"facts": ...}.
+    When content is False, only the metadata of the result is saved and its content is replaced.
+    When max_size is higher than 0, stdout and stderr are truncated to this amount of characters.
+    Returns a tuple of (encoded payload, encoded facts or None).
+    This only relies on its arguments so that it can run in another process.
+    """
+    if content or (facts and "ansible_facts" in payload["content"]):
+        sanitized = sanitize(payload["content"])
+    else:
+        # The content is not needed at all, don't spend time sanitizing it
+        sanitized = {}
+
+    if "ansible_facts" in sanitized:
+        for fact in ignored_facts or []:
+            if fact in sanitized["ansible_facts"]:
+                sanitized["ansible_facts"][fact] = "Not saved by ARA as configured by 'ignored_facts'"
+
+    encoded_facts = None
+    if facts and "ansible_facts" in sanitized:
+        encoded_facts = dumps(dict(facts=sanitized["ansible_facts"]), cls=cls)
+
+    if not content:
+        sanitized = dict(msg=NOT_SAVED)
+    elif max_size:
+        sanitized = truncate(sanitized, max_size)
+    return dumps(dict(payload, content=sanitized), cls=cls), encoded_facts
+
+
+def dumps(obj, cls=None):
+    """
+    Encodes obj to a JSON body with sorted keys
+    """
+    return json.dumps(obj, cls=cls, sort_keys=True).encode("utf-8")
+
+
+def merge(encoded, **fields):
+    """
+    Adds fields to an object encoded with dumps() without decoding it
+    """
+    if not fields:
+        return encoded
+    extra = dumps(fields)[1:-1]
+    if encoded.strip() == b"{}":
+        return b"{" + extra + b"}"
+    return b"{" + extra + b"," + encoded.lstrip()[1:]
+
+
+def dumps_list(items):
+    """
+    Encodes a list of objects that were already encoded with dumps()
+    """
+    return b"[" + b",".join(items) + b"]"
+
+
+def body(data=None, **payload):
+    """
+    Returns the body of a request from data or, if it is not provided, the keyword arguments.
+    Bytes are expected to be encoded JSON already and are returned as-is.
+    """
+    if isinstance(data, bytes):
+        return data
+    return json.dumps(payload if data is None else data)
+
+
+def compressions():
+    """
+    Returns the compression algorithms (values of Content-Encoding) that are available
+    """
+    return ["gzip", "zstd"] if zstandard is not None else ["gzip"]
+
+
+def compress(data, algorithm="gzip"):
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    if algorithm == "gzip":
+        # Favor speed over ratio, JSON compresses well regardless
+        return gzip.compress(data, compresslevel=1)
+    if algorithm == "zstd" and zstandard is not None:
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    raise ValueError("Unsupported compression: %s (available: %s)" % (algorithm, ", ".join(compressions())))
+
+
+class DecompressedSizeExceeded(ValueError):
+    pass
+
+
+def decompress(data, algorithm="gzip", max_size=None):
+    """
+    Decompresses data incrementally, raising DecompressedSizeExceeded as soon as it
+    decompresses to more than max_size bytes rather than holding all of it in memory.
+    """
+    # Up to one byte more than the maximum is decompressed to tell whether it was exceeded
+    limit = max_size + 1 if max_size is not None else 0
+    if algorithm == "gzip":
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        decompressed = decompressor.decompress(data, limit)
+        if not decompressor.eof and (max_size is None or len(decompressed) <= max_size):
+            raise ValueError("Compressed data ended before the end of the stream")
+    elif algorithm == "zstd" and zstandard is not None:
+        chunks = []
+        size = 0
+        with zstandard.ZstdDecompressor().stream_reader(io.BytesIO(data)) as reader:
+            while max_size is None or size <= max_size:
+                chunk = reader.read(65536)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+                size += len(chunk)
+        decompressed = b"".join(chunks)
+    else:
+        raise ValueError("Unsupported compression: %s (available: %s)" % (algorithm, ", ".join(compressions())))
+    if max_size is not None and len(decompressed) > max_size:
+        raise DecompressedSizeExceeded("Data decompresses to more than %s bytes" % max_size)
+    return decompressed
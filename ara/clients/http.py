@@ -18,20 +18,104 @@
 # This is an "offline" API client that does not require standing up
 # an API server and does not execute actual HTTP calls.
 
-import json
+import contextlib
 import logging
+import os
+import threading
+import time
 import weakref
 
 import pbr.version
 import requests
 
+from ara.clients import encoding
 from ara.clients.utils import active_client
 
 CLIENT_VERSION = pbr.version.VersionInfo("ara").release_string()
 
 
+class ApiUnavailable(requests.exceptions.RequestException):
+    """
+    Raised instead of sending a request when the API server is not expected to answer in time
+    """
+
+
+class DeadlineExceeded(ApiUnavailable):
+    pass
+
+
+class CircuitOpen(ApiUnavailable):
+    pass
+
+
+class CircuitBreaker(object):
+    """
+    Opens after a number of consecutive requests that failed or took longer than slow seconds.
+    Requests are refused while the breaker is open. Once reset seconds have passed, a single
+    request is let through: the breaker closes if it succeeds and opens again otherwise.
+    """
+
+    def __init__(self, failures=5, slow=0, reset=30):
+        self.log = logging.getLogger(__name__)
+        self.lock = threading.Lock()
+        self.failures = failures
+        self.slow = slow
+        self.reset = reset
+        self.count = 0
+        self.opened = None
+        self.trial = False
+
+    @property
+    def state(self):
+        if self.opened is None:
+            return "closed"
+        if self.trial or time.monotonic() - self.opened >= self.reset:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        """Returns whether a request can be sent"""
+        with self.lock:
+            if self.opened is None:
+                return True
+            if self.trial or time.monotonic() - self.opened < self.reset:
+                return False
+            self.trial = True
+            return True
+
+    def record(self, success, elapsed):
+        """Records the outcome of a request that was allowed"""
+        failed = not success or (self.slow and elapsed > self.slow)
+        with self.lock:
+            self.trial = False
+            if not failed:
+                if self.opened is not None:
+                    self.log.warning("API server is available again, closing circuit breaker")
+                self.count = 0
+                self.opened = None
+                return
+
+            self.count += 1
+            if self.opened is not None or self.count >= self.failures:
+                if self.opened is None:
+                    self.log.warning(
+                        "%s consecutive requests failed or took longer than %ss, opening circuit breaker for %ss"
+                        % (self.count, self.slow, self.reset)
+                    )
+                self.opened = time.monotonic()
+
+
 class HttpClient(object):
-    def __init__(self, endpoint="http://127.0.0.1:8000", auth=None, timeout=30, verify=True):
+    def __init__(
+        self,
+        endpoint="http://127.0.0.1:8000",
+        auth=None,
+        timeout=30,
+        verify=True,
+        pool_maxsize=requests.adapters.DEFAULT_POOLSIZE,
+        compression=None,
+        compression_threshold=1024,
+    ):
         self.log = logging.getLogger(__name__)
 
         self.endpoint = endpoint.rstrip("/")
@@ -43,18 +127,49 @@ class HttpClient(object):
             "Accept": "application/json",
             "Content-Type": "application/json",
         }
+        # Timeout of the requests of the current thread, when shorter than self.timeout (see AraHttpClient.deadline)
+        self.local = threading.local()
+        self.pool_maxsize = pool_maxsize
+        self.reset()
+
+        # Bodies larger than the threshold (in bytes) are compressed when compression is enabled
+        if compression is not None and compression not in encoding.compressions():
+            self.log.warning("%s compression is not available, using gzip instead" % compression)
+            compression = "gzip"
+        self.compression = compression
+        self.compression_threshold = int(compression_threshold)
+
+    def reset(self):
+        """
+        Starts over with a new session, without the connections of the previous one
+        """
         self.http = requests.Session()
         self.http.headers.update(self.headers)
         if self.auth is not None:
             self.http.auth = self.auth
         self.http.verify = self.verify
+        # Size the connection pool for the amount of threads sharing the session
+        # to avoid "urllib3.connectionpool: Connection pool is full" warnings
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_maxsize)
+        self.http.mount("http://", adapter)
+        self.http.mount("https://", adapter)
 
     def _request(self, method, url, **payload):
         # Use requests.Session to do the query
         # The actual endpoint is:
         # <endpoint>              <url>
         # http://127.0.0.1:8000 / api/v1/playbooks
-        return self.http.request(method, self.endpoint + url, timeout=self.timeout, **payload)
+        data = payload.get("data")
+        if self.compression is not None and data is not None and len(data) >= self.compression_threshold:
+            payload["data"] = encoding.compress(data, self.compression)
+            payload["headers"] = {"Content-Encoding": self.compression}
+        timeout = self.timeout
+        if getattr(self.local, "timeout", None) is not None:
+            timeout = min(timeout, self.local.timeout)
+        response = self.http.request(method, self.endpoint + url, timeout=timeout, **payload)
+        # Size of the body that was sent, in bytes
+        response.body_size = len(payload.get("data") or b"")
+        return response
 
     def get(self, url, **payload):
         if payload:
@@ -62,43 +177,148 @@ class HttpClient(object):
         else:
             return self._request("get", url)
 
-    def patch(self, url, **payload):
-        return self._request("patch", url, data=json.dumps(payload))
+    # The body is built from the keyword arguments unless data (i.e, a list for bulk endpoints) is provided.
+    # data can also be bytes of JSON that was already encoded.
+    def patch(self, url, data=None, **payload):
+        return self._request("patch", url, data=encoding.body(data, **payload))
 
-    def post(self, url, **payload):
-        return self._request("post", url, data=json.dumps(payload))
+    def post(self, url, data=None, **payload):
+        return self._request("post", url, data=encoding.body(data, **payload))
 
-    def put(self, url, **payload):
-        return self._request("put", url, data=json.dumps(payload))
+    def put(self, url, data=None, **payload):
+        return self._request("put", url, data=encoding.body(data, **payload))
 
     def delete(self, url):
         return self._request("delete", url)
 
 
 class AraHttpClient(object):
-    def __init__(self, endpoint="http://127.0.0.1:8000", auth=None, timeout=30, verify=True):
+    def __init__(
+        self,
+        endpoint="http://127.0.0.1:8000",
+        auth=None,
+        timeout=30,
+        verify=True,
+        pool_maxsize=requests.adapters.DEFAULT_POOLSIZE,
+        compression=None,
+        compression_threshold=1024,
+        breaker_failures=0,
+        breaker_slow=0,
+        breaker_reset=30,
+    ):
         self.log = logging.getLogger(__name__)
         self.endpoint = endpoint
         self.auth = auth
         self.timeout = int(timeout)
         self.verify = verify
-        self.client = HttpClient(endpoint=self.endpoint, timeout=self.timeout, auth=self.auth, verify=self.verify)
+        self.client = HttpClient(
+            endpoint=self.endpoint,
+            timeout=self.timeout,
+            auth=self.auth,
+            verify=self.verify,
+            pool_maxsize=pool_maxsize,
+            compression=compression,
+            compression_threshold=compression_threshold,
+        )
+        # Callables notified after every request with (method, url, status_code, elapsed seconds, body size).
+        # status_code is None when the request raised an exception.
+        self.observers = []
+        # Requests fail fast with CircuitOpen after breaker_failures consecutive failed or slow requests
+        self.breaker = None
+        if breaker_failures:
+            self.breaker = CircuitBreaker(failures=breaker_failures, slow=breaker_slow, reset=breaker_reset)
+        # Deadline of the requests of the current thread, see deadline()
+        self.local = threading.local()
+        self.pid = os.getpid()
         active_client._instance = weakref.ref(self)
 
-    def _request(self, method, url, **kwargs):
+    def _after_fork(self):
+        # Forked processes (i.e, Ansible workers running lookups and actions) inherit the state of the client as
+        # it was when forking. Connections would be shared with the parent and observers, like the ones of the
+        # callback, would act on behalf of the parent.
+        self.pid = os.getpid()
+        self.observers = []
+        self.breaker = None
+        self.client.reset()
+
+    @contextlib.contextmanager
+    def deadline(self, seconds):
+        """
+        Requests made by the current thread within this context must be completed in the given
+        amount of seconds, in total. Once the deadline has passed, requests raise DeadlineExceeded.
+        A deadline of 0 or None does nothing.
+        """
+        previous = getattr(self.local, "deadline", None)
+        if seconds:
+            deadline = time.monotonic() + seconds
+            self.local.deadline = deadline if previous is None else min(previous, deadline)
+        try:
+            yield
+        finally:
+            self.local.deadline = previous
+
+    def _remaining(self, method, url):
+        # Returns the time left before the deadline of the current thread, if there is one
+        deadline = getattr(self.local, "deadline", None)
+        if deadline is None:
+            return None
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceeded("Deadline exceeded before {method} on {url}".format(method=method, url=url))
+        return remaining
+
+    def _notify(self, method, url, status_code, elapsed, size=0):
+        for observer in self.observers:
+            try:
+                observer(method, url, status_code, elapsed, size)
+            except Exception:
+                self.log.exception("Failed to notify observer %s" % observer)
+
+    def request(self, method, url, data=None, **kwargs):
+        """
+        Sends a request and returns the response of the underlying client as-is
+        """
+        if self.pid != os.getpid():
+            self._after_fork()
         func = getattr(self.client, method)
-        if method == "delete":
-            response = func(url)
-        else:
-            response = func(url, **kwargs)
+        remaining = self._remaining(method, url)
+        if self.breaker is not None and not self.breaker.allow():
+            raise CircuitOpen("Circuit breaker is open, not sending {method} on {url}".format(method=method, url=url))
+        # Clients that can time out have a thread-local timeout
+        if getattr(self.client, "local", None) is not None:
+            self.client.local.timeout = remaining
+
+        start = time.monotonic()
+        try:
+            if method == "delete":
+                response = func(url)
+            elif method == "get":
+                response = func(url, **kwargs)
+            else:
+                response = func(url, data, **kwargs)
+        except requests.exceptions.RequestException:
+            elapsed = time.monotonic() - start
+            if self.breaker is not None:
+                self.breaker.record(False, elapsed)
+            self._notify(method, url, None, elapsed)
+            raise
+        elapsed = time.monotonic() - start
+        if self.breaker is not None:
+            self.breaker.record(response.status_code < 500, elapsed)
+        self._notify(method, url, response.status_code, elapsed, getattr(response, "body_size", 0))
+        return response
+
+    def _request(self, method, url, data=None, **kwargs):
+        response = self.request(method, url, data, **kwargs)
+        content = kwargs if data is None else data
 
         if response.status_code >= 500:
-            self.log.error("Failed to {method} on {url}: {content}".format(method=method, url=url, content=kwargs))
+            self.log.error("Failed to {method} on {url}: {content}".format(method=method, url=url, content=content))
 
         self.log.debug("HTTP {status}: {method} on {url}".format(status=response.status_code, method=method, url=url))
 
-        if response.status_code not in [200, 201, 204]:
-            self.log.error("Failed to {method} on {url}: {content}".format(method=method, url=url, content=kwargs))
+        if response.status_code not in [200, 201, 202, 204]:
+            self.log.error("Failed to {method} on {url}: {content}".format(method=method, url=url, content=content))
 
         if response.status_code == 204:
             return response
@@ -108,14 +328,14 @@ class AraHttpClient(object):
     def get(self, endpoint, **kwargs):
         return self._request("get", endpoint, params=kwargs)
 
-    def patch(self, endpoint, **kwargs):
-        return self._request("patch", endpoint, **kwargs)
+    def patch(self, endpoint, data=None, **kwargs):
+        return self._request("patch", endpoint, data, **kwargs)
 
-    def post(self, endpoint, **kwargs):
-        return self._request("post", endpoint, **kwargs)
+    def post(self, endpoint, data=None, **kwargs):
+        return self._request("post", endpoint, data, **kwargs)
 
-    def put(self, endpoint, **kwargs):
-        return self._request("put", endpoint, **kwargs)
+    def put(self, endpoint, data=None, **kwargs):
+        return self._request("put", endpoint, data, **kwargs)
 
     def delete(self, endpoint, **kwargs):
         return self._request("delete", endpoint)
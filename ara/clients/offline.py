@@ -18,9 +18,13 @@
 # This is an "offline" API client that does not require standing up
 # an API server and does not execute actual HTTP calls.
 
+import contextlib
 import logging
 import os
+import queue
 import threading
+import weakref
+from concurrent import futures
 
 from ara.clients.http import AraHttpClient
 from ara.setup.exceptions import MissingDjangoException
@@ -32,24 +36,169 @@ except ImportError as e:
     raise MissingDjangoException from e
 
 
-class AraOfflineClient(AraHttpClient):
-    def __init__(self, auth=None, run_sql_migrations=True):
-        self.log = logging.getLogger(__name__)
+# With WAL, reading doesn't wait for writing and writing doesn't wait for reading.
+# WAL is consistent with synchronous=NORMAL, it is only synced to disk on checkpoints.
+SQLITE_PRAGMAS = ["PRAGMA journal_mode=WAL", "PRAGMA synchronous=NORMAL", "PRAGMA busy_timeout=30000"]
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """
+    Configures the sqlite connections of clients that run the API server within the same process.
+    """
+    if connection.vendor == "sqlite":
+        with connection.cursor() as cursor:
+            for pragma in SQLITE_PRAGMAS:
+                cursor.execute(pragma)
+
+
+def latest_migration_applied():
+    """
+    Returns whether the latest migration of the api has been recorded in the database,
+    without importing the migrations to build their graph.
+    """
+    from django.db import DatabaseError, connection
+
+    from ara.api import migrations
+
+    files = os.listdir(os.path.dirname(migrations.__file__))
+    latest = max(name[:-3] for name in files if name[:4].isdigit() and name.endswith(".py"))
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM django_migrations WHERE app = 'api' AND name = %s", [latest])
+            return cursor.fetchone() is not None
+    except DatabaseError:
+        # i.e, a new database without tables
+        return False
+
+
+def pending_migrations():
+    """
+    Returns the migrations that have not been applied to the database yet.
+    The migrations on disk are compared with the ones recorded in the database,
+    like Django does before starting a development server.
+    Loading the migrations is expensive: it is skipped when the latest migration of the api was applied.
+    """
+    if latest_migration_applied():
+        return []
+
+    from django.db import connection
+    from django.db.migrations.executor import MigrationExecutor
+
+    executor = MigrationExecutor(connection)
+    return executor.migration_plan(executor.loader.graph.leaf_nodes())
+
 
-        from django import setup as django_setup
+def setup_django(run_sql_migrations=True):
+    """
+    Configures Django for clients that run the API server within the same process.
+    """
+    from django import setup as django_setup
+    from django.db.backends.signals import connection_created
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ara.server.settings")
+
+    # Set up the things Django needs
+    django_setup()
+    connection_created.connect(configure_sqlite, dispatch_uid="ara.clients.offline.configure_sqlite")
+
+    # Automatically create the database and run migrations, the migrate command is
+    # much slower than looking for pending migrations so it only runs if there are any.
+    if run_sql_migrations and pending_migrations():
         from django.core.management import execute_from_command_line
 
-        os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ara.server.settings")
+        execute_from_command_line(["django", "migrate"])
+
+
+class DatabaseWriter(object):
+    """
+    Funnels the requests that write to the database through a single writer so that writes never
+    overlap and fail with "database is locked".
+    The first thread submitting a request becomes the writer and runs every request submitted so far,
+    including the ones of other threads, the next writer takes over with what was submitted meanwhile.
+    Requests run together are in a single transaction if atomic is provided (i.e,
+    django.db.transaction.atomic), each in their own savepoint so that a request failing does not roll
+    back the others.
+    """
+
+    def __init__(self, atomic=None, batch_size=100):
+        self.log = logging.getLogger(__name__)
+        self.atomic = atomic or contextlib.nullcontext
+        self.batch_size = batch_size
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+
+        # Processes are forked in between transactions and without the requests of the parent
+        writer = weakref.ref(self)
+        os.register_at_fork(
+            before=lambda: writer() and writer().lock.acquire(),
+            after_in_parent=lambda: writer() and writer().lock.release(),
+            after_in_child=lambda: writer() and writer()._after_fork(),
+        )
+
+    def _after_fork(self):
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+
+    def call(self, func, *args, **kwargs):
+        """Runs func and returns its result once it is committed"""
+        future = futures.Future()
+        self.queue.put((future, func, args, kwargs))
+        while not future.done():
+            with self.lock:
+                # Another writer could have run it in the meantime
+                if not future.done():
+                    self._write(self._next_jobs())
+        return future.result()
+
+    def _next_jobs(self):
+        jobs = []
+        while len(jobs) < self.batch_size:
+            try:
+                jobs.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return jobs
+
+    def _write(self, jobs):
+        results = []
+        try:
+            with self.atomic():
+                for future, func, args, kwargs in jobs:
+                    try:
+                        with self.atomic():
+                            results.append((future, func(*args, **kwargs), None))
+                    except Exception as e:
+                        results.append((future, None, e))
+        except Exception as e:
+            self.log.exception("Failed to commit %s requests" % len(jobs))
+            for future, func, args, kwargs in jobs:
+                future.set_exception(e)
+            return
+
+        for future, result, error in results:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
 
-        if run_sql_migrations:
-            # Automatically create the database and run migrations (is there a better way?)
-            execute_from_command_line(["django", "migrate"])
+class AraOfflineClient(AraHttpClient):
+    def __init__(self, auth=None, run_sql_migrations=True):
+        self.log = logging.getLogger(__name__)
 
-        # Set up the things Django needs
-        django_setup()
+        setup_django(run_sql_migrations=run_sql_migrations)
 
         self._start_server()
         super().__init__(endpoint="http://localhost:%d" % self.server_thread.port, auth=auth)
+        # Every request is committed by the server, writes can't be grouped in transactions
+        self.writer = DatabaseWriter()
+
+    def request(self, method, url, data=None, **kwargs):
+        if self.pid != os.getpid():
+            self._after_fork()
+        if method == "get":
+            return super().request(method, url, data, **kwargs)
+        return self.writer.call(super().request, method, url, data, **kwargs)
 
     def _start_server(self):
         self.server_thread = ServerThread("localhost")
@@ -0,0 +1,408 @@
+# Copyright (c) 2020 The ARA Records Ansible authors
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# This is a "spool" API client that does not send anything to an API server.
+# Every request that would modify data is appended to a local journal file
+# instead and the journal can be uploaded later with "ara replay".
+# Objects are given identifiers that are local to the journal and these are
+# translated to the identifiers returned by the API server during the replay.
+
+import contextlib
+import datetime
+import json
+import logging
+import os
+import threading
+import weakref
+from urllib.parse import parse_qsl
+
+from ara.clients.utils import active_client
+
+JOURNAL_FORMAT = "ara-spool"
+JOURNAL_VERSION = 1
+
+# Fields that reference other objects and the endpoint of the object they reference
+REFERENCES = {
+    "playbook": "/api/v1/playbooks",
+    "play": "/api/v1/plays",
+    "task": "/api/v1/tasks",
+    "file": "/api/v1/files",
+    "host": "/api/v1/hosts",
+}
+
+# Endpoints for which the state of objects is kept in memory in order to return them in responses
+# and to answer queries, i.e. the ara_record action looking up the play it runs in.
+STATEFUL_ENDPOINTS = ["/api/v1/playbooks", "/api/v1/plays", "/api/v1/tasks", "/api/v1/records"]
+
+# Query parameters that don't filter objects
+PAGINATION_PARAMETERS = ["limit", "offset", "order"]
+
+
+def parse_url(url):
+    """
+    Splits an API url into its endpoint and object id, if any:
+    /api/v1/playbooks/1 -> ("/api/v1/playbooks", 1)
+    /api/v1/hosts/bulk -> ("/api/v1/hosts/bulk", None)
+    """
+    endpoint, _, last = url.rstrip("/").rpartition("/")
+    if last.isdigit():
+        return endpoint, int(last)
+    return url.rstrip("/"), None
+
+
+class SpoolResponse(object):
+    """
+    Mimics the parts of requests' responses that are used by AraHttpClient
+    """
+
+    def __init__(self, status_code, data=None):
+        self.status_code = status_code
+        self.data = data
+
+    def json(self):
+        return self.data
+
+
+class AraSpoolClient(object):
+    def __init__(self, directory="~/.ara/spool"):
+        self.log = logging.getLogger(__name__)
+        self.directory = os.path.abspath(os.path.expanduser(directory))
+        os.makedirs(self.directory, exist_ok=True)
+
+        # One journal per client so that local identifiers are never shared between journals
+        timestamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        self.path = os.path.join(self.directory, "%s-%s.ndjson" % (timestamp, os.getpid()))
+        self.journal = open(self.path, "a", encoding="utf-8")
+        self.lock = threading.Lock()
+
+        self.counters = {}
+        self.objects = {}
+        # Hosts and files are retrieved if they already exist by the API server, do the same here
+        self.hosts = {}
+        self.files = {}
+        # Callables notified after every request with (method, url, status_code, elapsed seconds, body size).
+        self.observers = []
+
+        self._write(dict(format=JOURNAL_FORMAT, version=JOURNAL_VERSION, created=datetime.datetime.now().isoformat()))
+        self.log.debug("Writing to journal: %s" % self.path)
+        active_client._instance = weakref.ref(self)
+
+    @contextlib.contextmanager
+    def deadline(self, seconds):
+        # Writing to the journal does not wait for an API server
+        yield
+
+    def _write(self, record, data=None):
+        # The journal is flushed after every record so it survives if the process is interrupted
+        line = json.dumps(record)
+        if data is not None:
+            # Data that is already encoded is written as-is
+            data = data.decode("utf-8") if isinstance(data, bytes) else json.dumps(data)
+            line = '%s, "data": %s}' % (line[:-1], data)
+        self.journal.write(line + "\n")
+        self.journal.flush()
+        return len(line) + 1
+
+    def _next_id(self, endpoint):
+        self.counters[endpoint] = self.counters.get(endpoint, 0) + 1
+        return self.counters[endpoint]
+
+    def _create(self, endpoint, data):
+        # Returns the local id of an object, re-using it if the API would return an existing object
+        if endpoint == "/api/v1/hosts":
+            key = (data.get("playbook"), data.get("name"))
+            if key not in self.hosts:
+                self.hosts[key] = self._next_id(endpoint)
+            return self.hosts[key]
+        if endpoint == "/api/v1/files":
+            key = (data.get("playbook"), data.get("path"))
+            if key not in self.files:
+                self.files[key] = self._next_id(endpoint)
+            return self.files[key]
+        return self._next_id(endpoint)
+
+    def _response(self, endpoint, id, data):
+        obj = self.objects.get((endpoint, id), dict(id=id))
+        obj.update(data)
+        if endpoint in STATEFUL_ENDPOINTS:
+            now = datetime.datetime.now().isoformat()
+            obj.setdefault("created", now)
+            obj["updated"] = now
+        if endpoint == "/api/v1/playbooks":
+            obj.setdefault("name", None)
+            obj["labels"] = [label if isinstance(label, dict) else dict(name=label) for label in obj.get("labels", [])]
+        if endpoint in STATEFUL_ENDPOINTS:
+            self.objects[(endpoint, id)] = obj
+        return obj
+
+    def _request(self, method, url, data=None):
+        endpoint, id = parse_url(url)
+        encoded = data if isinstance(data, bytes) else None
+        with self.lock:
+            if method == "post" and endpoint.endswith("/bulk"):
+                collection = endpoint[: -len("/bulk")]
+                if encoded is not None:
+                    data = json.loads(encoded)
+                ids = [self._create(collection, item) for item in data]
+                size = self._write(dict(method=method, url=endpoint, ids=ids), encoded or data)
+                response = SpoolResponse(201, [dict(item, id=id) for id, item in zip(ids, data)])
+            elif method == "post" and encoded is not None:
+                # Only results are expected to be sent encoded, these don't need to be looked at
+                id = self._next_id(endpoint)
+                size = self._write(dict(method=method, url=endpoint, id=id), encoded)
+                response = SpoolResponse(201, dict(id=id))
+            elif method == "post":
+                id = self._create(endpoint, data)
+                size = self._write(dict(method=method, url=endpoint, id=id), data)
+                response = SpoolResponse(201, self._response(endpoint, id, data))
+            elif method in ["patch", "put"] and id is not None:
+                if encoded is not None:
+                    data = json.loads(encoded)
+                size = self._write(dict(method=method, url=endpoint, id=id), encoded or data)
+                response = SpoolResponse(200, self._response(endpoint, id, data))
+            elif method == "delete":
+                size = self._write(dict(method=method, url=endpoint, id=id))
+                response = SpoolResponse(204)
+            else:
+                size = self._write(dict(method=method, url=endpoint), data)
+                response = SpoolResponse(200, data)
+
+        for observer in self.observers:
+            observer(method, url, response.status_code, 0, size)
+        return response
+
+    def get(self, endpoint, **kwargs):
+        # Until the journal is replayed, only the objects of STATEFUL_ENDPOINTS created by this client can be queried
+        url, _, query = endpoint.partition("?")
+        params = dict(parse_qsl(query))
+        params.update(kwargs)
+        endpoint, id = parse_url(url)
+        if endpoint not in STATEFUL_ENDPOINTS:
+            self.log.debug("Unable to query %s with the spool client, returning no results" % endpoint)
+
+        with self.lock:
+            if id is not None:
+                return self.objects.get((endpoint, id), dict(detail="Not found."))
+            filters = {field: value for field, value in params.items() if field not in PAGINATION_PARAMETERS}
+            results = [
+                obj
+                for (collection, _), obj in self.objects.items()
+                if collection == endpoint and all(str(obj.get(field)) == str(value) for field, value in filters.items())
+            ]
+        return dict(count=len(results), next=None, previous=None, results=results)
+
+    def patch(self, endpoint, data=None, **kwargs):
+        return self._request("patch", endpoint, kwargs if data is None else data).json()
+
+    def post(self, endpoint, data=None, **kwargs):
+        return self._request("post", endpoint, kwargs if data is None else data).json()
+
+    def put(self, endpoint, data=None, **kwargs):
+        return self._request("put", endpoint, kwargs if data is None else data).json()
+
+    def delete(self, endpoint, **kwargs):
+        return self._request("delete", endpoint)
+
+    def close(self):
+        with self.lock:
+            self.journal.close()
+
+
+def state_path(path):
+    """
+    Returns the path of the file recording the progress of the replay of a journal
+    """
+    return "%s.replay" % path
+
+
+class ReplayError(Exception):
+    pass
+
+
+class ReplayState(object):
+    """
+    Keeps track of the progress of a replay in a file next to its journal,
+    "<journal>.replay", so that replaying a journal again after a failure
+    resumes where the previous replay stopped instead of creating everything
+    again.
+    Events are appended as they happen rather than rewriting the file:
+    - {"map": [endpoint, local id, id]}: an object was created by the API
+    - {"done": line}: the request of a line of the journal was sent
+    - {"sent": [[line, amount], ...]}: results of these lines were sent
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.ids = {}
+        self.done = set()
+        self.sent = {}
+        self.file = None
+        if not os.path.exists(path):
+            return
+
+        with open(path, "r", encoding="utf-8") as state:
+            for line in state:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    # The last event can be truncated if the replay was interrupted
+                    continue
+                if "map" in event:
+                    endpoint, id, remote_id = event["map"]
+                    self.ids[(endpoint, id)] = remote_id
+                elif "done" in event:
+                    self.done.add(event["done"])
+                elif "sent" in event:
+                    for lineno, amount in event["sent"]:
+                        self.sent[lineno] = self.sent.get(lineno, 0) + amount
+
+    def _write(self, event):
+        if self.file is None:
+            self.file = open(self.path, "a", encoding="utf-8")
+        self.file.write(json.dumps(event) + "\n")
+        self.file.flush()
+
+    def map(self, endpoint, id, remote_id):
+        self.ids[(endpoint, id)] = remote_id
+        self._write(dict(map=[endpoint, id, remote_id]))
+
+    def mark_done(self, lineno):
+        self.done.add(lineno)
+        self._write(dict(done=lineno))
+
+    def mark_sent(self, lines):
+        amounts = {}
+        for lineno in lines:
+            amounts[lineno] = amounts.get(lineno, 0) + 1
+        for lineno, amount in amounts.items():
+            self.sent[lineno] = self.sent.get(lineno, 0) + amount
+        self._write(dict(sent=sorted(amounts.items())))
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class JournalReplay(object):
+    """
+    Sends the requests recorded in a journal to an API client, in order,
+    translating the local identifiers of the journal into the identifiers
+    returned by the API.
+    Results are sent in batches of up to batch_size through the bulk endpoint.
+    The progress is recorded by ReplayState so that a journal can be replayed
+    again after a failure without sending what was already sent.
+    """
+
+    def __init__(self, client, batch_size=1000):
+        self.log = logging.getLogger(__name__)
+        self.client = client
+        self.batch_size = batch_size
+        self.state = None
+        self.ids = {}
+        # Results waiting to be sent along with the line of the journal they come from
+        self.results = []
+        self.requests = 0
+
+    def _id(self, endpoint, id):
+        try:
+            return self.ids[(endpoint, id)]
+        except KeyError:
+            raise ReplayError("Unknown object in journal: %s/%s" % (endpoint, id))
+
+    def _translate(self, data, endpoint=None):
+        data = dict(data)
+        for field, reference in REFERENCES.items():
+            if data.get(field) is not None:
+                data[field] = self._id(reference, data[field])
+        # Bulk updates carry the id of the objects they update
+        if endpoint is not None and "id" in data:
+            data["id"] = self._id(endpoint, data["id"])
+        return data
+
+    def _map(self, endpoint, id, response):
+        if not isinstance(response, dict) or "id" not in response:
+            raise ReplayError("Failed to create object on %s: %s" % (endpoint, response))
+        self.state.map(endpoint, id, response["id"])
+
+    def flush(self):
+        size = self.batch_size
+        while self.results:
+            batch, self.results = self.results[:size], self.results[size:]
+            response = self.client.post("/api/v1/results/bulk", [result for _, result in batch])
+            self.requests += 1
+            if not isinstance(response, dict) or response.get("count") != len(batch):
+                raise ReplayError("Failed to create results: %s" % response)
+            self.state.mark_sent(lineno for lineno, _ in batch)
+
+    def replay(self, path):
+        self.state = ReplayState(state_path(path))
+        self.ids = self.state.ids
+        try:
+            self._replay_journal(path)
+            self.flush()
+        finally:
+            self.state.close()
+
+    def _replay_journal(self, path):
+        with open(path, "r", encoding="utf-8") as journal:
+            for lineno, line in enumerate(journal, start=1):
+                if not line.strip() or lineno in self.state.done:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # The last record can be truncated if the process writing it was interrupted
+                    self.log.warning("Ignoring invalid record on line %s of %s" % (lineno, path))
+                    continue
+
+                if lineno == 1:
+                    if record.get("format") != JOURNAL_FORMAT or record.get("version") != JOURNAL_VERSION:
+                        raise ReplayError("%s is not a supported journal" % path)
+                    continue
+
+                try:
+                    self._replay(record, lineno)
+                except ReplayError as e:
+                    raise ReplayError("%s (line %s of %s)" % (e, lineno, path))
+
+    def _replay(self, record, lineno):
+        method, url = record["method"], record["url"]
+        collection = url[: -len("/bulk")] if url.endswith("/bulk") else url
+
+        if method == "post" and collection == "/api/v1/results":
+            items = record["data"] if url.endswith("/bulk") else [record["data"]]
+            # Skip the results of this line that were sent by a previous replay
+            sent = self.state.sent.get(lineno, 0)
+            items = items[sent:]
+            self.results.extend((lineno, self._translate(item)) for item in items)
+            if len(self.results) >= self.batch_size:
+                self.flush()
+            return
+
+        if method == "post" and url.endswith("/bulk"):
+            # Objects created by a previous replay which was interrupted before marking the line as done
+            if not all((collection, id) in self.ids for id in record["ids"]):
+                self.requests += 1
+                response = self.client.post(url, [self._translate(item) for item in record["data"]])
+                if not isinstance(response, list) or len(response) != len(record["ids"]):
+                    raise ReplayError("Failed to create objects on %s: %s" % (url, response))
+                for id, obj in zip(record["ids"], response):
+                    self._map(collection, id, obj)
+        elif method == "post":
+            if (url, record["id"]) not in self.ids:
+                self.requests += 1
+                self._map(url, record["id"], self.client.post(url, self._translate(record["data"])))
+        elif url.endswith("/bulk"):
+            self.requests += 1
+            data = [self._translate(item, endpoint=collection) for item in record["data"]]
+            getattr(self.client, method)(url, data)
+        elif method == "delete":
+            # Results that were not sent yet could be deleted along with what they belong to
+            self.flush()
+            self.requests += 1
+            self.client.delete("%s/%s" % (url, self._id(url, record["id"])))
+        else:
+            self.requests += 1
+            getattr(self.client, method)("%s/%s" % (url, self._id(url, record["id"])), self._translate(record["data"]))
+        self.state.mark_done(lineno)
@@ -0,0 +1,645 @@
+# Copyright (c) 2020 The ARA Records Ansible authors
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# This is a "sqlite" API client that writes directly to an ARA sqlite database
+# with the sqlite3 module of the standard library, without Django.
+# It emulates the endpoints used by the callback and action plugins and stores
+# objects exactly like the API server would so the database can be served later,
+# for example with the distributed sqlite backend.
+# The database and its schema are created if the database doesn't exist yet.
+
+import contextlib
+import datetime
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import uuid
+import weakref
+import zlib
+from urllib.parse import parse_qsl, urlencode
+
+from ara.clients.spool import parse_url
+from ara.clients.sqlite_schema import MIGRATIONS, SCHEMA
+from ara.clients.utils import active_client
+
+# Tables behind the endpoints and the defaults of their columns, like in ara/api/models.py
+TABLES = {
+    "/api/v1/labels": dict(table="labels"),
+    "/api/v1/playbooks": dict(table="playbooks", defaults=dict(name=None, status="unknown", arguments={})),
+    "/api/v1/plays": dict(table="plays", defaults=dict(name=None, status="unknown")),
+    "/api/v1/tasks": dict(table="tasks", defaults=dict(name=None, status="unknown", tags=[])),
+    "/api/v1/hosts": dict(table="hosts", defaults=dict(facts={}, changed=0, failed=0, ok=0, skipped=0, unreachable=0)),
+    "/api/v1/results": dict(
+        table="results", defaults=dict(status="unknown", changed=False, ignore_errors=False, content={})
+    ),
+    "/api/v1/files": dict(table="files"),
+    "/api/v1/file_contents": dict(table="file_contents"),
+    "/api/v1/records": dict(table="records", defaults=dict(value="")),
+}
+
+# Columns that reference other tables
+REFERENCES = {
+    "playbook_id": "playbooks",
+    "play_id": "plays",
+    "task_id": "tasks",
+    "file_id": "files",
+    "host_id": "hosts",
+    "content_id": "file_contents",
+}
+
+# Filters of the API supported by each table and the column and lookup they use, like in ara/api/filters.py
+BASE_FILTERS = dict(
+    created_before=("created", "lte"),
+    created_after=("created", "gte"),
+    updated_before=("updated", "lte"),
+    updated_after=("updated", "gte"),
+)
+DATE_FILTERS = dict(
+    BASE_FILTERS,
+    started_before=("started", "lte"),
+    started_after=("started", "gte"),
+    ended_before=("ended", "lte"),
+    ended_after=("ended", "gte"),
+)
+HOST_STATS = ["changed", "failed", "ok", "skipped", "unreachable"]
+FILTERS = {
+    "labels": BASE_FILTERS,
+    "playbooks": dict(
+        DATE_FILTERS,
+        name=("name", "icontains"),
+        path=("path", "icontains"),
+        status=("status", "in"),
+        label=("id", "label"),
+    ),
+    "plays": dict(
+        DATE_FILTERS,
+        playbook=("playbook_id", "exact"),
+        uuid=("uuid", "exact"),
+        status=("status", "in"),
+        name=("name", "icontains"),
+    ),
+    "tasks": dict(
+        DATE_FILTERS,
+        playbook=("playbook_id", "exact"),
+        status=("status", "in"),
+        name=("name", "icontains"),
+        action=("action", "iexact"),
+        path=("file_id", "path"),
+        handler=("handler", "bool"),
+    ),
+    "hosts": dict(
+        BASE_FILTERS,
+        playbook=("playbook_id", "exact"),
+        name=("name", "icontains"),
+        **{"%s__%s" % (column, lookup): (column, lookup) for column in HOST_STATS for lookup in ["gt", "lt"]}
+    ),
+    "results": dict(
+        DATE_FILTERS,
+        playbook=("playbook_id", "exact"),
+        task=("task_id", "exact"),
+        play=("play_id", "exact"),
+        host=("host_id", "exact"),
+        changed=("changed", "bool"),
+        status=("status", "in"),
+        ignore_errors=("ignore_errors", "bool"),
+    ),
+    "files": dict(BASE_FILTERS, playbook=("playbook_id", "exact"), path=("path", "icontains")),
+    "file_contents": dict(BASE_FILTERS, sha1=("sha1", "exact")),
+    "records": dict(BASE_FILTERS, playbook=("playbook_id", "exact"), key=("key", "exact")),
+}
+
+# Columns that objects can be ordered by with the "order" parameter, besides id, created and updated
+ORDERING = {
+    "playbooks": ["started", "ended", "duration"],
+    "plays": ["started", "ended", "duration"],
+    "tasks": ["started", "ended", "duration"],
+    "results": ["started", "ended", "duration"],
+    "hosts": ["name"] + HOST_STATS,
+    "files": ["path"],
+    "records": ["key"],
+}
+
+# Tables listed from the most recent object by default, like the views of the API, the others are listed in order
+RECENT_FIRST = ["playbooks", "plays", "tasks", "results", "file_contents"]
+
+# Parameters of the pagination, objects are only paginated when a limit is provided
+PAGINATION = ["limit", "offset", "pagination", "cursor", "count"]
+
+# Binary columns storing compressed JSON (see ara.api.fields.CompressedObjectField)
+COMPRESSED_OBJECTS = ["arguments", "tags", "facts", "content", "value"]
+
+
+class SqliteError(Exception):
+    pass
+
+
+class SqliteResponse(object):
+    """
+    Mimics the parts of requests' responses that are used by AraHttpClient
+    """
+
+    def __init__(self, status_code, data=None):
+        self.status_code = status_code
+        self.data = data
+
+    def json(self):
+        return self.data
+
+
+def compress(value):
+    return zlib.compress(json.dumps(value).encode("utf8"))
+
+
+def decompress(value):
+    return json.loads(zlib.decompress(value).decode("utf8"))
+
+
+def to_database(value):
+    """
+    Converts an ISO 8601 date to the way Django stores dates in sqlite: in UTC, without a timezone.
+    Dates without a timezone are in local time, like with the default TIME_ZONE of the server.
+    """
+    if value is None:
+        return None
+    if not isinstance(value, datetime.datetime):
+        value = datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return str(value.astimezone(datetime.timezone.utc).replace(tzinfo=None))
+
+
+def from_database(value):
+    if value is None:
+        return None
+    return datetime.datetime.fromisoformat(value).isoformat() + "Z"
+
+
+def duration_string(microseconds):
+    # Formats durations like django.utils.duration.duration_string, as returned by the API
+    duration = datetime.timedelta(microseconds=microseconds)
+    minutes, seconds = divmod(duration.seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    string = "{:02d}:{:02d}:{:02d}".format(hours, minutes, seconds)
+    if duration.days:
+        string = "{} ".format(duration.days) + string
+    if duration.microseconds:
+        string += ".{:06d}".format(duration.microseconds)
+    return string
+
+
+class AraSqliteClient(object):
+    def __init__(self, database=None, timeout=30):
+        self.log = logging.getLogger(__name__)
+        if database is None:
+            base_dir = os.environ.get("ARA_BASE_DIR", os.path.expanduser("~/.ara/server"))
+            database = os.environ.get("ARA_DATABASE_NAME", os.path.join(base_dir, "ansible.sqlite"))
+        self.database = os.path.abspath(os.path.expanduser(database))
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        # Callables notified after every request with (method, url, status_code, elapsed seconds, body size).
+        self.observers = []
+
+        self._connect()
+        # Ansible forks its workers while the callback could be writing, a connection can't be used across
+        # a fork and a fork must not happen in the middle of a transaction: workers (i.e, ara_record) open their own.
+        client = weakref.ref(self)
+        os.register_at_fork(
+            before=lambda: client() and client().lock.acquire(),
+            after_in_parent=lambda: client() and client().lock.release(),
+            after_in_child=lambda: client() and client()._after_fork(),
+        )
+        self._create_schema()
+        # The columns of every table and their declared types, i.e. {"playbooks": {"name": "varchar(255)"}}
+        self.columns = {}
+        for options in TABLES.values():
+            rows = self.connection.execute('PRAGMA table_info("%s")' % options["table"])
+            self.columns[options["table"]] = {row[1]: row[2].lower() for row in rows}
+
+        self.log.debug("Writing to database: %s" % self.database)
+        active_client._instance = weakref.ref(self)
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(self.database), exist_ok=True)
+        # Transactions are handled explicitly, see _transaction
+        self.connection = sqlite3.connect(
+            self.database, timeout=self.timeout, isolation_level=None, check_same_thread=False
+        )
+
+    def _after_fork(self):
+        self.observers = []
+        self.lock = threading.Lock()
+        self._connect()
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield self.connection
+        except BaseException:
+            self.connection.execute("ROLLBACK")
+            raise
+        self.connection.execute("COMMIT")
+
+    def _create_schema(self):
+        with self._transaction() as connection:
+            tables = [row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+            if not tables:
+                self.log.debug("Creating the schema of a new database: %s" % self.database)
+                for statement in SCHEMA:
+                    connection.execute(statement)
+                applied = to_database(datetime.datetime.now(datetime.timezone.utc))
+                connection.executemany(
+                    "INSERT INTO django_migrations (app, name, applied) VALUES (?, ?, ?)",
+                    [(app, name, applied) for app, name in MIGRATIONS],
+                )
+                return
+
+        # Databases created by Django can be written to as long as they don't have migrations of the api unknown to
+        # the sqlite client. Migrations of the other apps depend on the versions of Django and its extensions.
+        applied = []
+        if "django_migrations" in tables:
+            applied = connection.execute("SELECT name FROM django_migrations WHERE app = 'api' ORDER BY name")
+            applied = [row[0] for row in applied]
+        known = [name for app, name in MIGRATIONS if app == "api"]
+        if not applied or applied != known[: len(applied)]:
+            raise SqliteError(
+                "%s doesn't have the schema expected by the sqlite client, migrate it with 'ara-manage migrate'"
+                % self.database
+            )
+
+    @contextlib.contextmanager
+    def deadline(self, seconds):
+        # Writing to the database does not wait for an API server
+        yield
+
+    def _reference(self, table, value):
+        # Objects are referenced by their id or by their client_uuid (see ara.api.fields.ClientUuidRelatedField)
+        if value is None or isinstance(value, int) or str(value).isdigit():
+            return value
+        row = self.connection.execute(
+            'SELECT id FROM "%s" WHERE client_uuid = ?' % table, (uuid.UUID(value).hex,)
+        ).fetchone()
+        if row is None:
+            raise SqliteError("%s with client_uuid %s does not exist" % (table, value))
+        return row[0]
+
+    def _file_content(self, content=None, sha1=None):
+        # File contents are stored once, by sha1 (see ara.api.fields.FileContentField)
+        if content is not None:
+            sha1 = hashlib.sha1(content.encode("utf8")).hexdigest()
+        row = self.connection.execute("SELECT id FROM file_contents WHERE sha1 = ?", (sha1,)).fetchone()
+        if row is not None:
+            return row[0]
+        if content is None:
+            raise SqliteError("No file contents with sha1 %s, the contents must be provided." % sha1)
+        now = to_database(datetime.datetime.now(datetime.timezone.utc))
+        return self._insert(
+            "file_contents", [dict(created=now, updated=now, sha1=sha1, contents=zlib.compress(content.encode("utf8")))]
+        )
+
+    def _row(self, table, data, now, partial=False):
+        """
+        Returns the values of the columns of an object, as stored by Django.
+        Only the columns that are provided are returned when partial is True.
+        """
+        data = dict(data)
+        if table == "files" and ("content" in data or "sha1" in data):
+            data["content"] = self._file_content(data.pop("content", None), data.pop("sha1", None))
+        if not partial:
+            for column, default in TABLES["/api/v1/%s" % table].get("defaults", {}).items():
+                data.setdefault(column, default)
+
+        row = {}
+        for column, type_ in self.columns[table].items():
+            field = column[: -len("_id")] if column in REFERENCES else column
+            if column in ["id", "duration"] or field not in data:
+                continue
+            value = data[field]
+            if column in REFERENCES:
+                value = self._reference(REFERENCES[column], value)
+            elif column in COMPRESSED_OBJECTS and table != "files":
+                value = compress(value)
+            elif type_ == "datetime":
+                value = to_database(value)
+            elif type_ == "char(32)" and value is not None:
+                value = uuid.UUID(str(value)).hex
+            row[column] = value
+
+        if not partial:
+            row.setdefault("created", now)
+            if "started" in self.columns[table]:
+                row.setdefault("started", now)
+        row["updated"] = now
+        return row
+
+    @staticmethod
+    def _duration(row, started=None):
+        # Durations are computed when saving objects (see ara.api.models.Duration)
+        if row.get("ended") is not None:
+            started = datetime.datetime.fromisoformat(row.get("started") or started)
+            ended = datetime.datetime.fromisoformat(row["ended"])
+            row["duration"] = (ended - started) // datetime.timedelta(microseconds=1)
+
+    def _insert(self, table, rows):
+        columns = list(rows[0])
+        statement = 'INSERT INTO "%s" (%s) VALUES (%s)' % (
+            table,
+            ", ".join('"%s"' % column for column in columns),
+            ", ".join("?" for column in columns),
+        )
+        if len(rows) > 1:
+            self.connection.executemany(statement, [tuple(row[column] for column in columns) for row in rows])
+            return None
+        return self.connection.execute(statement, tuple(rows[0][column] for column in columns)).lastrowid
+
+    def _update(self, table, id, row):
+        statement = 'UPDATE "%s" SET %s WHERE id = ?' % (table, ", ".join('"%s" = ?' % column for column in row))
+        cursor = self.connection.execute(statement, tuple(row.values()) + (id,))
+        if not cursor.rowcount:
+            raise SqliteError("%s %s does not exist" % (table, id))
+
+    def _existing(self, table, data):
+        # Returns the id of an object that the API server would return instead of creating a new one
+        if data.get("client_uuid") is not None:
+            row = self.connection.execute(
+                'SELECT id FROM "%s" WHERE client_uuid = ?' % table, (uuid.UUID(str(data["client_uuid"])).hex,)
+            ).fetchone()
+            if row is not None:
+                return row[0]
+        keys = dict(hosts="name", files="path").get(table)
+        if keys is not None:
+            row = self.connection.execute(
+                'SELECT id FROM "%s" WHERE %s = ? AND playbook_id = ?' % (table, keys),
+                (data[keys], self._reference("playbooks", data["playbook"])),
+            ).fetchone()
+            if row is not None:
+                return row[0]
+        return None
+
+    def _set_labels(self, playbook, labels, now):
+        # Labels are created by name if they don't exist (see ara.api.fields.CreatableSlugRelatedField)
+        ids = []
+        for label in labels:
+            row = self.connection.execute("SELECT id FROM labels WHERE name = ?", (label,)).fetchone()
+            ids.append(row[0] if row else self._insert("labels", [dict(created=now, updated=now, name=label)]))
+
+        # Like Django's ManyRelatedManager.set, only the labels that changed are removed or added
+        current = self.connection.execute("SELECT label_id FROM playbooks_labels WHERE playbook_id = ?", (playbook,))
+        current = set(row[0] for row in current)
+        self.connection.executemany(
+            "DELETE FROM playbooks_labels WHERE playbook_id = ? AND label_id = ?",
+            [(playbook, id) for id in current.difference(ids)],
+        )
+        self.connection.executemany(
+            "INSERT INTO playbooks_labels (playbook_id, label_id) VALUES (?, ?)",
+            [(playbook, id) for id in sorted(set(ids).difference(current))],
+        )
+
+    def _save(self, table, data, id=None, now=None):
+        """Creates or updates an object and returns its id"""
+        now = now or to_database(datetime.datetime.now(datetime.timezone.utc))
+        labels = data.pop("labels", None) if table == "playbooks" else None
+        if id is None:
+            id = self._existing(table, data)
+            if id is not None:
+                return id
+            row = self._row(table, data, now)
+            if "duration" in self.columns[table]:
+                self._duration(row)
+            id = self._insert(table, [row])
+        else:
+            row = self._row(table, data, now, partial=True)
+            if "duration" in self.columns[table] and row.get("ended") is not None:
+                started = self.connection.execute('SELECT started FROM "%s" WHERE id = ?' % table, (id,)).fetchone()
+                self._duration(row, started[0] if started else None)
+            self._update(table, id, row)
+        if labels is not None:
+            self._set_labels(id, [label["name"] if isinstance(label, dict) else label for label in labels], now)
+        return id
+
+    def _create_results(self, results):
+        # Results are only ever created, in a single statement
+        now = to_database(datetime.datetime.now(datetime.timezone.utc))
+        rows = [self._row("results", result, now) for result in results]
+        for row in rows:
+            self._duration(row)
+        # executemany requires every row to have the same columns
+        columns = set().union(*rows)
+        self._insert("results", [{column: row.get(column) for column in columns} for row in rows])
+
+    def _represent(self, table, row):
+        """Returns an object the way it is represented by the API"""
+        obj = {}
+        for column, value in row.items():
+            type_ = self.columns[table].get(column, "")
+            if column in REFERENCES:
+                column = column[: -len("_id")]
+            elif column in COMPRESSED_OBJECTS and table != "files" and value is not None:
+                value = decompress(value)
+            elif column == "contents":
+                value = zlib.decompress(value).decode("utf8")
+            elif type_ == "datetime":
+                value = from_database(value)
+            elif type_ == "bool":
+                value = bool(value)
+            elif type_ == "char(32)" and value is not None:
+                value = str(uuid.UUID(value))
+            elif column == "duration" and value is not None:
+                value = duration_string(value)
+            obj[column] = value
+        if table == "playbooks":
+            obj["labels"] = [
+                dict(id=id, name=name)
+                for id, name in self.connection.execute(
+                    "SELECT labels.id, labels.name FROM labels "
+                    "JOIN playbooks_labels ON playbooks_labels.label_id = labels.id "
+                    "WHERE playbooks_labels.playbook_id = ? ORDER BY labels.id",
+                    (obj["id"],),
+                )
+            ]
+        elif table == "files":
+            obj["sha1"], contents = self.connection.execute(
+                "SELECT sha1, contents FROM file_contents WHERE id = ?", (obj["content"],)
+            ).fetchone()
+            obj["content"] = zlib.decompress(contents).decode("utf8")
+        return obj
+
+    def _condition(self, table, field, values):
+        """
+        Returns the SQL condition of a filter of the API and its values.
+        Like the API, only the last value is used except for filters accepting multiple values.
+        """
+        if field not in FILTERS[table]:
+            raise SqliteError("Unsupported filter on %s with the sqlite client: %s" % (table, field))
+        column, lookup = FILTERS[table][field]
+        type_ = self.columns[table][column]
+        value = values[-1]
+
+        if lookup in ["icontains", "iexact", "label", "path"]:
+            # Like Django with sqlite, LIKE is case-insensitive
+            value = str(value).replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            if lookup in ["icontains", "path"]:
+                value = "%" + value + "%"
+            if lookup == "label":
+                return (
+                    '"id" IN (SELECT playbooks_labels.playbook_id FROM playbooks_labels '
+                    "JOIN labels ON labels.id = playbooks_labels.label_id WHERE labels.name LIKE ? ESCAPE '\\')",
+                    [value],
+                )
+            if lookup == "path":
+                return "\"file_id\" IN (SELECT id FROM files WHERE path LIKE ? ESCAPE '\\')", [value]
+            return "\"%s\" LIKE ? ESCAPE '\\'" % column, [value]
+        if lookup == "in":
+            placeholders = ", ".join("?" for value in values)
+            return 'LOWER("%s") IN (%s)' % (column, placeholders), [str(value).lower() for value in values]
+        if lookup == "bool":
+            if str(value).lower() not in ["true", "false", "1", "0"]:
+                raise SqliteError("Invalid value for %s: %s" % (field, value))
+            return '"%s" = ?' % column, [int(str(value).lower() in ["true", "1"])]
+
+        if type_ == "char(32)":
+            value = uuid.UUID(str(value)).hex
+        elif type_ == "datetime":
+            value = to_database(value)
+        elif type_ in ["integer", "bigint"]:
+            value = int(value)
+        operator = dict(exact="=", gt=">", lt="<", gte=">=", lte="<=")[lookup]
+        return '"%s" %s ?' % (column, operator), [value]
+
+    def _ordering(self, table, order):
+        ordering = []
+        for field in order.split(","):
+            column = field.lstrip("-")
+            if column not in ["id", "created", "updated"] + ORDERING.get(table, []):
+                raise SqliteError("Unsupported ordering of %s with the sqlite client: %s" % (table, field))
+            ordering.append('"%s"%s' % (column, " DESC" if field.startswith("-") else ""))
+        return ", ".join(ordering)
+
+    def _rows(self, table, where="", values=(), order='"id" DESC', limit=-1, offset=0):
+        cursor = self.connection.execute(
+            'SELECT * FROM "%s"%s ORDER BY %s LIMIT ? OFFSET ?' % (table, where, order), list(values) + [limit, offset]
+        )
+        columns = [description[0] for description in cursor.description]
+        return [self._represent(table, dict(zip(columns, row))) for row in cursor]
+
+    def _select(self, table, endpoint, params):
+        """
+        Returns a page of objects filtered and ordered like the API does.
+        params are lists of values, by parameter.
+        """
+        conditions, values = [], []
+        for field, field_values in params.items():
+            if field in PAGINATION or field == "order":
+                continue
+            condition, condition_values = self._condition(table, field, field_values)
+            conditions.append(condition)
+            values.extend(condition_values)
+        where = " WHERE %s" % " AND ".join(conditions) if conditions else ""
+        if "order" in params:
+            order = self._ordering(table, params["order"][-1])
+        else:
+            order = '"id" DESC' if table in RECENT_FIRST else '"id"'
+
+        if "limit" not in params:
+            results = self._rows(table, where, values, order)
+            return dict(count=len(results), next=None, previous=None, results=results)
+
+        limit, offset = int(params["limit"][-1]), int(params.get("offset", [0])[-1])
+        results = self._rows(table, where, values, order, limit, offset)
+        count = self.connection.execute('SELECT COUNT(*) FROM "%s"%s' % (table, where), values).fetchone()[0]
+
+        def link(offset):
+            query = dict(params, offset=[offset])
+            query.pop("cursor", None)
+            return "%s?%s" % (endpoint, urlencode(query, doseq=True))
+
+        return dict(
+            count=count,
+            next=link(offset + limit) if offset + limit < count else None,
+            previous=link(max(offset - limit, 0)) if offset else None,
+            results=results,
+        )
+
+    def _get(self, table, id):
+        results = self._rows(table, ' WHERE "id" = ?', [id])
+        if not results:
+            raise SqliteError("%s %s does not exist" % (table, id))
+        return results[0]
+
+    def _handle(self, method, endpoint, id, data, params):
+        bulk = endpoint.endswith("/bulk")
+        collection = endpoint[: -len("/bulk")] if bulk else endpoint
+        if collection not in TABLES:
+            return SqliteResponse(404, dict(detail="Unsupported endpoint with the sqlite client: %s" % endpoint))
+        table = TABLES[collection]["table"]
+
+        if method == "get":
+            if id is not None:
+                return SqliteResponse(200, self._get(table, id))
+            return SqliteResponse(200, self._select(table, collection, params))
+
+        if method == "delete":
+            # The API server deletes objects along with everything that references them
+            return SqliteResponse(405, dict(detail="Deleting is not supported with the sqlite client"))
+
+        with self._transaction():
+            if table == "results" and method == "post":
+                results = data if bulk else [data]
+                self._create_results(results)
+                if bulk:
+                    return SqliteResponse(201, dict(count=len(results)))
+                return SqliteResponse(201, dict(id=self.connection.execute("SELECT last_insert_rowid()").fetchone()[0]))
+            if bulk:
+                now = to_database(datetime.datetime.now(datetime.timezone.utc))
+                if method == "post":
+                    ids = [self._save(table, dict(item), now=now) for item in data]
+                else:
+                    ids = [self._save(table, dict(item, id=None), id=item["id"], now=now) for item in data]
+                return SqliteResponse(201 if method == "post" else 200, [self._get(table, id) for id in ids])
+            id = self._save(table, dict(data), id=id)
+            return SqliteResponse(201 if method == "post" else 200, self._get(table, id))
+
+    def _request(self, method, url, data=None, params=None):
+        url, _, query = url.partition("?")
+        endpoint, id = parse_url(url)
+        # Parameters can have multiple values, i.e. ?status=failed&status=ok
+        values = {}
+        for field, value in parse_qsl(query) + list((params or {}).items()):
+            values.setdefault(field, []).extend(value if isinstance(value, (list, tuple)) else [value])
+        params = values
+        if isinstance(data, bytes):
+            data = json.loads(data)
+        if isinstance(data, dict):
+            data.pop("id", None)
+
+        with self.lock:
+            try:
+                response = self._handle(method, endpoint, id, data, params)
+            except (SqliteError, sqlite3.IntegrityError, KeyError, ValueError) as e:
+                response = SqliteResponse(400, dict(detail=str(e)))
+
+        if response.status_code >= 400:
+            self.log.error("Failed to %s on %s: %s" % (method, url, response.data))
+        for observer in self.observers:
+            observer(method, url, response.status_code, 0, 0)
+        return response
+
+    def get(self, endpoint, **kwargs):
+        return self._request("get", endpoint, params=kwargs).json()
+
+    def patch(self, endpoint, data=None, **kwargs):
+        return self._request("patch", endpoint, kwargs if data is None else data).json()
+
+    def post(self, endpoint, data=None, **kwargs):
+        return self._request("post", endpoint, kwargs if data is None else data).json()
+
+    def put(self, endpoint, data=None, **kwargs):
+        return self._request("put", endpoint, kwargs if data is None else data).json()
+
+    def delete(self, endpoint, **kwargs):
+        return self._request("delete", endpoint)
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,306 @@
+# Copyright (c) 2020 The ARA Records Ansible authors
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# The schema of an ARA database, as created by running every migration with
+# "ara-manage migrate" on SQLite, for the clients that write to a database without
+# Django. It must be updated along with new migrations: the test suite compares it
+# with the schema of a migrated database.
+# The statements were dumped from sqlite_master and are kept verbatim so that the
+# databases are exactly the same as the ones created by Django.
+
+# fmt: off
+SCHEMA = [
+    (
+        'CREATE TABLE "django_migrations" ('
+        '"id" integer NOT NULL PRIMARY KEY AUTOINCREMENT, '
+        '"app" varchar(255) NOT NULL, '
+        '"name" varchar(255) NOT NULL, '
+        '"applied" datetime NOT NULL)'
+    ),
+    (
+        'CREATE TABLE "auth_group_permissions" ('
+        '"id" integer NOT NULL PRIMARY KEY AUTOINCREMENT, '
+        '"group_id" integer NOT NULL REFERENCES "auth_group" ("id") DEFERRABLE INITIALLY DEFERRED, '
+        '"permission_id" integer NOT NULL REFERENCES "auth_permission" ("id") DEFERRABLE INITIALLY DEFERRED)'
+    ),
+    (
+        'CREATE TABLE "auth_user_groups" ('
+        '"id" integer NOT NULL PRIMARY KEY AUTOINCREMENT, '
+        '"user_id" integer NOT NULL REFERENCES "auth_user" ("id") DEFERRABLE INITIALLY DEFERRED, '
+        '"group_id" integer NOT NULL REFERENCES "auth_group" ("id") DEFERRABLE INITIALLY DEFERRED)'
+    ),
+    (
+        'CREATE TABLE "auth_user_user_permissions" ('
+        '"id" integer NOT NULL PRIMARY KEY AUTOINCREMENT, '
+        '"user_id" integer NOT NULL REFERENCES "auth_user" ("id") DEFERRABLE INITIALLY DEFERRED, '
+        '"permission_id" integer NOT NULL REFERENCES "auth_permission" ("id") DEFERRABLE INITIALLY DEFERRED)'
+    ),
+    (
+        'CREATE UNIQUE INDEX "auth_group_permissions_group_id_permission_id_0cd325b0_uniq"'
+        ' ON "auth_group_permissions" ("group_id", "permission_id")'
+    ),
+    'CREATE INDEX "auth_group_permissions_group_id_b120cbf9" ON "auth_group_permissions" ("group_id")',
+    'CREATE INDEX "auth_group_permissions_permission_id_84c5c92e" ON "auth_group_permissions" ("permission_id")',
+    (
+        'CREATE UNIQUE INDEX "auth_user_groups_user_id_group_id_94350c0c_uniq"'
+        ' ON "auth_user_groups" ("user_id", "group_id")'
+    ),
+    'CREATE INDEX "auth_user_groups_user_id_6a12ed8b" ON "auth_user_groups" ("user_id")',
+    'CREATE INDEX "auth_user_groups_group_id_97559544" ON "auth_user_groups" ("group_id")',
+    (
+        'CREATE UNIQUE INDEX "auth_user_user_permissions_user_id_permission_id_14a6b632_uniq"'
+        ' ON "auth_user_user_permissions" ("user_id", "permission_id")'
+    ),
+    'CREATE INDEX "auth_user_user_permissions_user_id_a95ead1b" ON "auth_user_user_permissions" ("user_id")',
+    (
+        'CREATE INDEX "auth_user_user_permissions_permission_id_1fbb5f2c"'
+        ' ON "auth_user_user_permissions" ("permission_id")'
+    ),
+    (
+        'CREATE TABLE "django_admin_log" ('
+        '"id" integer NOT NULL PRIMARY KEY AUTOINCREMENT, '
+        '"action_time" datetime NOT NULL, '
+        '"object_id" text NULL, '
+        '"object_repr" varchar(200) NOT NULL, '
+        '"change_message" text NOT NULL, '
+        '"content_type_id" integer NULL REFERENCES "django_content_type" ("id") DEFERRABLE INITIALLY DEFERRED, '
+        '"user_id" integer NOT NULL REFERENCES "auth_user" ("id") DEFERRABLE INITIALLY DEFERRED, '
+        '"action_flag" smallint unsigned NOT NULL CHECK ("action_flag" >= 0))'
+    ),
+    'CREATE INDEX "django_admin_log_content_type_id_c4bce8eb" ON "django_admin_log" ("content_type_id")',
+    'CREATE INDEX "django_admin_log_user_id_c564eba6" ON "django_admin_log" ("user_id")',
+    (
+        'CREATE TABLE "file_contents" ('
+        '"id" integer NOT NULL PRIMARY KEY AUTOINCREMENT, '
+        '"created" datetime NOT NULL, '
+        '"updated" datetime NOT NULL, '
+        '"sha1" varchar(40) NOT NULL UNIQUE, '
+        '"contents" BLOB NOT NULL)'
+    ),
+    (
+        'CREATE TABLE "playbooks_labels" ('
+        '"id" integer NOT NULL PRIMARY KEY AUTOINCREMENT, '
+        '"playbook_id" bigint NOT NULL REFERENCES "playbooks" ("id") DEFERRABLE INITIALLY DEFERRED, '
+        '"label_id" bigint NOT NULL REFERENCES "labels" ("id") DEFERRABLE INITIALLY DEFERRED)'
+    ),
+    (
+        'CREATE UNIQUE INDEX "playbooks_labels_playbook_id_label_id_1a0adbe5_uniq"'
+        ' ON "playbooks_labels" ("playbook_id", "label_id")'
+    ),
+    'CREATE INDEX "playbooks_labels_playbook_id_011131fc" ON "playbooks_labels" ("playbook_id")',
+    'CREATE INDEX "playbooks_labels_label_id_a3b97e31" ON "playbooks_labels" ("label_id")',
+    (
+        'CREATE TABLE "records" ('
+        '"id" integer NOT NULL PRIMARY KEY AUTOINCREMENT, '
+        '"created" datetime NOT NULL, '
+        '"updated" datetime NOT NULL, '
+        '"key" varchar(255) NOT NULL, '
+        '"value" BLOB NOT NULL, '
+        '"type" varchar(255) NOT NULL, '
+        '"playbook_id" bigint NOT NULL REFERENCES "playbooks" ("id") DEFERRABLE INITIALLY DEFERRED)'
+    ),
+    'CREATE UNIQUE INDEX "records_key_playbook_id_a53f281f_uniq" ON "records" ("key", "playbook_id")',
+    'CREATE INDEX "records_playbook_id_613cde42" ON "records" ("playbook_id")',
+    (
+        'CREATE TABLE "labels" ('
+        '"id" integer NOT NULL PRIMARY KEY AUTOINCREMENT, '
+        '"created" datetime NOT NULL, '
+        '"updated" datetime NOT NULL, '
+        '"name" varchar(255) NOT NULL UNIQUE)'
+    ),
+    (
+        'CREATE TABLE "results" ('
+        '"id" integer NOT NULL PRIMARY KEY AUTOINCREMENT, '
+        '"created" datetime NOT NULL, '
+        '"updated" datetime NOT NULL, '
+        '"started" datetime NOT NULL, '
+        '"ended" datetime NULL, '
+        '"content" BLOB NOT NULL, '
+        '"host_id" bigint NOT NULL REFERENCES "hosts" ("id") DEFERRABLE INITIALLY DEFERRED, '
+        '"play_id" bigint NOT NULL REFERENCES "plays" ("id") DEFERRABLE INITIALLY DEFERRED, '
+        '"playbook_id" bigint NOT NULL REFERENCES "playbooks" ("id") DEFERRABLE INITIALLY DEFERRED, '
+        '"task_id" bigint NOT NULL REFERENCES "tasks" ("id") DEFERRABLE INITIALLY DEFERRED, '
+        '"changed" bool NOT NULL, '
+        '"ignore_errors" bool NOT NULL, '
+        '"duration" bigint NULL, '
+        '"status" varchar(25) NOT NULL)'
+    ),
+    'CREATE INDEX "results_host_id_cc92081c" ON "results" ("host_id")',
+    'CREATE INDEX "results_play_id_03eca33f" ON "results" ("play_id")',
+    'CREATE INDEX "results_playbook_id_f7f12c61" ON "results" ("playbook_id")',
+    'CREATE INDEX "results_task_id_3e4a3c27" ON "results" ("task_id")',
+    (
+        'CREATE TABLE "files" ('
+        '"id" integer NOT NULL PRIMARY KEY AUTOINCREMENT, '
+        '"created" datetime NOT NULL, '
+        '"updated" datetime NOT NULL, '
+        '"path" varchar(255) NOT NULL, '
+        '"content_id" bigint NOT NULL REFERENCES "file_contents" ("id") DEFERRABLE INITIALLY DEFERRED, '
+        '"playbook_id" bigint NOT NULL REFERENCES "playbooks" ("id") DEFERRABLE INITIALLY DEFERRED, '
+        '"client_uuid" char(32) NULL UNIQUE)'
+    ),
+    'CREATE UNIQUE INDEX "files_path_playbook_id_0eb834c6_uniq" ON "files" ("path", "playbook_id")',
+    'CREATE INDEX "files_content_id_8bafe2a1" ON "files" ("content_id")',
+    'CREATE INDEX "files_playbook_id_56f57d57" ON "files" ("playbook_id")',
+    (
+        'CREATE TABLE "hosts" ('
+        '"id" integer NOT NULL PRIMARY KEY AUTOINCREMENT, '
+        '"created" datetime NOT NULL, '
+        '"updated" datetime NOT NULL, '
+        '"name" varchar(255) NOT NULL, '
+        '"facts" BLOB NOT NULL, '
+        '"changed" integer NOT NULL, '
+        '"failed" integer NOT NULL, '
+        '"ok" integer NOT NULL, '
+        '"skipped" integer NOT NULL, '
+        '"unreachable" integer NOT NULL, '
+        '"playbook_id" bigint NOT NULL REFERENCES "playbooks" ("id") DEFERRABLE INITIALLY DEFERRED, '
+        '"client_uuid" char(32) NULL UNIQUE)'
+    ),
+    'CREATE UNIQUE INDEX "hosts_name_playbook_id_9ac22a75_uniq" ON "hosts" ("name", "playbook_id")',
+    'CREATE INDEX "hosts_playbook_id_d73f2410" ON "hosts" ("playbook_id")',
+    (
+        'CREATE TABLE "plays" ('
+        '"id" integer NOT NULL PRIMARY KEY AUTOINCREMENT, '
+        '"created" datetime NOT NULL, '
+        '"updated" datetime NOT NULL, '
+        '"started" datetime NOT NULL, '
+        '"ended" datetime NULL, '
+        '"name" varchar(255) NULL, '
+        '"uuid" char(32) NOT NULL, '
+        '"status" varchar(25) NOT NULL, '
+        '"playbook_id" bigint NOT NULL REFERENCES "playbooks" ("id") DEFERRABLE INITIALLY DEFERRED, '
+        '"duration" bigint NULL, '
+        '"client_uuid" char(32) NULL UNIQUE)'
+    ),
+    'CREATE INDEX "plays_playbook_id_cc61e267" ON "plays" ("playbook_id")',
+    (
+        'CREATE TABLE "playbooks" ('
+        '"id" integer NOT NULL PRIMARY KEY AUTOINCREMENT, '
+        '"created" datetime NOT NULL, '
+        '"updated" datetime NOT NULL, '
+        '"started" datetime NOT NULL, '
+        '"ended" datetime NULL, '
+        '"name" varchar(255) NULL, '
+        '"ansible_version" varchar(255) NOT NULL, '
+        '"status" varchar(25) NOT NULL, '
+        '"arguments" BLOB NOT NULL, '
+        '"path" varchar(255) NOT NULL, '
+        '"duration" bigint NULL, '
+        '"client_uuid" char(32) NULL UNIQUE)'
+    ),
+    (
+        'CREATE TABLE "tasks" ('
+        '"id" integer NOT NULL PRIMARY KEY AUTOINCREMENT, '
+        '"created" datetime NOT NULL, '
+        '"updated" datetime NOT NULL, '
+        '"started" datetime NOT NULL, '
+        '"ended" datetime NULL, '
+        '"name" text NULL, '
+        '"action" text NOT NULL, '
+        '"lineno" integer NOT NULL, '
+        '"tags" BLOB NOT NULL, '
+        '"handler" bool NOT NULL, '
+        '"status" varchar(25) NOT NULL, '
+        '"file_id" bigint NOT NULL REFERENCES "files" ("id") DEFERRABLE INITIALLY DEFERRED, '
+        '"play_id" bigint NOT NULL REFERENCES "plays" ("id") DEFERRABLE INITIALLY DEFERRED, '
+        '"playbook_id" bigint NOT NULL REFERENCES "playbooks" ("id") DEFERRABLE INITIALLY DEFERRED, '
+        '"duration" bigint NULL, '
+        '"client_uuid" char(32) NULL UNIQUE)'
+    ),
+    'CREATE INDEX "tasks_file_id_fc41d624" ON "tasks" ("file_id")',
+    'CREATE INDEX "tasks_play_id_8b47a0f3" ON "tasks" ("play_id")',
+    'CREATE INDEX "tasks_playbook_id_0f283c3b" ON "tasks" ("playbook_id")',
+    'CREATE INDEX "plays_status_updated" ON "plays" ("status", "updated")',
+    'CREATE INDEX "playbooks_status_updated" ON "playbooks" ("status", "updated")',
+    'CREATE INDEX "playbooks_started" ON "playbooks" ("started")',
+    'CREATE INDEX "results_playbook_started" ON "results" ("playbook_id", "started")',
+    'CREATE INDEX "results_status" ON "results" ("status")',
+    'CREATE INDEX "tasks_status_updated" ON "tasks" ("status", "updated")',
+    (
+        'CREATE TABLE "django_content_type" ('
+        '"id" integer NOT NULL PRIMARY KEY AUTOINCREMENT, '
+        '"app_label" varchar(100) NOT NULL, '
+        '"model" varchar(100) NOT NULL)'
+    ),
+    (
+        'CREATE UNIQUE INDEX "django_content_type_app_label_model_76bd3d3b_uniq"'
+        ' ON "django_content_type" ("app_label", "model")'
+    ),
+    (
+        'CREATE TABLE "auth_permission" ('
+        '"id" integer NOT NULL PRIMARY KEY AUTOINCREMENT, '
+        '"content_type_id" integer NOT NULL REFERENCES "django_content_type" ("id") DEFERRABLE INITIALLY DEFERRED, '
+        '"codename" varchar(100) NOT NULL, '
+        '"name" varchar(255) NOT NULL)'
+    ),
+    (
+        'CREATE UNIQUE INDEX "auth_permission_content_type_id_codename_01ab375a_uniq"'
+        ' ON "auth_permission" ("content_type_id", "codename")'
+    ),
+    'CREATE INDEX "auth_permission_content_type_id_2f476e4b" ON "auth_permission" ("content_type_id")',
+    (
+        'CREATE TABLE "auth_user" ('
+        '"id" integer NOT NULL PRIMARY KEY AUTOINCREMENT, '
+        '"password" varchar(128) NOT NULL, '
+        '"last_login" datetime NULL, '
+        '"is_superuser" bool NOT NULL, '
+        '"username" varchar(150) NOT NULL UNIQUE, '
+        '"first_name" varchar(30) NOT NULL, '
+        '"email" varchar(254) NOT NULL, '
+        '"is_staff" bool NOT NULL, '
+        '"is_active" bool NOT NULL, '
+        '"date_joined" datetime NOT NULL, '
+        '"last_name" varchar(150) NOT NULL)'
+    ),
+    (
+        'CREATE TABLE "auth_group" ('
+        '"id" integer NOT NULL PRIMARY KEY AUTOINCREMENT, '
+        '"name" varchar(150) NOT NULL UNIQUE)'
+    ),
+    (
+        'CREATE TABLE "health_check_db_testmodel" ('
+        '"id" integer NOT NULL PRIMARY KEY AUTOINCREMENT, '
+        '"title" varchar(128) NOT NULL)'
+    ),
+    (
+        'CREATE TABLE "django_session" ('
+        '"session_key" varchar(40) NOT NULL PRIMARY KEY, '
+        '"session_data" text NOT NULL, '
+        '"expire_date" datetime NOT NULL)'
+    ),
+    'CREATE INDEX "django_session_expire_date_a5c62663" ON "django_session" ("expire_date")',
+]
+
+# The migrations recorded as applied, in the order in which they are applied
+MIGRATIONS = [
+    ("contenttypes", "0001_initial"),
+    ("auth", "0001_initial"),
+    ("admin", "0001_initial"),
+    ("admin", "0002_logentry_remove_auto_add"),
+    ("admin", "0003_logentry_add_action_flag_choices"),
+    ("api", "0001_initial"),
+    ("api", "0002_remove_host_alias"),
+    ("api", "0003_add_missing_result_properties"),
+    ("api", "0004_duration_in_database"),
+    ("api", "0005_unique_label_names"),
+    ("api", "0006_remove_result_statuses"),
+    ("api", "0007_add_expired_status"),
+    ("api", "0008_add_client_uuid"),
+    ("api", "0009_add_indexes"),
+    ("contenttypes", "0002_remove_content_type_name"),
+    ("auth", "0002_alter_permission_name_max_length"),
+    ("auth", "0003_alter_user_email_max_length"),
+    ("auth", "0004_alter_user_username_opts"),
+    ("auth", "0005_alter_user_last_login_null"),
+    ("auth", "0006_require_contenttypes_0002"),
+    ("auth", "0007_alter_validators_add_error_messages"),
+    ("auth", "0008_alter_user_username_max_length"),
+    ("auth", "0009_alter_user_last_name_max_length"),
+    ("auth", "0010_alter_group_name_max_length"),
+    ("auth", "0011_update_proxy_permissions"),
+    ("health_check_db", "0001_initial"),
+    ("sessions", "0001_initial"),
+    ("db", "0001_initial"),
+]
+# fmt: on
@@ -15,7 +15,7 @@
 #  You should have received a copy of the GNU General Public License
 #  along with ARA.  If not, see <http://www.gnu.org/licenses/>.
 
-from requests.auth import HTTPBasicAuth
+from urllib.parse import parse_qsl, urlsplit, urlunsplit
 
 
 def get_client(
@@ -26,24 +26,88 @@ def get_client(
     password=None,
     verify=True,
     run_sql_migrations=True,
+    pool_maxsize=None,
+    spool_directory="~/.ara/spool",
+    compression=None,
+    compression_threshold=1024,
+    breaker_failures=0,
+    breaker_slow=0,
+    breaker_reset=30,
+    agent_socket="~/.ara/agent.sock",
+    sqlite_database=None,
 ):
     """
     Returns a specified client configuration or one with sane defaults.
     """
     auth = None
     if username is not None and password is not None:
+        from requests.auth import HTTPBasicAuth
+
         auth = HTTPBasicAuth(username, password)
 
     if client == "offline":
         from ara.clients.offline import AraOfflineClient
 
         return AraOfflineClient(auth=auth, run_sql_migrations=run_sql_migrations)
+    elif client == "direct":
+        from ara.clients.direct import AraDirectClient
+
+        return AraDirectClient(auth=auth, run_sql_migrations=run_sql_migrations)
     elif client == "http":
         from ara.clients.http import AraHttpClient
 
-        return AraHttpClient(endpoint=endpoint, timeout=timeout, auth=auth, verify=verify)
+        kwargs = {}
+        if pool_maxsize is not None:
+            kwargs["pool_maxsize"] = pool_maxsize
+        return AraHttpClient(
+            endpoint=endpoint,
+            timeout=timeout,
+            auth=auth,
+            verify=verify,
+            compression=compression,
+            compression_threshold=compression_threshold,
+            breaker_failures=breaker_failures,
+            breaker_slow=breaker_slow,
+            breaker_reset=breaker_reset,
+            **kwargs
+        )
+    elif client == "spool":
+        from ara.clients.spool import AraSpoolClient
+
+        return AraSpoolClient(directory=spool_directory)
+    elif client == "agent":
+        from ara.clients.agent import AraAgentClient
+
+        return AraAgentClient(path=agent_socket, timeout=timeout)
+    elif client == "sqlite":
+        from ara.clients.sqlite import AraSqliteClient
+
+        return AraSqliteClient(database=sqlite_database, timeout=timeout)
     else:
-        raise ValueError("Unsupported API client: %s (use 'http' or 'offline')" % client)
+        raise ValueError(
+            "Unsupported API client: %s (use 'http', 'offline', 'direct', 'spool', 'agent' or 'sqlite')" % client
+        )
+
+
+def walk(client, endpoint, **query):
+    """
+    Yields every object of a list endpoint, following the pages of the cursor pagination.
+    Each page starts where the previous one ended, regardless of how deep it is.
+    """
+    # Clients don't all merge a query string of the endpoint with the query arguments
+    endpoint, _, query_string = endpoint.partition("?")
+    query = dict(parse_qsl(query_string), **query)
+    query["pagination"] = "cursor"
+    page = client.get(endpoint, **query)
+    while True:
+        if "results" not in page:
+            raise ValueError("Unable to walk through %s: %s" % (endpoint, page))
+        for obj in page["results"]:
+            yield obj
+        if not page.get("next"):
+            return
+        # Links are absolute: keep only the path and the query for the endpoint of the client
+        page = client.get(urlunsplit(("", "") + urlsplit(page["next"])[2:4] + ("",)))
 
 
 def active_client():
@@ -145,7 +145,7 @@ class ActionModule(ActionBase):
     def create_or_update_key(self, playbook, key, value, type):
         changed = False
         record = self.client.get("/api/v1/records?playbook=%s&key=%s" % (playbook, key))
-        if record["count"] == 0:
+        if not record["results"]:
             # Create the record if it doesn't exist
             record = self.client.post("/api/v1/records", playbook=playbook, key=key, value=value, type=type)
             changed = True
@@ -17,18 +17,26 @@
 
 from __future__ import absolute_import, division, print_function
 
+import collections
 import datetime
-import json
+import functools
+import hashlib
 import logging
+import multiprocessing
 import os
-from concurrent.futures import ThreadPoolExecutor
+import queue
+import re
+import threading
+import time
+import uuid
+from concurrent import futures
 
 from ansible import __version__ as ansible_version
 from ansible.parsing.ajson import AnsibleJSONEncoder
 from ansible.plugins.callback import CallbackBase
-from ansible.vars.clean import module_response_deepcopy, strip_internal_keys
+from requests.exceptions import RequestException
 
-from ara.clients import utils as client_utils
+from ara.clients import encoding, utils as client_utils
 
 # Ansible CLI options are now in ansible.context in >= 2.8
 # https://github.com/ansible/ansible/commit/afdbb0d9d5bebb91f632f0d4a1364de5393ba17a
@@ -46,6 +54,10 @@ except ImportError:
         # using API without CLI
         cli_options = {}
 
+# Batches of results that failed to be sent are retried after a delay that doubles up to this amount of seconds
+MAX_BATCH_RETRY_DELAY = 60
+# Attempts at sending the batches left at the end of the playbook before giving up on them
+BATCH_FINAL_ATTEMPTS = 3
 
 DOCUMENTATION = """
 callback: ara
@@ -64,7 +76,37 @@ options:
     ini:
       - section: ara
         key: api_client
-    choices: ['offline', 'http']
+    choices: ['offline', 'http', 'direct', 'spool', 'agent', 'sqlite']
+  spool_directory:
+    description: |
+        When using the spool client, the directory where journals are written.
+        Journals can be uploaded to an API server with "ara replay <journal>".
+    default: ~/.ara/spool
+    env:
+      - name: ARA_SPOOL_DIRECTORY
+    ini:
+      - section: ara
+        key: spool_directory
+  agent_socket:
+    description: |
+        When using the agent client, the Unix domain socket of the agent relaying requests to the API server.
+        The agent is started with "ara agent".
+    default: ~/.ara/agent.sock
+    env:
+      - name: ARA_AGENT_SOCKET
+    ini:
+      - section: ara
+        key: agent_socket
+  sqlite_database:
+    description: |
+        When using the sqlite client, the path to the sqlite database written to without an API server.
+        The database is created if it doesn't exist.
+        Defaults to ARA_DATABASE_NAME or ansible.sqlite in ARA_BASE_DIR, like the offline client.
+    env:
+      - name: ARA_SQLITE_DATABASE
+    ini:
+      - section: ara
+        key: sqlite_database
   api_server:
     description: When using the HTTP client, the base URL to the ARA API server
     default: http://127.0.0.1:8000
@@ -107,6 +149,185 @@ options:
     ini:
       - section: ara
         key: api_timeout
+  api_compression:
+    description: |
+        When using the HTTP client, compresses request bodies larger than api_compression_threshold.
+        'zstd' requires the zstandard python package on both the client and the API server, gzip is used
+        instead if it is not installed on the client.
+    default: none
+    env:
+      - name: ARA_API_COMPRESSION
+    ini:
+      - section: ara
+        key: api_compression
+    choices: ['none', 'gzip', 'zstd']
+  api_compression_threshold:
+    description: Size, in bytes, from which request bodies are compressed when api_compression is enabled
+    type: integer
+    default: 1024
+    env:
+      - name: ARA_API_COMPRESSION_THRESHOLD
+    ini:
+      - section: ara
+        key: api_compression_threshold
+  api_deadline:
+    description: |
+        Maximum amount of time, in seconds, that a callback hook can spend sending requests to the API while
+        Ansible waits for it. When the deadline or api_timeout is exceeded, or when the circuit breaker is open,
+        a warning is displayed and the rest of the playbook is not recorded instead of slowing down the run.
+        Disabled by default (0).
+    type: float
+    default: 0
+    env:
+      - name: ARA_API_DEADLINE
+    ini:
+      - section: ara
+        key: api_deadline
+  api_breaker_failures:
+    description: |
+        When using the HTTP client, amount of consecutive requests that failed or were slower than
+        api_breaker_slow before requests fail immediately instead of waiting for the API server.
+        Disabled by default (0).
+    type: integer
+    default: 0
+    env:
+      - name: ARA_API_BREAKER_FAILURES
+    ini:
+      - section: ara
+        key: api_breaker_failures
+  api_breaker_slow:
+    description: Requests taking longer than this amount of seconds count as failures for api_breaker_failures
+    type: float
+    default: 0
+    env:
+      - name: ARA_API_BREAKER_SLOW
+    ini:
+      - section: ara
+        key: api_breaker_slow
+  api_breaker_reset:
+    description: Amount of seconds before trying to send a request again once api_breaker_failures is reached
+    type: integer
+    default: 30
+    env:
+      - name: ARA_API_BREAKER_RESET
+    ini:
+      - section: ara
+        key: api_breaker_reset
+  callback_transport:
+    description: |
+        How the callback dispatches data to the API.
+        'async' sends data in order through a persistent pool of threads and only waits for pending requests to
+        complete at the end of the playbook.
+        'barrier' waits for every result of a task to be saved before Ansible can move on to the next task.
+        Strategies that let hosts run different tasks at once (i.e, free) are never made to wait.
+    default: async
+    env:
+      - name: ARA_CALLBACK_TRANSPORT
+    ini:
+      - section: ara
+        key: callback_transport
+    choices: ['async', 'barrier']
+  callback_queue_size:
+    description: |
+        Maximum amount of pending requests queued by the callback before Ansible is made to wait for the API.
+        Set to 0 for an unbounded queue.
+    type: integer
+    default: 1000
+    env:
+      - name: ARA_CALLBACK_QUEUE_SIZE
+    ini:
+      - section: ara
+        key: callback_queue_size
+  callback_threads:
+    description: |
+        Amount of threads used to send data to the API.
+        The spool and sqlite clients always use a single thread.
+    type: integer
+    default: 4
+    env:
+      - name: ARA_CALLBACK_THREADS
+    ini:
+      - section: ara
+        key: callback_threads
+  callback_max_threads:
+    description: |
+        The amount of threads is adjusted while the playbook runs:
+        it grows by one while the API answers quickly and is halved when requests fail or slow down
+        significantly, without going above this maximum nor below callback_threads.
+        Set to the same value as callback_threads (or lower) to disable adjustments.
+    type: integer
+    default: 16
+    env:
+      - name: ARA_CALLBACK_MAX_THREADS
+    ini:
+      - section: ara
+        key: callback_max_threads
+  callback_encoder_processes:
+    description: |
+        When higher than 0, results are sanitized and encoded to JSON by this amount of separate processes
+        instead of the threads of the callback in order to leave more CPU time to Ansible.
+    type: integer
+    default: 0
+    env:
+      - name: ARA_CALLBACK_ENCODER_PROCESSES
+    ini:
+      - section: ara
+        key: callback_encoder_processes
+  callback_batch_size:
+    description: |
+        When higher than 0, results and host updates are buffered and sent to the bulk endpoints of the API once
+        this amount of results is pending, when callback_batch_timeout expires or when a task ends.
+        Requires an API server that provides bulk endpoints.
+    type: integer
+    default: 0
+    env:
+      - name: ARA_CALLBACK_BATCH_SIZE
+    ini:
+      - section: ara
+        key: callback_batch_size
+  callback_batch_timeout:
+    description: Maximum amount of seconds a buffered result can wait before being sent when batching is enabled
+    type: float
+    default: 2.0
+    env:
+      - name: ARA_CALLBACK_BATCH_TIMEOUT
+    ini:
+      - section: ara
+        key: callback_batch_timeout
+  callback_fire_and_forget:
+    description: |
+        Playbooks, plays, tasks and files are created by the threads of the callback with an identifier generated
+        by the callback (client_uuid) so that Ansible never waits for the API server to return their id.
+        Requires an API server that supports client_uuid. Has no effect with the spool client.
+    type: bool
+    default: false
+    env:
+      - name: ARA_CALLBACK_FIRE_AND_FORGET
+    ini:
+      - section: ara
+        key: callback_fire_and_forget
+  callback_metrics:
+    description: |
+        Measures the overhead of the callback (time spent in hooks, waiting for the API and latency of requests)
+        and displays a summary at the end of the playbook.
+    type: bool
+    default: false
+    env:
+      - name: ARA_CALLBACK_METRICS
+    ini:
+      - section: ara
+        key: callback_metrics
+  callback_metrics_record:
+    description: |
+        When callback_metrics is enabled, also saves the measurements as a json record named "ara_metrics"
+        on the playbook.
+    type: bool
+    default: false
+    env:
+      - name: ARA_CALLBACK_METRICS_RECORD
+    ini:
+      - section: ara
+        key: callback_metrics_record
   argument_labels:
     description: |
         A list of CLI arguments that, if set, will be automatically applied to playbooks as labels.
@@ -160,9 +381,342 @@ options:
     ini:
       - section: ara
         key: ignored_files
+  ignored_result_content:
+    description:
+      - List of result statuses for which only the metadata of the result (status, timing, host and task) is saved
+        and not its content, for example "ok,skipped" to save the content of results that failed or changed.
+      - Statuses are "ok", "changed", "failed", "skipped" and "unreachable". "ok" only matches results that did not
+        change. Facts gathered by results are saved regardless.
+    type: list
+    default: []
+    env:
+      - name: ARA_IGNORED_RESULT_CONTENT
+    ini:
+      - section: ara
+        key: ignored_result_content
+  result_stdout_max_size:
+    description:
+      - When higher than 0, the stdout and stderr of results (including stdout_lines and stderr_lines) are truncated
+        to this amount of characters.
+    type: integer
+    default: 0
+    env:
+      - name: ARA_RESULT_STDOUT_MAX_SIZE
+    ini:
+      - section: ara
+        key: result_stdout_max_size
 """
 
 
+class Dispatcher(object):
+    """
+    Runs jobs on a persistent pool of worker threads fed by a bounded queue.
+    Jobs are started in the order they were submitted and a job can be made to
+    wait for the completion of jobs that were submitted before it.
+    """
+
+    def __init__(self, workers, queue_size=0, metrics=None):
+        self.log = logging.getLogger("ara.plugins.callback.default")
+        self.metrics = metrics
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.lock = threading.Lock()
+        self.threads = []
+        self.workers = 0
+        self.started = 0
+        self.resize(workers)
+
+    def resize(self, workers):
+        """
+        Changes the amount of worker threads. New threads are started right
+        away while extra threads stop once they are done with their current job.
+        """
+        with self.lock:
+            self.workers = max(1, workers)
+            self.threads = [thread for thread in self.threads if thread.is_alive()]
+            while len(self.threads) < self.workers:
+                thread = threading.Thread(target=self._work, name="ara-worker-%s" % self.started, daemon=True)
+                self.started += 1
+                thread.start()
+                self.threads.append(thread)
+
+    def _retire(self):
+        # Called by workers between jobs, returns True if the calling thread should stop
+        with self.lock:
+            current = threading.current_thread()
+            if len(self.threads) > self.workers and current in self.threads:
+                self.threads.remove(current)
+                return True
+            return False
+
+    def submit(self, func, *args, **kwargs):
+        return self.submit_after(None, func, *args, **kwargs)
+
+    def submit_after(self, dependencies, func, *args, **kwargs):
+        """
+        Queues a job that will only run once the futures provided as
+        dependencies are done. Dependencies must have been submitted first.
+        """
+        future = futures.Future()
+        # Blocks when the queue is full so Ansible can't outpace the API indefinitely
+        self.queue.put((future, dependencies, func, args, kwargs, time.monotonic()))
+        return future
+
+    def _work(self):
+        while not self._retire():
+            job = self.queue.get()
+            try:
+                if job is None:
+                    return
+                future, dependencies, func, args, kwargs, queued = job
+                if self.metrics is not None:
+                    self.metrics.waited(time.monotonic() - queued)
+                # Dependencies were queued before this job: they are either done
+                # or already running in another worker so waiting can't deadlock.
+                if dependencies:
+                    futures.wait(dependencies)
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    future.set_result(func(*args, **kwargs))
+                except Exception as e:
+                    self.log.exception("Error running %s" % getattr(func, "__name__", func))
+                    future.set_exception(e)
+            finally:
+                self.queue.task_done()
+
+    def cancel(self):
+        """Cancels the queued jobs that have not started yet"""
+        while True:
+            try:
+                job = self.queue.get_nowait()
+            except queue.Empty:
+                return
+            if job is not None:
+                job[0].cancel()
+            self.queue.task_done()
+
+    def join(self):
+        """Waits until every queued job has completed"""
+        self.queue.join()
+
+    def shutdown(self):
+        with self.lock:
+            threads, self.threads = self.threads, []
+            self.workers = 0
+        for thread in threads:
+            self.queue.put(None)
+        for thread in threads:
+            thread.join()
+
+
+def request_endpoint(method, url):
+    """
+    Groups requests by endpoint regardless of the object, identified by id or uuid, and query:
+    ("patch", "/api/v1/tasks/1?x=y") -> "PATCH /api/v1/tasks/<id>"
+    """
+    return "%s %s" % (method.upper(), re.sub(r"/(\d+|[0-9a-f-]{36})(?=/|$)", "/<id>", url.split("?")[0]))
+
+
+class ConcurrencyController(object):
+    """
+    Adjusts the amount of workers of a Dispatcher from the latency and errors
+    of API requests (additive increase, multiplicative decrease).
+    The concurrency grows by one after each round of successful requests and is
+    halved when requests fail or become significantly slower than the fastest
+    latency observed so far for the same endpoint and method, since creating a
+    playbook and sending a batch of results don't take the same time.
+    It never goes below the amount of workers the dispatcher started with.
+    """
+
+    def __init__(self, dispatcher, minimum=None, maximum=16, latency_factor=2.0, smoothing=0.2):
+        self.log = logging.getLogger("ara.plugins.callback.default")
+        self.dispatcher = dispatcher
+        self.minimum = dispatcher.workers if minimum is None else minimum
+        self.maximum = maximum
+        self.latency_factor = latency_factor
+        self.smoothing = smoothing
+        self.lock = threading.Lock()
+        # Smoothed and fastest latencies, by endpoint
+        self.latency = {}
+        self.baseline = {}
+        # Amount of requests observed since the concurrency was last changed
+        self.observed = 0
+        self.peak = dispatcher.workers
+
+    @property
+    def concurrency(self):
+        return self.dispatcher.workers
+
+    def observe(self, method, url, status_code, elapsed, size=0):
+        with self.lock:
+            self.observed += 1
+            if status_code is None or status_code >= 500 or status_code == 429:
+                self._decrease("HTTP %s on %s" % (status_code, url))
+                return
+
+            endpoint = request_endpoint(method, url)
+            latency = self.latency.get(endpoint)
+            if latency is None:
+                latency = elapsed
+            else:
+                latency = self.smoothing * elapsed + (1 - self.smoothing) * latency
+            self.latency[endpoint] = latency
+            baseline = self.baseline[endpoint] = min(latency, self.baseline.get(endpoint, latency))
+
+            if latency > baseline * self.latency_factor:
+                self._decrease("latency of %.3fs on %s (baseline: %.3fs)" % (latency, endpoint, baseline))
+            elif self.observed >= self.concurrency:
+                self._set(self.concurrency + 1)
+
+    def _decrease(self, reason):
+        # Leave a round of requests sent at the previous concurrency go through before backing off again
+        if self.observed < self.concurrency:
+            return
+        if self._set(self.concurrency // 2):
+            self.log.debug("reduced concurrency to %s due to %s" % (self.concurrency, reason))
+        # Give the new concurrency a chance to settle on new latencies
+        self.latency = {}
+
+    def _set(self, workers):
+        workers = min(self.maximum, max(self.minimum, workers))
+        self.observed = 0
+        if workers == self.concurrency:
+            return False
+        self.dispatcher.resize(workers)
+        self.peak = max(self.peak, workers)
+        return True
+
+
+class Metrics(object):
+    """
+    Measures the overhead of the callback: the time spent in hooks on Ansible's
+    thread, the time jobs wait in the queue before being run, the latency and
+    size of requests to the API as well as the time spent waiting for them.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.started = time.monotonic()
+        self.hooks = collections.defaultdict(list)
+        # Time spent in hooks, excluding hooks called by other hooks
+        self.hooks_total = 0.0
+        self.queue_wait = []
+        self.requests = collections.defaultdict(list)
+        self.errors = collections.Counter()
+        self.sizes = collections.Counter()
+        self.blocked = collections.defaultdict(float)
+
+    def hook(self, func):
+        """Returns func wrapped to measure the time spent in it"""
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            depth = getattr(self.local, "depth", 0)
+            self.local.depth = depth + 1
+            start = time.monotonic()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.monotonic() - start
+                self.local.depth = depth
+                with self.lock:
+                    self.hooks[func.__name__].append(elapsed)
+                    if depth == 0:
+                        self.hooks_total += elapsed
+
+        return wrapper
+
+    def waited(self, elapsed):
+        with self.lock:
+            self.queue_wait.append(elapsed)
+
+    def block(self, name, elapsed):
+        with self.lock:
+            self.blocked[name] += elapsed
+
+    def observe(self, method, url, status_code, elapsed, size=0):
+        endpoint = request_endpoint(method, url)
+        with self.lock:
+            self.requests[endpoint].append(elapsed)
+            self.sizes[endpoint] += size
+            if status_code is None or status_code >= 400:
+                self.errors[endpoint] += 1
+
+    @staticmethod
+    def _distribution(samples):
+        samples = sorted(samples)
+
+        def percentile(p):
+            return round(samples[min(len(samples) - 1, int(len(samples) * p / 100))], 6) if samples else 0
+
+        return dict(
+            count=len(samples),
+            total=round(sum(samples), 6),
+            p50=percentile(50),
+            p95=percentile(95),
+            p99=percentile(99),
+            max=round(samples[-1], 6) if samples else 0,
+        )
+
+    def summary(self):
+        with self.lock:
+            duration = time.monotonic() - self.started
+            requests = {}
+            for endpoint, samples in sorted(self.requests.items()):
+                requests[endpoint] = self._distribution(samples)
+                requests[endpoint].update(errors=self.errors[endpoint], bytes=self.sizes[endpoint])
+            return dict(
+                duration=round(duration, 6),
+                hooks_total=round(self.hooks_total, 6),
+                hooks={name: self._distribution(samples) for name, samples in sorted(self.hooks.items())},
+                queue_wait=self._distribution(self.queue_wait),
+                requests=requests,
+                blocked={name: round(elapsed, 6) for name, elapsed in sorted(self.blocked.items())},
+            )
+
+    @staticmethod
+    def format(summary):
+        duration = summary["duration"] or 1
+        lines = [
+            "ARA callback overhead: %.2fs in hooks (%.1f%% of %.2fs), %.2fs waiting for the API to end tasks, "
+            "%.2fs waiting for pending requests at the end of the playbook"
+            % (
+                summary["hooks_total"],
+                summary["hooks_total"] * 100 / duration,
+                summary["duration"],
+                summary["blocked"].get("end_task", 0),
+                summary["blocked"].get("end_playbook", 0),
+            ),
+            "%-40s %8s %10s %10s %10s %10s" % ("hook", "count", "total", "p50", "p95", "max"),
+        ]
+        for name, hook in summary["hooks"].items():
+            lines.append(
+                "%-40s %8s %9.3fs %9.4fs %9.4fs %9.4fs"
+                % (name, hook["count"], hook["total"], hook["p50"], hook["p95"], hook["max"])
+            )
+        wait = summary["queue_wait"]
+        lines.append(
+            "%-40s %8s %9.3fs %9.4fs %9.4fs %9.4fs"
+            % ("(queue wait)", wait["count"], wait["total"], wait["p50"], wait["p95"], wait["max"])
+        )
+        lines.append("%-40s %8s %7s %10s %10s %10s %12s" % ("request", "count", "errors", "p50", "p95", "p99", "bytes"))
+        for endpoint, request in summary["requests"].items():
+            lines.append(
+                "%-40s %8s %7s %9.4fs %9.4fs %9.4fs %12s"
+                % (
+                    endpoint,
+                    request["count"],
+                    request["errors"],
+                    request["p50"],
+                    request["p95"],
+                    request["p99"],
+                    request["bytes"],
+                )
+            )
+        return "\n".join(lines)
+
+
 class CallbackModule(CallbackBase):
     """
     Saves data from an Ansible run into a database
@@ -178,22 +732,61 @@ class CallbackModule(CallbackBase):
         # These are configured in self.set_options
         self.client = None
         self.thread_count = None
-        self.global_threads = None
-        # Need individual threads for tasks to ensure all results are saved before moving on to next task
-        self.task_threads = None
+        self.transport = None
+        self.dispatcher = None
+        self.controller = None
+        # Optional pool of processes encoding results
+        self.encoder = None
+        # Optional measurements of the overhead of the callback
+        self.metrics = None
+        self.metrics_record = False
+        # Budget, in seconds, of each hook for its requests to the API
+        self.deadline = None
+        # Nothing is recorded once the API has been found unavailable
+        self.degraded = False
+        # When creating objects without waiting for their id, futures of the jobs creating them
+        self.fire_and_forget = False
+        self.playbook_job = None
+        self.play_job = None
+        self.file_jobs = {}
+
+        # Results and host facts waiting to be sent in bulk when batching is enabled
+        self.batch_size = 0
+        self.batch_timeout = None
+        self.batch_timer = None
+        self.batch_lock = threading.Lock()
+        # Only one batch is sent at a time so that ending a task also waits for batches being sent
+        self.flush_lock = threading.Lock()
+        self.pending_results = []
+        self.pending_facts = {}
+        # Seconds to wait before sending a batch again after a failure
+        self.batch_retry_delay = 0
 
         self.ignored_facts = []
         self.ignored_arguments = []
         self.ignored_files = []
+        self.ignored_result_content = []
+        self.result_stdout_max_size = 0
 
         self.result = None
+        # When results started, by (host, task uuid)
         self.result_started = {}
-        self.result_ended = {}
+        # Tasks that are running, by uuid: the task, the future of the job creating it, the futures of the jobs
+        # saving its results and the hosts that reported a result. Tasks are ended once their jobs are done.
+        self.tasks = {}
+        # The last task that was started
         self.task = None
         self.play = None
+        # With strategies that let hosts run different tasks at once (i.e, free), the hosts of the play:
+        # tasks are ended once every host reported a result rather than when the next task starts.
+        self.play_hosts = None
         self.playbook = None
         self.stats = None
+        # Futures of the files created, or being created, by path
         self.file_cache = {}
+        self.file_lock = threading.Lock()
+        # sha1 of the file contents known to be stored by the server
+        self.file_contents = set()
         self.host_cache = {}
 
     def set_options(self, task_keys=None, var_options=None, direct=None):
@@ -204,13 +797,31 @@ class CallbackModule(CallbackBase):
         self.ignored_facts = self.get_option("ignored_facts")
         self.ignored_arguments = self.get_option("ignored_arguments")
         self.ignored_files = self.get_option("ignored_files")
+        self.ignored_result_content = self.get_option("ignored_result_content")
+        self.result_stdout_max_size = self.get_option("result_stdout_max_size")
+        self.transport = self.get_option("callback_transport")
+        self.batch_size = self.get_option("callback_batch_size")
+        self.batch_timeout = self.get_option("callback_batch_timeout")
+        self.deadline = self.get_option("api_deadline")
 
         client = self.get_option("api_client")
+        # The spool client does not wait for an API server and references objects by its own ids
+        self.fire_and_forget = self.get_option("callback_fire_and_forget") and client != "spool"
         endpoint = self.get_option("api_server")
         timeout = self.get_option("api_timeout")
         username = self.get_option("api_username")
         password = self.get_option("api_password")
         insecure = self.get_option("api_insecure")
+        compression = self.get_option("api_compression")
+
+        # The spool and sqlite clients write from a single thread, the offline and direct clients funnel
+        # writes through a single writer so that threads don't get "database is locked" errors.
+        if client in ["spool", "sqlite"]:
+            self.thread_count = max_threads = 1
+        else:
+            self.thread_count = max(1, self.get_option("callback_threads"))
+            max_threads = max(self.thread_count, self.get_option("callback_max_threads"))
+
         self.client = client_utils.get_client(
             client=client,
             endpoint=endpoint,
@@ -218,15 +829,77 @@ class CallbackModule(CallbackBase):
             username=username,
             password=password,
             verify=False if insecure else True,
+            # Workers share the connection pool with the main thread
+            pool_maxsize=max_threads + 1,
+            spool_directory=self.get_option("spool_directory"),
+            agent_socket=self.get_option("agent_socket"),
+            sqlite_database=self.get_option("sqlite_database"),
+            compression=None if compression == "none" else compression,
+            compression_threshold=self.get_option("api_compression_threshold"),
+            breaker_failures=self.get_option("api_breaker_failures"),
+            breaker_slow=self.get_option("api_breaker_slow"),
+            breaker_reset=self.get_option("api_breaker_reset"),
+        )
+
+        encoder_processes = self.get_option("callback_encoder_processes")
+        if encoder_processes > 0:
+            # Processes are forked like Ansible's workers, start them before the threads of the dispatcher
+            self.encoder = futures.ProcessPoolExecutor(
+                max_workers=encoder_processes, mp_context=multiprocessing.get_context("fork")
+            )
+            self.encoder.submit(int).result()
+
+        if self.get_option("callback_metrics"):
+            self.metrics = Metrics()
+            self.metrics_record = self.get_option("callback_metrics_record")
+            self.client.observers.append(self.metrics.observe)
+
+        for name in dir(self):
+            if name.startswith("v2_") and callable(getattr(self, name)):
+                hook = self._guard(getattr(self, name))
+                # Hooks are only measured when enabled so there is no overhead otherwise
+                if self.metrics is not None:
+                    hook = self.metrics.hook(hook)
+                setattr(self, name, hook)
+
+        self.dispatcher = Dispatcher(
+            workers=self.thread_count, queue_size=self.get_option("callback_queue_size"), metrics=self.metrics
         )
+        if max_threads > self.thread_count:
+            self.controller = ConcurrencyController(self.dispatcher, maximum=max_threads)
+            self.client.observers.append(self.controller.observe)
+        self.log.debug("working with %s thread(s) and %s transport" % (self.thread_count, self.transport))
+
+    def _guard(self, hook):
+        """
+        Returns the hook wrapped so that its requests to the API are subject to api_deadline and so
+        that the rest of the playbook is not recorded, rather than blocking Ansible, if the API is unavailable.
+        """
 
-        # TODO: Consider un-hardcoding this and plumbing pool_maxsize to requests.adapters.HTTPAdapter.
-        #       In the meantime default to 4 so we don't go above requests.adapters.DEFAULT_POOLSIZE.
-        #       Otherwise we can hit "urllib3.connectionpool: Connection pool is full"
-        # TODO: Using >= 2 threads with the offline client can result in execution getting locked up
-        self.thread_count = 1 if client == "offline" else 4
-        self.global_threads = ThreadPoolExecutor(max_workers=self.thread_count)
-        self.log.debug("working with %s thread(s)" % self.thread_count)
+        @functools.wraps(hook)
+        def wrapper(*args, **kwargs):
+            if self.degraded:
+                return
+            try:
+                with self.client.deadline(self.deadline):
+                    return hook(*args, **kwargs)
+            except RequestException as e:
+                self._degrade(e)
+
+        return wrapper
+
+    def _degrade(self, error):
+        self.degraded = True
+        self._display.warning(
+            "ARA was unable to reach the API server in time, the rest of this playbook will not be recorded: %s"
+            % str(error)
+        )
+        # Requests that have not been sent yet would only wait for the API as well
+        self.dispatcher.cancel()
+        if self.batch_timer is not None:
+            self.batch_timer.cancel()
+        if self.encoder is not None:
+            self.encoder.shutdown(wait=False)
 
     def v2_playbook_on_start(self, playbook):
         self.log.debug("v2_playbook_on_start")
@@ -265,27 +938,38 @@ class CallbackModule(CallbackBase):
         self.argument_labels = argument_labels
 
         # Create the playbook
-        self.playbook = self.client.post(
+        self.playbook, self.playbook_job = self._create(
             "/api/v1/playbooks",
+            [],
             ansible_version=ansible_version,
             arguments=cli_options,
             status="running",
             path=path,
             started=datetime.datetime.now().isoformat(),
         )
+        self.playbook.setdefault("name", None)
+        self.playbook.setdefault("labels", [])
 
         # Record the playbook file
-        self.global_threads.submit(self._get_or_create_file, path, content)
+        self._submit_file(path, content)
 
         return self.playbook
 
     def v2_playbook_on_play_start(self, play):
         self.log.debug("v2_playbook_on_play_start")
-        self._end_task()
+        self._end_tasks()
         self._end_play()
 
+        # The linear strategy (and strategies based on it) runs every task on every host before the next task
+        strategy = play.strategy or "linear"
+        if strategy == "debug" or strategy.rsplit(".", 1)[-1].endswith("linear"):
+            self.play_hosts = None
+        else:
+            inventory = play._variable_manager._inventory
+            self.play_hosts = set(host.get_name() for host in inventory.get_hosts(play.hosts))
+
         # Load variables to verify if there is anything relevant for ara
-        play_vars = play._variable_manager.get_vars(play=play)["vars"]
+        play_vars = self._get_play_vars(play, ["ara_playbook_name", "ara_playbook_labels"])
         if "ara_playbook_name" in play_vars:
             self._set_playbook_name(name=play_vars["ara_playbook_name"])
 
@@ -305,11 +989,12 @@ class CallbackModule(CallbackBase):
 
         # Record all the files involved in the play
         for path in play._loader._FILE_CACHE.keys():
-            self.global_threads.submit(self._get_or_create_file, path)
+            self._submit_file(path)
 
         # Create the play
-        self.play = self.client.post(
+        self.play, self.play_job = self._create(
             "/api/v1/plays",
+            [self.playbook_job],
             name=play.name,
             status="running",
             uuid=play._uuid,
@@ -319,6 +1004,35 @@ class CallbackModule(CallbackBase):
 
         return self.play
 
+    def _get_play_vars(self, play, keys):
+        """
+        Returns the variables of a play that are named by keys, if they are defined.
+        Resolving every variable of a play is expensive with large inventories so they are
+        looked up in the extra vars and in the vars of the play first. Variables are only
+        fully resolved when vars_files or roles of the play could also define them.
+        """
+        variable_manager = play._variable_manager
+        # Extra vars always win
+        play_vars = {key: variable_manager.extra_vars[key] for key in keys if key in variable_manager.extra_vars}
+        missing = [key for key in keys if key not in play_vars]
+        if not missing:
+            return play_vars
+
+        # vars_files have to be loaded and templated, roles can have their own definition of the variables
+        inconclusive = bool(play.get_vars_files()) or any(
+            key in role.get_default_vars() or key in role.get_vars(include_params=False)
+            for role in play.get_roles()
+            for key in missing
+        )
+        if inconclusive:
+            self.log.debug("resolving the variables of the play to find: %s" % ",".join(missing))
+            all_vars = variable_manager.get_vars(play=play)["vars"]
+            return {key: all_vars[key] for key in keys if key in all_vars}
+
+        vars_ = play.get_vars()
+        play_vars.update({key: vars_[key] for key in missing if key in vars_})
+        return play_vars
+
     def v2_playbook_on_handler_task_start(self, task):
         self.log.debug("v2_playbook_on_handler_task_start")
         # TODO: Why doesn't `v2_playbook_on_handler_task_start` have is_conditional ?
@@ -326,8 +1040,12 @@ class CallbackModule(CallbackBase):
 
     def v2_playbook_on_task_start(self, task, is_conditional, handler=False):
         self.log.debug("v2_playbook_on_task_start")
-        self._end_task()
-        self.task_threads = ThreadPoolExecutor(max_workers=self.thread_count)
+        if self.play_hosts is None:
+            self._end_tasks()
+        elif task._uuid in self.tasks:
+            # The free strategy starts a task once for every host
+            self.task = self.tasks[task._uuid]["task"]
+            return self.task
 
         pathspec = task.get_path()
         if pathspec:
@@ -339,70 +1057,117 @@ class CallbackModule(CallbackBase):
             lineno = 1
 
         # Get task file
-        task_file = self._get_or_create_file(path)
+        if self.fire_and_forget:
+            file_job = self._submit_file(path)
+            file_id = self._client_uuid("file", path)
+        else:
+            file_job = None
+            # The API client logged why the file could not be created
+            file_id = self._get_or_create_file(path).get("id")
 
-        self.task = self.client.post(
+        self.task, job = self._create(
             "/api/v1/tasks",
+            [self.play_job, file_job],
             name=task.get_name(),
             status="running",
             action=task.action,
             play=self.play["id"],
             playbook=self.playbook["id"],
-            file=task_file["id"],
+            file=file_id,
             tags=task.tags,
             lineno=lineno,
             handler=handler,
             started=datetime.datetime.now().isoformat(),
         )
+        self.tasks[task._uuid] = dict(task=self.task, job=job, jobs=[], hosts=set())
+        if task.action.rsplit(".", 1)[-1] in ["ara_playbook", "ara_record"]:
+            # These modules look up the play of the task through the API
+            futures.wait(self._after(job))
 
         return self.task
 
     def v2_runner_on_start(self, host, task):
         # v2_runner_on_start was added in 2.8 so this doesn't get run for Ansible 2.7 and below.
-        self.result_started[host.get_name()] = datetime.datetime.now().isoformat()
+        self.result_started[(host.get_name(), task._uuid)] = datetime.datetime.now().isoformat()
 
     def v2_runner_on_ok(self, result, **kwargs):
-        self.task_threads.submit(self._load_result, result, "ok", **kwargs)
+        self._submit_result(result, "ok", **kwargs)
 
     def v2_runner_on_unreachable(self, result, **kwargs):
-        self.task_threads.submit(self._load_result, result, "unreachable", **kwargs)
+        self._submit_result(result, "unreachable", **kwargs)
 
     def v2_runner_on_failed(self, result, **kwargs):
-        self.task_threads.submit(self._load_result, result, "failed", **kwargs)
+        self._submit_result(result, "failed", **kwargs)
 
     def v2_runner_on_skipped(self, result, **kwargs):
-        self.task_threads.submit(self._load_result, result, "skipped", **kwargs)
+        self._submit_result(result, "skipped", **kwargs)
 
     def v2_playbook_on_stats(self, stats):
         self.log.debug("v2_playbook_on_stats")
-        self._end_task()
+        self._end_tasks()
         self._end_play()
         self._load_stats(stats)
         self._end_playbook(stats)
 
-    def _end_task(self):
-        if self.task is not None:
-            self.task_threads.submit(
-                self.client.patch,
-                "/api/v1/tasks/%s" % self.task["id"],
-                status="completed",
-                ended=datetime.datetime.now().isoformat(),
-            )
-            # Flush threads before moving on to next task to make sure all results are saved
-            self.log.debug("waiting for task threads...")
-            self.task_threads.shutdown(wait=True)
-            self.task_threads = None
-            self.task = None
+    def _submit_result(self, result, status, **kwargs):
+        # Results can be saved after the next task has started: resolve everything
+        # that depends on the current state of the callback before queueing them.
+        hostname = result._host.get_name()
+        task_uuid = result._task._uuid
+        running = self.tasks.get(task_uuid)
+        if running is None:
+            self.log.debug("Ignoring result of %s for a task that isn't running: %s" % (hostname, task_uuid))
+            return
+        task = running["task"]
+        started = self.result_started.pop((hostname, task_uuid), task["started"])
+        ended = datetime.datetime.now().isoformat()
+        job = self.dispatcher.submit_after(
+            self._after(running["job"]), self._load_result, result, status, task, started, ended, **kwargs
+        )
+        running["jobs"].append(job)
+
+        if self.play_hosts is not None:
+            running["hosts"].add(hostname)
+            if running["hosts"] >= self.play_hosts:
+                self._end_task(task_uuid)
+
+    def _end_tasks(self):
+        for task_uuid in list(self.tasks):
+            self._end_task(task_uuid)
+        self.task = None
+
+    def _end_task(self, task_uuid):
+        start = time.monotonic()
+        running = self.tasks.pop(task_uuid)
+        # The task is only ended once all of its results have been saved
+        jobs = running["jobs"] + self._after(running["job"])
+        if self.batch_size:
+            jobs = [self.dispatcher.submit_after(jobs, self._flush_results)]
+        job = self.dispatcher.submit_after(
+            jobs,
+            self.client.patch,
+            "/api/v1/tasks/%s" % running["task"]["id"],
+            status="completed",
+            ended=datetime.datetime.now().isoformat(),
+        )
+        if self.transport == "barrier" and self.play_hosts is None:
+            # Wait before moving on to next task to make sure all results are saved
+            self.log.debug("waiting for task results...")
+            futures.wait([job], timeout=self.deadline or None)
+        if self.metrics is not None:
+            self.metrics.block("end_task", time.monotonic() - start)
 
     def _end_play(self):
         if self.play is not None:
-            self.global_threads.submit(
+            self.dispatcher.submit_after(
+                self._after(self.play_job),
                 self.client.patch,
                 "/api/v1/plays/%s" % self.play["id"],
                 status="completed",
                 ended=datetime.datetime.now().isoformat(),
             )
             self.play = None
+            self.play_job = None
 
     def _end_playbook(self, stats):
         status = "unknown"
@@ -411,46 +1176,156 @@ class CallbackModule(CallbackBase):
         else:
             status = "completed"
 
-        self.global_threads.submit(
+        self.dispatcher.submit_after(
+            self._after(self.playbook_job),
             self.client.patch,
             "/api/v1/playbooks/%s" % self.playbook["id"],
             status=status,
             ended=datetime.datetime.now().isoformat(),
         )
-        self.log.debug("waiting for global threads...")
-        self.global_threads.shutdown(wait=True)
+        self.log.debug("waiting for pending requests...")
+        start = time.monotonic()
+        self.dispatcher.join()
+        if self.batch_size and not self.degraded:
+            self._flush_remaining_results()
+        if self.metrics is not None:
+            self.metrics.block("end_playbook", time.monotonic() - start)
+            self._report_metrics()
+        if self.controller is not None:
+            self.client.observers.remove(self.controller.observe)
+            self.log.info(
+                "finished with a concurrency of %s thread(s), peaked at %s"
+                % (self.controller.concurrency, self.controller.peak)
+            )
+        self.dispatcher.shutdown()
+        if self.encoder is not None:
+            self.encoder.shutdown()
+        if self.batch_timer is not None:
+            self.batch_timer.cancel()
+
+    def _report_metrics(self):
+        self.client.observers.remove(self.metrics.observe)
+        summary = self.metrics.summary()
+        self._display.display(Metrics.format(summary))
+        if self.metrics_record:
+            self.client.post(
+                "/api/v1/records", playbook=self.playbook["id"], key="ara_metrics", value=summary, type="json"
+            )
+
+    def _create(self, endpoint, dependencies, **data):
+        """
+        Creates an object and returns it along with the job creating it, if any.
+        In fire and forget mode, the object is created by a worker once its dependencies
+        are done and its client_uuid is used in place of its id in the meantime.
+        """
+        if not self.fire_and_forget:
+            return self.client.post(endpoint, **data), None
+        data["client_uuid"] = self._client_uuid()
+        job = self.dispatcher.submit_after(
+            [job for job in dependencies if job is not None], self.client.post, endpoint, **data
+        )
+        return dict(data, id=data["client_uuid"]), job
+
+    def _update_playbook(self, **data):
+        if not self.fire_and_forget:
+            self.playbook = self.client.patch("/api/v1/playbooks/%s" % self.playbook["id"], **data)
+            return
+        self.dispatcher.submit_after(
+            [self.playbook_job], self.client.patch, "/api/v1/playbooks/%s" % self.playbook["id"], **data
+        )
+        self.playbook.update(data)
+
+    @staticmethod
+    def _after(*jobs):
+        return [job for job in jobs if job is not None]
+
+    def _client_uuid(self, *names):
+        # Files get the same uuid every time their path is recorded for this playbook
+        if not names:
+            return str(uuid.uuid4())
+        return str(uuid.uuid5(uuid.UUID(self.playbook["client_uuid"]), ":".join(names)))
 
     def _set_playbook_name(self, name):
         if self.playbook["name"] != name:
-            self.playbook = self.client.patch("/api/v1/playbooks/%s" % self.playbook["id"], name=name)
+            self._update_playbook(name=name)
 
     def _set_playbook_labels(self, labels):
-        current_labels = [label["name"] for label in self.playbook["labels"]]
+        current_labels = [label["name"] if isinstance(label, dict) else label for label in self.playbook["labels"]]
         if sorted(current_labels) != sorted(labels):
             self.log.debug("Updating playbook labels to match: %s" % ",".join(labels))
-            self.playbook = self.client.patch("/api/v1/playbooks/%s" % self.playbook["id"], labels=labels)
+            self._update_playbook(labels=labels)
 
-    def _get_or_create_file(self, path, content=None):
-        if path not in self.file_cache:
-            self.log.debug("File not in cache, getting or creating: %s" % path)
-            for ignored_file_pattern in self.ignored_files:
-                if ignored_file_pattern in path:
-                    self.log.debug("Ignoring file {1}, matched pattern: {0}".format(ignored_file_pattern, path))
-                    content = "Not saved by ARA as configured by 'ignored_files'"
-            if content is None:
-                try:
-                    with open(path, "r") as fd:
-                        content = fd.read()
-                except IOError as e:
-                    self.log.error("Unable to open {0} for reading: {1}".format(path, str(e)))
-                    content = """ARA was not able to read this file successfully.
-                            Refer to the logs for more information"""
-
-            self.file_cache[path] = self.client.post(
-                "/api/v1/files", playbook=self.playbook["id"], path=path, content=content
+    def _submit_file(self, path, content=None):
+        # Returns the job getting or creating the file, it is only queued once per path
+        if path not in self.file_jobs:
+            self.file_jobs[path] = self.dispatcher.submit_after(
+                self._after(self.playbook_job), self._get_or_create_file, path, content
             )
+        return self.file_jobs[path]
+
+    def _get_or_create_file(self, path, content=None):
+        # Files are created from the workers and from Ansible: the first caller for a path creates it
+        # and the others wait for it. The lock is only held to find out who is first, not while sending.
+        with self.file_lock:
+            future = self.file_cache.get(path)
+            first = future is None
+            if first:
+                future = self.file_cache[path] = futures.Future()
+        if not first:
+            return future.result()
 
-        return self.file_cache[path]
+        try:
+            file_ = self._create_file(path, content)
+        except Exception as e:
+            self._forget_file(path)
+            future.set_exception(e)
+            raise
+        if "id" not in file_:
+            # Failures are not cached so that the file is created again the next time it is needed
+            self._forget_file(path)
+        future.set_result(file_)
+        return file_
+
+    def _forget_file(self, path):
+        with self.file_lock:
+            del self.file_cache[path]
+
+    def _create_file(self, path, content=None):
+        self.log.debug("File not in cache, getting or creating: %s" % path)
+        for ignored_file_pattern in self.ignored_files:
+            if ignored_file_pattern in path:
+                self.log.debug("Ignoring file {1}, matched pattern: {0}".format(ignored_file_pattern, path))
+                content = "Not saved by ARA as configured by 'ignored_files'"
+        if content is None:
+            try:
+                with open(path, "r") as fd:
+                    content = fd.read()
+            except IOError as e:
+                self.log.error("Unable to open {0} for reading: {1}".format(path, str(e)))
+                content = """ARA was not able to read this file successfully.
+                        Refer to the logs for more information"""
+
+        data = dict(playbook=self.playbook["id"], path=path)
+        if self.fire_and_forget:
+            data["client_uuid"] = self._client_uuid("file", path)
+        # Only send the contents if the server doesn't already have them
+        sha1 = hashlib.sha1(content.encode("utf8")).hexdigest()
+        if self._has_file_content(sha1):
+            file_ = self.client.post("/api/v1/files", sha1=sha1, **data)
+        else:
+            file_ = self.client.post("/api/v1/files", content=content, **data)
+        if "id" in file_:
+            self.file_contents.add(sha1)
+        return file_
+
+    def _has_file_content(self, sha1):
+        if sha1 not in self.file_contents:
+            # Servers without this endpoint return an error without a count, the contents are sent in that case
+            file_contents = self.client.get("/api/v1/file_contents", sha1=sha1)
+            if not file_contents.get("count"):
+                return False
+            self.file_contents.add(sha1)
+        return True
 
     def _get_or_create_host(self, host):
         # Note: The get_or_create is handled through the serializer of the API server.
@@ -459,62 +1334,175 @@ class CallbackModule(CallbackBase):
             self.host_cache[host] = self.client.post("/api/v1/hosts", name=host, playbook=self.playbook["id"])
         return self.host_cache[host]
 
-    def _load_result(self, result, status, **kwargs):
+    def _get_or_create_hosts(self, hosts):
+        missing = sorted(host for host in hosts if host not in self.host_cache)
+        if missing:
+            self.log.debug("Hosts not in cache, getting or creating: %s" % ",".join(missing))
+            created = self.client.post(
+                "/api/v1/hosts/bulk", [dict(name=host, playbook=self.playbook["id"]) for host in missing]
+            )
+            if not isinstance(created, list):
+                raise ValueError("unexpected response to /api/v1/hosts/bulk: %s" % created)
+            for host in created:
+                self.host_cache[host["name"]] = host
+        return {host: self.host_cache[host] for host in hosts}
+
+    def _queue_result(self, hostname, result, facts=None):
+        with self.batch_lock:
+            self.pending_results.append((hostname, result))
+            if facts is not None:
+                self.pending_facts[hostname] = facts
+            full = len(self.pending_results) >= self.batch_size
+            if not full and self.batch_timer is None:
+                self.batch_timer = threading.Timer(self.batch_timeout, self.dispatcher.submit, [self._flush_results])
+                self.batch_timer.daemon = True
+                self.batch_timer.start()
+
+        if full:
+            self._flush_results()
+
+    def _flush_results(self):
+        with self.flush_lock:
+            with self.batch_lock:
+                results, self.pending_results = self.pending_results, []
+                facts, self.pending_facts = self.pending_facts, {}
+                if self.batch_timer is not None:
+                    self.batch_timer.cancel()
+                    self.batch_timer = None
+
+            if not results and not facts:
+                return
+
+            self.log.debug("Sending %s results and facts for %s hosts" % (len(results), len(facts)))
+            try:
+                hosts = self._get_or_create_hosts(set(hostname for hostname, result in results) | set(facts))
+                # Results and facts were already encoded, only the host ids are missing
+                if results:
+                    response = self.client.post(
+                        "/api/v1/results/bulk",
+                        encoding.dumps_list(
+                            [encoding.merge(result, host=hosts[hostname]["id"]) for hostname, result in results]
+                        ),
+                    )
+                    if not isinstance(response, dict) or response.get("count") != len(results):
+                        raise ValueError("unexpected response to /api/v1/results/bulk: %s" % response)
+                    results = []
+                if facts:
+                    response = self.client.patch(
+                        "/api/v1/hosts/bulk",
+                        encoding.dumps_list(
+                            [encoding.merge(facts[hostname], id=hosts[hostname]["id"]) for hostname in facts]
+                        ),
+                    )
+                    if not isinstance(response, list) or len(response) != len(facts):
+                        raise ValueError("unexpected response to /api/v1/hosts/bulk: %s" % response)
+            except Exception as e:
+                self._requeue_results(results, facts, e)
+                # The API server could not be reached in time, let the hook give up on recording
+                if isinstance(e, RequestException):
+                    raise
+                return
+            self.batch_retry_delay = 0
+
+    def _requeue_results(self, results, facts, error):
+        # Like the agent, a batch that failed is put back in front of the queue and retried with a backoff
+        with self.batch_lock:
+            self.pending_results[:0] = results
+            # Facts received in the meantime are more recent
+            facts.update(self.pending_facts)
+            self.pending_facts = facts
+            self.batch_retry_delay = min(max(self.batch_retry_delay * 2, self.batch_timeout, 1), MAX_BATCH_RETRY_DELAY)
+            if self.batch_timer is None and not self.degraded:
+                self.batch_timer = threading.Timer(
+                    self.batch_retry_delay, self.dispatcher.submit, [self._flush_results]
+                )
+                self.batch_timer.daemon = True
+                self.batch_timer.start()
+        self.log.warning(
+            "Failed to send %s results and facts for %s hosts, retrying in %s seconds: %s"
+            % (len(results), len(facts), self.batch_retry_delay, str(error))
+        )
+
+    def _flush_remaining_results(self):
+        # Results that failed to be sent are retried a few more times before giving up on them
+        for attempt in range(BATCH_FINAL_ATTEMPTS):
+            self._flush_results()
+            with self.batch_lock:
+                if self.batch_timer is not None:
+                    self.batch_timer.cancel()
+                    self.batch_timer = None
+                remaining = (len(self.pending_results), len(self.pending_facts))
+            if not any(remaining):
+                return
+            if attempt + 1 < BATCH_FINAL_ATTEMPTS:
+                time.sleep(self.batch_retry_delay)
+        self._display.warning(
+            "ARA was unable to record %s results and the facts of %s hosts, refer to the logs for more information"
+            % remaining
+        )
+
+    def _load_result(self, result, status, task, started, ended, **kwargs):
         """
         This method is called when an individual task instance on a single
         host completes. It is responsible for logging a single result to the
         database.
         """
         hostname = result._host.get_name()
-        self.result_ended[hostname] = datetime.datetime.now().isoformat()
-
-        # Retrieve the host so we can associate the result to the host id
-        host = self._get_or_create_host(hostname)
-
-        results = strip_internal_keys(module_response_deepcopy(result._result))
-
-        # Round-trip through JSON to sort keys and convert Ansible types
-        # to standard types
-        try:
-            jsonified = json.dumps(results, cls=AnsibleJSONEncoder, ensure_ascii=False, sort_keys=True)
-        except TypeError:
-            # Python 3 can't sort non-homogenous keys.
-            # https://bugs.python.org/issue25457
-            jsonified = json.dumps(results, cls=AnsibleJSONEncoder, ensure_ascii=False, sort_keys=False)
-        results = json.loads(jsonified)
-
-        # Sanitize facts
-        if "ansible_facts" in results:
-            for fact in self.ignored_facts:
-                if fact in results["ansible_facts"]:
-                    self.log.debug("Ignoring fact: %s" % fact)
-                    results["ansible_facts"][fact] = "Not saved by ARA as configured by 'ignored_facts'"
-
-        self.result = self.client.post(
-            "/api/v1/results",
+        payload = dict(
             playbook=self.playbook["id"],
-            task=self.task["id"],
-            host=host["id"],
-            play=self.task["play"],
-            content=results,
+            task=task["id"],
+            play=task["play"],
+            content=result._result,
             status=status,
-            started=self.result_started[hostname] if hostname in self.result_started else self.task["started"],
-            ended=self.result_ended[hostname],
+            started=started,
+            ended=ended,
             changed=result._result.get("changed", False),
             # Note: ignore_errors might be None instead of a boolean
             ignore_errors=kwargs.get("ignore_errors", False) or False,
         )
+        payload, facts = self._encode_result(payload, facts=task["action"] in ["setup", "gather_facts"])
 
-        if self.task["action"] in ["setup", "gather_facts"] and "ansible_facts" in results:
-            self.client.patch("/api/v1/hosts/%s" % host["id"], facts=results["ansible_facts"])
+        if self.batch_size:
+            self._queue_result(hostname, payload, facts)
+            return
+
+        # Retrieve the host so we can associate the result to the host id
+        host = self._get_or_create_host(hostname)
+        self.result = self.client.post("/api/v1/results", encoding.merge(payload, host=host["id"]))
+
+        if facts is not None:
+            self.client.patch("/api/v1/hosts/%s" % host["id"], facts)
+
+    def _encode_result(self, payload, facts=False):
+        # The content of the result is copied without the keys that are internal to Ansible and it is
+        # encoded to JSON only once, right before being sent. AnsibleJSONEncoder converts Ansible types.
+        status = "changed" if payload["status"] == "ok" and payload["changed"] else payload["status"]
+        content = status not in self.ignored_result_content
+        args = (payload, self.ignored_facts, AnsibleJSONEncoder, facts, content, self.result_stdout_max_size)
+        if self.encoder is not None:
+            try:
+                return self.encoder.submit(encoding.encode_result, *args).result()
+            except futures.BrokenExecutor:
+                self.log.error("Encoder processes have stopped unexpectedly, results are now encoded by threads")
+                self.encoder = None
+            except Exception as e:
+                # For example, results that can't be pickled to be sent to the encoder processes
+                self.log.debug("Failed to encode result in a separate process, retrying in thread: %s" % str(e))
+        return encoding.encode_result(*args)
 
     def _load_stats(self, stats):
         hosts = sorted(stats.processed.keys())
+        if self.batch_size or self.fire_and_forget:
+            # Hosts are retrieved by the worker rather than by Ansible's thread
+            summaries = {hostname: stats.summarize(hostname) for hostname in hosts}
+            self.dispatcher.submit_after(self._after(self.playbook_job), self._save_stats, summaries)
+            return
+
         for hostname in hosts:
             host = self._get_or_create_host(hostname)
             host_stats = stats.summarize(hostname)
 
-            self.global_threads.submit(
+            self.dispatcher.submit(
                 self.client.patch,
                 "/api/v1/hosts/%s" % host["id"],
                 changed=host_stats["changed"],
@@ -523,3 +1511,23 @@ class CallbackModule(CallbackBase):
                 ok=host_stats["ok"],
                 skipped=host_stats["skipped"],
             )
+
+    def _save_stats(self, summaries):
+        if not summaries:
+            return
+        with self.flush_lock:
+            hosts = self._get_or_create_hosts(summaries.keys())
+            self.client.patch(
+                "/api/v1/hosts/bulk",
+                [
+                    dict(
+                        id=hosts[hostname]["id"],
+                        changed=host_stats["changed"],
+                        unreachable=host_stats["unreachable"],
+                        failed=host_stats["failures"],
+                        ok=host_stats["ok"],
+                        skipped=host_stats["skipped"],
+                    )
+                    for hostname, host_stats in summaries.items()
+                ],
+            )
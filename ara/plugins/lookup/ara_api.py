@@ -38,10 +38,17 @@ DOCUMENTATION = """
             type: list
             elements: string
             required: True
+        walk:
+            description:
+                - Returns every object of a list endpoint instead of its first page.
+                - Pages are walked with the cursor pagination of the API, in linear time.
+            type: bool
+            default: False
 """
 
 EXAMPLES = """
     - debug: msg="{{ lookup('ara_api','/api/v1/playbooks/1') }}"
+    - debug: msg="{{ lookup('ara_api','/api/v1/results?playbook=1', walk=True) | length }}"
 """
 
 RETURN = """
@@ -56,8 +63,12 @@ class LookupModule(LookupBase):
         self.client = client_utils.active_client()
 
     def run(self, terms, variables, **kwargs):
+        self.set_options(var_options=variables, direct=kwargs)
         ret = []
         for term in terms:
-            ret.append(self.client.get(term))
+            if self.get_option("walk"):
+                ret.append(list(client_utils.walk(self.client, term)))
+            else:
+                ret.append(self.client.get(term))
 
         return ret
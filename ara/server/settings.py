@@ -176,7 +176,8 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
 ] + EXTERNAL_AUTH_MIDDLEWARE + [
     "django.contrib.messages.middleware.MessageMiddleware",
-    "django.middleware.clickjacking.XFrameOptionsMiddleware"
+    "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "ara.api.ingest.IngestMiddleware",
 ]
 # fmt: on
 
@@ -228,9 +229,22 @@ ROOT_URLCONF = "ara.server.urls"
 APPEND_SLASH = False
 
 PAGE_SIZE = settings.get("PAGE_SIZE", 100)
+# Maximum amount of bytes a compressed request body can decompress to
+DECOMPRESSED_BODY_MAX_SIZE = settings.get("DECOMPRESSED_BODY_MAX_SIZE", 104857600, "@int")
+# How paginated objects are counted unless requested otherwise: exact, estimate, cached or none
+PAGE_COUNT = settings.get("PAGE_COUNT", "exact")
+# Amount of seconds cached counts are reused for
+PAGE_COUNT_CACHE_TIMEOUT = settings.get("PAGE_COUNT_CACHE_TIMEOUT", 60, "@int")
+
+# Whether results are queued and created in bulk by a background thread instead of within the requests
+INGEST_QUEUE = settings.get("INGEST_QUEUE", False, "@bool")
+# Maximum amount of queued results created in a single transaction
+INGEST_BATCH_SIZE = settings.get("INGEST_BATCH_SIZE", 1000, "@int")
+# Maximum amount of seconds results are queued for
+INGEST_INTERVAL = settings.get("INGEST_INTERVAL", 1.0, "@float")
 
 REST_FRAMEWORK = {
-    "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.LimitOffsetPagination",
+    "DEFAULT_PAGINATION_CLASS": "ara.api.pagination.LimitOffsetOrCursorPagination",
     "PAGE_SIZE": PAGE_SIZE,
     "DEFAULT_FILTER_BACKENDS": ("django_filters.rest_framework.DjangoFilterBackend",),
     "DEFAULT_RENDERER_CLASSES": (
@@ -238,7 +252,7 @@ REST_FRAMEWORK = {
         "rest_framework.renderers.BrowsableAPIRenderer",
     ),
     "DEFAULT_PARSER_CLASSES": (
-        "rest_framework.parsers.JSONParser",
+        "ara.api.parsers.JSONParser",
         "rest_framework.parsers.FormParser",
         "rest_framework.parsers.MultiPartParser",
     ),
@@ -275,11 +289,17 @@ if not os.path.exists(DEFAULT_SETTINGS) and "ARA_SETTINGS" not in os.environ:
         DATABASE_CONN_MAX_AGE=DATABASE_CONN_MAX_AGE,
         DATABASE_OPTIONS=DATABASE_OPTIONS.to_dict(),
         DEBUG=DEBUG,
+        DECOMPRESSED_BODY_MAX_SIZE=DECOMPRESSED_BODY_MAX_SIZE,
         LOG_LEVEL=LOG_LEVEL,
         LOGGING=LOGGING,
         READ_LOGIN_REQUIRED=READ_LOGIN_REQUIRED,
         WRITE_LOGIN_REQUIRED=WRITE_LOGIN_REQUIRED,
         PAGE_SIZE=PAGE_SIZE,
+        PAGE_COUNT=PAGE_COUNT,
+        PAGE_COUNT_CACHE_TIMEOUT=PAGE_COUNT_CACHE_TIMEOUT,
+        INGEST_QUEUE=INGEST_QUEUE,
+        INGEST_BATCH_SIZE=INGEST_BATCH_SIZE,
+        INGEST_INTERVAL=INGEST_INTERVAL,
         DISTRIBUTED_SQLITE=DISTRIBUTED_SQLITE,
         DISTRIBUTED_SQLITE_PREFIX=DISTRIBUTED_SQLITE_PREFIX,
         DISTRIBUTED_SQLITE_ROOT=DISTRIBUTED_SQLITE_ROOT,
@@ -17,20 +17,21 @@
 
 from collections import OrderedDict
 
-from rest_framework.pagination import LimitOffsetPagination
 from rest_framework.response import Response
 from rest_framework.utils.urls import remove_query_param, replace_query_param
 
+from ara.api.pagination import LimitOffsetPaginationWithCounts
 
-class LimitOffsetPaginationWithLinks(LimitOffsetPagination):
+
+class LimitOffsetPaginationWithLinks(LimitOffsetPaginationWithCounts):
     """
-    Extends LimitOffsetPagination to provide links
+    Extends LimitOffsetPaginationWithCounts to provide links
     to first and last pages as well as the limit and offset, if available.
     Generates relative links instead of absolute URIs.
     """
 
     def get_next_link(self):
-        if self.offset + self.limit >= self.count:
+        if not self.has_more:
             return None
 
         url = self.request.get_full_path()
@@ -59,7 +60,8 @@ class LimitOffsetPaginationWithLinks(LimitOffsetPagination):
         return remove_query_param(url, self.offset_query_param)
 
     def get_last_link(self):
-        if self.offset + self.limit >= self.count:
+        # The last page can't be found without counting
+        if not self.has_more or self.count is None:
             return None
         url = self.request.get_full_path()
         url = replace_query_param(url, self.limit_query_param, self.limit)
@@ -71,6 +73,8 @@ class LimitOffsetPaginationWithLinks(LimitOffsetPagination):
             OrderedDict(
                 [
                     ("count", self.count),
+                    ("approximate_count", self.approximate_count),
+                    ("has_more", self.has_more),
                     ("next", self.get_next_link()),
                     ("previous", self.get_previous_link()),
                     ("first", self.get_first_link()),
@@ -81,3 +85,11 @@ class LimitOffsetPaginationWithLinks(LimitOffsetPagination):
                 ]
             )
         )
+
+    def get_current_page_results(self):
+        """
+        Returns the range of objects of the current page, i.e: 1-100
+        """
+        if self.has_more:
+            return "%s-%s" % (self.offset + 1, self.offset + self.limit)
+        return "%s-%s" % (self.offset + 1, self.offset + len(self.page))
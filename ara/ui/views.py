@@ -33,19 +33,16 @@ class Index(generics.ListAPIView):
         else:
             search_form = forms.PlaybookSearchForm()
 
-        query = self.filter_queryset(self.queryset.all().order_by("-id"))
+        query = self.filter_queryset(self.queryset.all().prefetch_related("labels").order_by("-id"))
         page = self.paginate_queryset(query)
         if page is not None:
+            serializers.ItemCountSerializer.count_items(page)
             serializer = serializers.ListPlaybookSerializer(page, many=True)
         else:
             serializer = serializers.ListPlaybookSerializer(query, many=True)
         response = self.get_paginated_response(serializer.data)
 
-        if self.paginator.count > (self.paginator.offset + self.paginator.limit):
-            max_current = self.paginator.offset + self.paginator.limit
-        else:
-            max_current = self.paginator.count
-        current_page_results = "%s-%s" % (self.paginator.offset + 1, max_current)
+        current_page_results = self.paginator.get_current_page_results()
 
         return Response(
             {
@@ -63,19 +60,21 @@ class Playbook(generics.RetrieveAPIView):
     Returns a page for a detailed view of a playbook
     """
 
-    queryset = models.Playbook.objects.all()
+    queryset = models.Playbook.objects.prefetch_related("labels")
     renderer_classes = [TemplateHTMLRenderer]
     pagination_class = LimitOffsetPaginationWithLinks
     template_name = "playbook.html"
 
     def get(self, request, *args, **kwargs):
-        playbook = serializers.DetailedPlaybookSerializer(self.get_object())
+        playbook = self.get_object()
+        serializers.ItemCountSerializer.count_items([playbook])
+        playbook = serializers.DetailedPlaybookSerializer(playbook)
         hosts = serializers.ListHostSerializer(
             models.Host.objects.filter(playbook=playbook.data["id"]).order_by("name").all(), many=True
         )
-        files = serializers.ListFileSerializer(
-            models.File.objects.filter(playbook=playbook.data["id"]).all(), many=True
-        )
+        # Only the sha1 of the contents is needed
+        files = models.File.objects.filter(playbook=playbook.data["id"]).select_related("content")
+        files = serializers.ListFileSerializer(files.defer("content__contents"), many=True)
         records = serializers.ListRecordSerializer(
             models.Record.objects.filter(playbook=playbook.data["id"]).all(), many=True
         )
@@ -93,18 +92,17 @@ class Playbook(generics.RetrieveAPIView):
         else:
             serializer = serializers.ListResultSerializer(result_filter, many=True)
 
+        # Retrieve the tasks and hosts of the results all at once rather than for every result
+        task_ids = set(result["task"] for result in serializer.data)
+        result_tasks = models.Task.objects.select_related("file").in_bulk(task_ids)
+        serializers.ItemCountSerializer.count_items(list(result_tasks.values()))
+        result_hosts = models.Host.objects.in_bulk(set(result["host"] for result in serializer.data))
         for result in serializer.data:
-            task_id = result["task"]
-            result["task"] = serializers.SimpleTaskSerializer(models.Task.objects.get(pk=task_id)).data
-            host_id = result["host"]
-            result["host"] = serializers.SimpleHostSerializer(models.Host.objects.get(pk=host_id)).data
+            result["task"] = serializers.SimpleTaskSerializer(result_tasks[result["task"]]).data
+            result["host"] = serializers.SimpleHostSerializer(result_hosts[result["host"]]).data
         paginated_results = self.get_paginated_response(serializer.data)
 
-        if self.paginator.count > (self.paginator.offset + self.paginator.limit):
-            max_current = self.paginator.offset + self.paginator.limit
-        else:
-            max_current = self.paginator.count
-        current_page_results = "%s-%s" % (self.paginator.offset + 1, max_current)
+        current_page_results = self.paginator.get_current_page_results()
 
         # fmt: off
         return Response({
@@ -124,12 +122,13 @@ class Host(generics.RetrieveAPIView):
     Returns a page for a detailed view of a host
     """
 
-    queryset = models.Host.objects.all()
+    queryset = models.Host.objects.select_related("playbook").prefetch_related("playbook__labels")
     renderer_classes = [TemplateHTMLRenderer]
     template_name = "host.html"
 
     def get(self, request, *args, **kwargs):
         host = self.get_object()
+        serializers.ItemCountSerializer.count_items([host.playbook])
         serializer = serializers.DetailedHostSerializer(host)
         return Response({"host": serializer.data})
 
@@ -139,12 +138,13 @@ class File(generics.RetrieveAPIView):
     Returns a page for a detailed view of a file
     """
 
-    queryset = models.File.objects.all()
+    queryset = models.File.objects.select_related("playbook", "content").prefetch_related("playbook__labels")
     renderer_classes = [TemplateHTMLRenderer]
     template_name = "file.html"
 
     def get(self, request, *args, **kwargs):
         file = self.get_object()
+        serializers.ItemCountSerializer.count_items([file.playbook])
         serializer = serializers.DetailedFileSerializer(file)
         return Response({"file": serializer.data})
 
@@ -154,7 +154,9 @@ class Result(generics.RetrieveAPIView):
     Returns a page for a detailed view of a result
     """
 
-    queryset = models.Result.objects.all()
+    queryset = models.Result.objects.select_related("playbook", "play", "task__file", "host").prefetch_related(
+        "playbook__labels"
+    )
     renderer_classes = [TemplateHTMLRenderer]
     template_name = "result.html"
 
@@ -162,6 +164,8 @@ class Result(generics.RetrieveAPIView):
         # Results can contain a wide array of non-ascii or binary characters, escape them
         codecs.register_error("strict", codecs.lookup_error("surrogateescape"))
         result = self.get_object()
+        for related in [result.playbook, result.play, result.task]:
+            serializers.ItemCountSerializer.count_items([related])
         serializer = serializers.DetailedResultSerializer(result)
         return Response({"result": serializer.data})
 
@@ -171,11 +175,12 @@ class Record(generics.RetrieveAPIView):
     Returns a page for a detailed view of a record
     """
 
-    queryset = models.Record.objects.all()
+    queryset = models.Record.objects.select_related("playbook").prefetch_related("playbook__labels")
     renderer_classes = [TemplateHTMLRenderer]
     template_name = "record.html"
 
     def get(self, request, *args, **kwargs):
         record = self.get_object()
+        serializers.ItemCountSerializer.count_items([record.playbook])
         serializer = serializers.DetailedRecordSerializer(record)
         return Response({"record": serializer.data})
@@ -0,0 +1,44 @@
+#!/bin/bash
+# Copyright (c) 2020 The ARA Records Ansible authors
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# Compares the wall-clock time of tests/integration/benchmark.yaml when recorded
+# with the different transports of the ara callback.
+#
+# The difference is most visible against a remote API server, for example:
+#   ARA_API_CLIENT=http ARA_API_SERVER=https://ara.example.org ./tests/benchmarks/callback_transport.sh
+#
+# Parameters can be tweaked with environment variables:
+#   BENCHMARK_HOST_COUNT (default: 25)
+#   BENCHMARK_TASK_COUNT (default: 50)
+#   BENCHMARK_TRANSPORTS (default: "barrier async")
+#   BENCHMARK_EXTRA_ARGS (default: none, appended to the ansible-playbook command)
+
+set -e
+
+benchmarks=$(dirname $0)
+PROJECT_ROOT=$(cd $benchmarks/../.. && pwd -P)
+BENCHMARK_HOST_COUNT=${BENCHMARK_HOST_COUNT:-25}
+BENCHMARK_TASK_COUNT=${BENCHMARK_TASK_COUNT:-50}
+BENCHMARK_TRANSPORTS=${BENCHMARK_TRANSPORTS:-barrier async}
+
+export ANSIBLE_CALLBACK_PLUGINS=$(python3 -m ara.setup.callback_plugins)
+export ANSIBLE_CALLBACKS_ENABLED=ara_default
+export ANSIBLE_CALLBACK_WHITELIST=ara_default
+
+function run_benchmark() {
+    local start=$(date +%s.%N)
+    ansible-playbook -i localhost, -c local "${PROJECT_ROOT}/tests/integration/benchmark.yaml" \
+        -e benchmark_host_count=${BENCHMARK_HOST_COUNT} \
+        -e benchmark_task_count=${BENCHMARK_TASK_COUNT} \
+        ${BENCHMARK_EXTRA_ARGS} > /dev/null
+    local end=$(date +%s.%N)
+    python3 -c "print('%.2f' % (${end} - ${start}))"
+}
+
+echo "Benchmark: ${BENCHMARK_HOST_COUNT} hosts x ${BENCHMARK_TASK_COUNT} tasks, client: ${ARA_API_CLIENT:-offline}"
+printf "%-10s %s\n" "transport" "seconds"
+for transport in ${BENCHMARK_TRANSPORTS}; do
+    export ARA_CALLBACK_TRANSPORT=${transport}
+    printf "%-10s %s\n" "${transport}" "$(run_benchmark)"
+done
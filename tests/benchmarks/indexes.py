@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# Copyright (c) 2020 The ARA Records Ansible authors
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# Compares the query plans and latencies of the filters and orderings used by
+# the API, the UI and "ara expire" before and after the indexes of the
+# 0009_add_indexes migration. A synthetic sqlite database is generated with
+# the amount of playbooks provided, each with 2 plays, 20 tasks, 10 hosts and
+# a result for every task and host. One playbook out of twenty is left
+# running since a while, like the ones "ara expire" looks for.
+#
+# Usage: python3 tests/benchmarks/indexes.py [playbooks] [iterations]
+
+import datetime
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+PLAYBOOKS = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+ITERATIONS = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+TASKS = 20
+HOSTS = 10
+
+
+def populate(models):
+    # Primary keys are provided since bulk_create doesn't return them with sqlite
+    now = datetime.datetime.now(datetime.timezone.utc)
+    content = models.FileContent.objects.create(sha1="0" * 40, contents=b"")
+    for first in range(0, PLAYBOOKS, 100):
+        playbooks, files, plays, tasks, hosts, results = [], [], [], [], [], []
+        for playbook_id in range(first + 1, min(first + 100, PLAYBOOKS) + 1):
+            started = now - datetime.timedelta(minutes=PLAYBOOKS - playbook_id)
+            status = "running" if playbook_id % 20 == 0 else "completed"
+            playbooks.append(models.Playbook(
+                id=playbook_id, ansible_version="2.9", path="/playbook.yml", status=status, started=started
+            ))
+            files.append(models.File(id=playbook_id, path="/playbook.yml", content=content, playbook_id=playbook_id))
+            for host in range(HOSTS):
+                host_id = (playbook_id - 1) * HOSTS + host + 1
+                hosts.append(models.Host(id=host_id, name="host%s" % host, playbook_id=playbook_id))
+            for play in range(2):
+                play_id = (playbook_id - 1) * 2 + play + 1
+                plays.append(models.Play(
+                    id=play_id, uuid=uuid.UUID(int=play_id), playbook_id=playbook_id, status=status, started=started
+                ))
+                for lineno in range(TASKS // 2):
+                    task_id = (play_id - 1) * (TASKS // 2) + lineno + 1
+                    tasks.append(models.Task(
+                        id=task_id, name="task", action="debug", lineno=lineno, handler=False, tags=b"",
+                        play_id=play_id, file_id=playbook_id, playbook_id=playbook_id, status=status, started=started,
+                    ))
+                    for host in range(HOSTS):
+                        results.append(models.Result(
+                            task_id=task_id, host_id=(playbook_id - 1) * HOSTS + host + 1, play_id=play_id,
+                            playbook_id=playbook_id, content=b"", status="failed" if host == lineno == 0 else "ok",
+                            changed=host % 2 == 0, started=started + datetime.timedelta(seconds=host),
+                        ))
+        for model, objects in [(models.Playbook, playbooks), (models.File, files), (models.Host, hosts),
+                               (models.Play, plays), (models.Task, tasks), (models.Result, results)]:
+            model.objects.bulk_create(objects, batch_size=500)
+    # Running objects were last updated a while ago
+    old = now - datetime.timedelta(days=2)
+    for model in [models.Playbook, models.Play, models.Task]:
+        model.objects.filter(status="running").update(updated=old)
+
+
+def queries(models):
+    now = datetime.datetime.now(datetime.timezone.utc)
+    playbook = models.Playbook.objects.order_by("id")[PLAYBOOKS // 2]
+    yesterday = now - datetime.timedelta(hours=24)
+    # fmt: off
+    return [
+        ("expire playbooks", models.Playbook.objects.filter(status__in=["running"], updated__lt=yesterday)
+            .order_by("started")[:200]),
+        ("expire plays", models.Play.objects.filter(status__in=["running"], updated__lt=yesterday)
+            .order_by("started")[:200]),
+        ("expire tasks", models.Task.objects.filter(status__in=["running"], updated__lt=yesterday)
+            .order_by("started")[:200]),
+        ("playbooks started after", models.Playbook.objects.filter(started__gte=now - datetime.timedelta(hours=1))
+            .order_by("-started")[:100]),
+        ("results of a playbook", models.Result.objects.filter(playbook=playbook).order_by("-started")[:100]),
+        ("failed results", models.Result.objects.filter(status__in=["failed"]).order_by("-id")[:100]),
+        ("changed results", models.Result.objects.filter(status="ok", changed=True).order_by("-id")[:100]),
+    ]
+    # fmt: on
+
+
+def measure(connection, name, queryset):
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute("EXPLAIN QUERY PLAN %s" % sql, params)
+        plan = "; ".join(row[-1] for row in cursor.fetchall())
+        # The queries are run without building model instances, which would take longer than the queries themselves
+        start = time.perf_counter()
+        for iteration in range(ITERATIONS):
+            cursor.execute(sql, params)
+            cursor.fetchall()
+    elapsed = (time.perf_counter() - start) * 1000 / ITERATIONS
+    print("%-25s %12.3f  %s" % (name, elapsed, plan))
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["ARA_BASE_DIR"] = directory
+        os.environ["ARA_DATABASE_ENGINE"] = "django.db.backends.sqlite3"
+        os.environ["ARA_DATABASE_NAME"] = os.path.join(directory, "ansible.sqlite")
+        os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ara.server.settings")
+
+        import django
+        from django.core.management import call_command
+        from django.db import connection
+
+        django.setup()
+        from ara.api import models
+
+        call_command("migrate", verbosity=0)
+        call_command("migrate", "api", "0008", verbosity=0)
+        start = time.perf_counter()
+        populate(models)
+        print(
+            "Benchmark: %s playbooks, %s results, %s iterations (generated in %.1fs)"
+            % (PLAYBOOKS, models.Result.objects.count(), ITERATIONS, time.perf_counter() - start)
+        )
+
+        for title in ["Before indexes", "After indexes"]:
+            if title == "After indexes":
+                call_command("migrate", "api", "0009", verbosity=0)
+            print("\n%s\n%-25s %12s  %s" % (title, "query", "latency (ms)", "plan"))
+            for name, queryset in queries(models):
+                measure(connection, name, queryset)
+
+
+if __name__ == "__main__":
+    main()
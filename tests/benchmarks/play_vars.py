@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# Copyright (c) 2020 The ARA Records Ansible authors
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# Compares the time spent by the callback at the start of a play to find
+# ara_playbook_name and ara_playbook_labels when resolving every variable of
+# the play and when looking them up in the extra vars and play vars first.
+# The inventory is generated with the amount of hosts and groups provided,
+# every group has group_vars. Ansible caches the hosts matching a pattern:
+# "cold" times are measured after clearing that cache, like the first time
+# variables are resolved for a play.
+#
+# Usage: python3 tests/benchmarks/play_vars.py [hosts] [groups] [iterations]
+
+import os
+import sys
+import tempfile
+import time
+
+from ansible.inventory.manager import InventoryManager
+from ansible.parsing.dataloader import DataLoader
+from ansible.playbook import Playbook
+from ansible.vars.manager import VariableManager
+
+from ara.plugins.callback.ara_default import CallbackModule
+
+HOSTS = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+GROUPS = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+ITERATIONS = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+KEYS = ["ara_playbook_name", "ara_playbook_labels"]
+
+PLAYBOOK = """
+- name: Play with vars
+  hosts: all
+  gather_facts: no
+  vars:
+    ara_playbook_name: benchmark
+    ara_playbook_labels: [benchmark, play_vars]
+  tasks: []
+
+- name: Play with vars_files
+  hosts: all
+  gather_facts: no
+  vars_files:
+    - vars.yaml
+  tasks: []
+"""
+
+
+def write_inventory(directory):
+    os.makedirs(os.path.join(directory, "group_vars"))
+    with open(os.path.join(directory, "hosts.ini"), "w") as inventory:
+        for group in range(GROUPS):
+            inventory.write("[group%s]\n" % group)
+            for host in range(group, HOSTS, GROUPS):
+                inventory.write("host%s ansible_host=127.0.0.%s\n" % (host, host % 250 + 1))
+            with open(os.path.join(directory, "group_vars", "group%s.yaml" % group), "w") as group_vars:
+                group_vars.write("\n".join("variable_%s_%s: %s" % (group, i, i) for i in range(20)))
+    with open(os.path.join(directory, "playbook.yaml"), "w") as playbook:
+        playbook.write(PLAYBOOK)
+    with open(os.path.join(directory, "vars.yaml"), "w") as vars_file:
+        vars_file.write("ara_playbook_name: benchmark from vars_files\n")
+
+
+def measure(func, clear=None):
+    # Returns the average time spent in func, in milliseconds
+    elapsed = 0
+    for iteration in range(ITERATIONS):
+        if clear is not None:
+            clear()
+        start = time.perf_counter()
+        func()
+        elapsed += time.perf_counter() - start
+    return elapsed * 1000 / ITERATIONS
+
+
+def main():
+    callback = CallbackModule()
+    with tempfile.TemporaryDirectory() as directory:
+        write_inventory(directory)
+        loader = DataLoader()
+        inventory = InventoryManager(loader=loader, sources=[os.path.join(directory, "hosts.ini")])
+        variable_manager = VariableManager(loader=loader, inventory=inventory)
+        playbook = Playbook.load(os.path.join(directory, "playbook.yaml"), variable_manager, loader)
+
+        print("Benchmark: %s hosts in %s groups, %s iterations" % (HOSTS, GROUPS, ITERATIONS))
+        print("%-25s %20s %20s %20s" % ("play", "get_vars, cold (ms)", "get_vars, warm (ms)", "lookup (ms)"))
+        for play in playbook.get_plays():
+            full = variable_manager.get_vars(play=play)["vars"]
+            expected = {key: full[key] for key in KEYS if key in full}
+            assert callback._get_play_vars(play, KEYS) == expected
+
+            cold = measure(lambda: variable_manager.get_vars(play=play), clear=inventory.clear_pattern_cache)
+            warm = measure(lambda: variable_manager.get_vars(play=play))
+            lookup = measure(lambda: callback._get_play_vars(play, KEYS), clear=inventory.clear_pattern_cache)
+            print("%-25s %20.3f %20.3f %20.3f" % (play.get_name(), cold, warm, lookup))
+
+
+if __name__ == "__main__":
+    main()
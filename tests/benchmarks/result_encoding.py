@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# Copyright (c) 2020 The ARA Records Ansible authors
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# Compares the time spent by the callback preparing and encoding a large
+# result (i.e, package_facts) before and after results were encoded in a
+# single pass, as well as the time spent by the calling process when results
+# are encoded by a pool of processes (callback_encoder_processes).
+#
+# Usage: python3 tests/benchmarks/result_encoding.py [packages] [iterations]
+
+import json
+import multiprocessing
+import sys
+import time
+import timeit
+from concurrent import futures
+
+from ansible.parsing.ajson import AnsibleJSONEncoder
+from ansible.utils.unsafe_proxy import AnsibleUnsafeText
+from ansible.vars.clean import module_response_deepcopy, strip_internal_keys
+
+from ara.clients import encoding
+
+PACKAGES = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+ITERATIONS = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+IGNORED_FACTS = ["ansible_env"]
+
+
+def make_result(packages):
+    return {
+        "_ansible_no_log": False,
+        "_ansible_verbose_always": True,
+        "changed": False,
+        "invocation": {"module_args": {"manager": ["auto"], "strategy": "first"}},
+        "ansible_facts": {
+            "ansible_env": {"HOME": "/root", "PATH": "/usr/bin"},
+            "packages": {
+                AnsibleUnsafeText("package-%s" % i): [
+                    {
+                        "name": AnsibleUnsafeText("package-%s" % i),
+                        "version": "1.%s.0" % i,
+                        "release": "%s.fc33" % i,
+                        "epoch": None,
+                        "arch": "x86_64",
+                        "source": "rpm",
+                    }
+                ]
+                for i in range(packages)
+            },
+        },
+    }
+
+
+def payload(content):
+    return dict(playbook=1, task=1, play=1, host=1, content=content, status="ok", changed=False)
+
+
+def ignore_facts(results):
+    if "ansible_facts" in results:
+        for fact in IGNORED_FACTS:
+            if fact in results["ansible_facts"]:
+                results["ansible_facts"][fact] = "Not saved by ARA as configured by 'ignored_facts'"
+
+
+def previous(result):
+    # Deep copy, strip internal keys, round-trip through JSON and encode the request body
+    results = strip_internal_keys(module_response_deepcopy(result))
+    jsonified = json.dumps(results, cls=AnsibleJSONEncoder, ensure_ascii=False, sort_keys=True)
+    results = json.loads(jsonified)
+    ignore_facts(results)
+    return json.dumps(payload(results))
+
+
+def single_pass(result):
+    # Copy without internal keys and encode the request body once
+    results = encoding.sanitize(result)
+    ignore_facts(results)
+    return encoding.dumps(payload(results), cls=AnsibleJSONEncoder)
+
+
+def process_pool(result, processes=4):
+    # Returns the wall-clock and CPU time of this process per result when encoding with a pool
+    with futures.ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context("fork")) as pool:
+        pool.submit(int).result()
+        wall, cpu = time.perf_counter(), time.process_time()
+        jobs = [
+            pool.submit(encoding.encode_result, payload(result), IGNORED_FACTS, AnsibleJSONEncoder)
+            for i in range(ITERATIONS)
+        ]
+        futures.wait(jobs)
+        return (time.perf_counter() - wall) / ITERATIONS, (time.process_time() - cpu) / ITERATIONS
+
+
+if __name__ == "__main__":
+    result = make_result(PACKAGES)
+    assert json.loads(previous(result)) == json.loads(single_pass(result))
+
+    print("Encoding a result with %s packages, %s iterations" % (PACKAGES, ITERATIONS))
+    for function in [previous, single_pass]:
+        elapsed = min(timeit.repeat(lambda: function(result), number=ITERATIONS, repeat=3)) / ITERATIONS
+        print("%-12s %.2fms per result" % (function.__name__, elapsed * 1000))
+
+    wall, cpu = process_pool(result)
+    print("%-12s %.2fms per result, %.2fms of CPU time in this process" % ("process_pool", wall * 1000, cpu * 1000))